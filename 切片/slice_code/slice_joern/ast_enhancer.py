@@ -2,7 +2,9 @@
 AST 增强模块
 使用 tree-sitter 补充语法结构，确保切片代码语法正确
 """
-from typing import Set, List, Dict
+from typing import Set, List, Dict, Tuple
+from collections import OrderedDict
+import hashlib
 import logging
 
 try:
@@ -13,6 +15,35 @@ except ImportError:
     TREE_SITTER_AVAILABLE = False
     logging.warning("tree-sitter not available, AST enhancement disabled")
 
+# 进程内缓存: 每种语言的解析器和增强器只创建一次，
+# 同一函数上的多个告警共享一次解析结果 (键为 (语言, 函数代码摘要)，即文件内容 + 函数范围)
+TREE_CACHE_SIZE = 64
+_parsers: Dict[str, "Parser"] = {}
+_enhancers: Dict[str, "ASTEnhancer"] = {}
+_tree_cache: "OrderedDict[Tuple[str, bytes], object]" = OrderedDict()
+
+
+def get_cached_parser(language: str) -> "Parser":
+    """获取当前进程中该语言的解析器 (首次调用时创建)"""
+    parser = _parsers.get(language)
+    if parser is None:
+        parser = get_parser(language)
+        _parsers[language] = parser
+    return parser
+
+
+def get_enhancer(language: str = "c") -> "ASTEnhancer":
+    """获取当前进程中该语言的增强器 (首次调用时创建)"""
+    enhancer = _enhancers.get(language)
+    if enhancer is None:
+        enhancer = ASTEnhancer(language)
+        _enhancers[language] = enhancer
+    return enhancer
+
+
+def clear_tree_cache():
+    _tree_cache.clear()
+
 
 class ASTEnhancer:
     """AST 增强器"""
@@ -25,7 +56,7 @@ class ASTEnhancer:
         
         # 使用 tree-sitter-languages 简化的 API
         try:
-            self.parser = get_parser(language)
+            self.parser = get_cached_parser(language)
             logging.info(f"ASTEnhancer initialized for language: {language}")
         except Exception as e:
             raise RuntimeError(f"Failed to initialize parser for {language}: {e}")
@@ -49,7 +80,7 @@ class ASTEnhancer:
             return slice_lines
         
         # 解析 AST
-        tree = self.parser.parse(bytes(source_code, "utf8"))
+        tree = self._parse(source_code)
         root = tree.root_node
         
         # 转换为相对行号（tree-sitter 使用 0-based，源代码从第1行开始）
@@ -83,6 +114,20 @@ class ASTEnhancer:
         
         return abs_enhanced_lines
     
+    def _parse(self, source_code: str):
+        """解析函数代码，相同代码直接复用缓存的语法树"""
+        data = bytes(source_code, "utf8")
+        key = (self.language, hashlib.sha1(data).digest())
+        tree = _tree_cache.get(key)
+        if tree is not None:
+            _tree_cache.move_to_end(key)
+            return tree
+        tree = self.parser.parse(data)
+        _tree_cache[key] = tree
+        if len(_tree_cache) > TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+        return tree
+    
     def _find_function_node(self, root: Node, target_line: int) -> Node:
         """查找包含目标行的函数节点"""
         
@@ -312,7 +357,7 @@ def enhance_slice_with_ast(source_code: str,
         return slice_lines
     
     try:
-        enhancer = ASTEnhancer(language)
+        enhancer = get_enhancer(language)
         return enhancer.enhance_slice(source_code, slice_lines, function_start_line)
     except Exception as e:
         logging.error(f"AST enhancement failed: {e}")
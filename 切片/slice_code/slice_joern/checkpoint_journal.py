@@ -0,0 +1,169 @@
+"""
+切片断点日志
+checkpoint.json 保存压缩后的快照，checkpoint.jsonl 只追加记录快照之后完成的任务，
+每条任务不再重写整个断点文件。
+
+日志每行一条记录:
+    {"type": "task", "index": ..., "status": ...}   已完成的任务索引及状态
+    {"type": "chunk", "index": ...}                  已保存的 chunk 编号
+
+记录先写入内存缓冲区，每累积 flush_every 条或距上次落盘超过 flush_interval 秒时
+批量写入并 fsync；保存 chunk 时强制落盘。进程崩溃最多丢失最后一批未落盘的记录
+(这些任务在续跑时重新处理)，且不会破坏已有内容。
+"""
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+
+
+def empty_checkpoint() -> Dict:
+    return {"processed_indices": [], "failed_indices": [], "chunk_count": 0}
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = 2):
+    """先写临时文件再替换，避免崩溃时留下写了一半的 JSON"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def truncate_partial_line(path: str, block_size: int = 4096):
+    """截掉崩溃时留下的不完整最后一行，否则之后追加的记录会接在这一行后面一起被丢弃"""
+    with open(path, 'rb+') as f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - block_size, 0)
+            f.seek(start)
+            pos = f.read(end - start).rfind(b'\n')
+            if pos >= 0:
+                end = start + pos + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+
+
+class CheckpointJournal:
+    """
+    追加写入的断点日志
+
+    Args:
+        snapshot_path: 压缩快照 (旧版 checkpoint.json 格式，额外记录 failed_indices)
+        journal_path: 追加日志 (JSON Lines)
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 flush_every: int = 100, flush_interval: float = 5.0):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict] = []
+        self._last_flush = time.time()
+        self._file = None
+
+    def load(self) -> Dict:
+        """
+        读取快照并重放日志，然后把结果压缩回快照、清空日志
+
+        Returns:
+            {"processed_indices": [...], "failed_indices": [...], "chunk_count": N}
+        """
+        checkpoint = empty_checkpoint()
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    checkpoint.update(json.load(f))
+            except Exception as e:
+                logging.warning(f"Failed to load checkpoint snapshot: {e}")
+
+        processed = set(checkpoint["processed_indices"])
+        failed = set(checkpoint["failed_indices"])
+        chunk_count = checkpoint["chunk_count"]
+        replayed = 0
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时可能留下不完整的最后一行，忽略即可
+                        continue
+                    if record.get('type') == 'task':
+                        index = record['index']
+                        processed.add(index)
+                        if record.get('status') == 'success':
+                            failed.discard(index)
+                        else:
+                            failed.add(index)
+                        replayed += 1
+                    elif record.get('type') == 'chunk':
+                        chunk_count = max(chunk_count, record['index'])
+
+        checkpoint = {
+            "processed_indices": sorted(processed),
+            "failed_indices": sorted(failed),
+            "chunk_count": chunk_count
+        }
+        if replayed or os.path.exists(self.journal_path):
+            self._compact(checkpoint)
+        return checkpoint
+
+    def _compact(self, checkpoint: Dict):
+        """写入新快照后再删除日志；两步之间崩溃只会导致重放已包含在快照中的记录"""
+        output_dir = os.path.dirname(self.snapshot_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        write_json_atomic(self.snapshot_path, checkpoint, indent=None)
+        os.remove(self.journal_path)
+
+    def open(self):
+        output_dir = os.path.dirname(self.journal_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def record_task(self, index: int, status: str):
+        """记录一个已完成的任务"""
+        self._buffer.append({'type': 'task', 'index': index, 'status': status})
+        if len(self._buffer) >= self.flush_every or time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def record_chunk(self, chunk_index: int):
+        """记录 chunk 已保存，并立即落盘"""
+        self._buffer.append({'type': 'chunk', 'index': chunk_index})
+        self.flush()
+
+    def flush(self):
+        """将缓冲区写入文件并 fsync"""
+        if not self._buffer:
+            return
+        if self._file is None:
+            self.open()
+        self._file.write(''.join(json.dumps(r) + '\n' for r in self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+        self._last_flush = time.time()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """删除快照和日志 (重新开始处理)"""
+        self._buffer = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
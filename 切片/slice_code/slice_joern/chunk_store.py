@@ -0,0 +1,271 @@
+"""
+切片结果的分块存储
+每个 chunk 保存为 JSON Lines 文件 (每行一个结果)，写完后向索引文件追加一行:
+    {"chunk": N, "file": "...", "stats": {...}, "records": [[任务索引, 偏移, 长度, 摘要], ...]}
+合并时只读取索引，按任务索引顺序逐条从 chunk 文件中取出结果写入最终文件，
+内存占用与结果大小无关；摘要和统计直接来自索引，不需要重新解析结果。
+"""
+import os
+import gzip
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+CHUNK_PREFIX = 'slices_chunk_'
+CHUNK_INDEX_FILE = 'slices_chunks_index.jsonl'
+
+
+def chunk_file_name(chunk_index: int) -> str:
+    return f"{CHUNK_PREFIX}{chunk_index:04d}.jsonl"
+
+
+def summarize_result(r: Dict, with_metadata: bool = True) -> Dict:
+    """单个结果的摘要"""
+    summary_item = {
+        "project": r.get("project"),
+        "file": r.get("file"),
+        "line": r.get("line"),
+        "status": r.get("status"),
+        "function_name": r.get("function_name"),
+        "backend": r.get("backend"),
+        "slice_lines_count": len(r.get("slice_lines", [])),
+        "enhanced_lines_count": len(r.get("enhanced_slice_lines", []))
+    }
+    if with_metadata:
+        summary_item["metadata"] = r.get("metadata", {})
+    if r.get("status") == "error":
+        summary_item["error"] = r.get("error")
+        summary_item["failure_class"] = r.get("failure_class")
+    return summary_item
+
+
+def new_stats() -> Dict:
+    return {"total": 0, "success": 0, "error": 0, "slice_lines": 0, "enhanced_lines": 0}
+
+
+def add_stats(stats: Dict, summary_item: Dict):
+    """把一个结果计入统计"""
+    stats["total"] += 1
+    if summary_item.get("status") == "success":
+        stats["success"] += 1
+    else:
+        stats["error"] += 1
+    stats["slice_lines"] += summary_item.get("slice_lines_count", 0)
+    stats["enhanced_lines"] += summary_item.get("enhanced_lines_count", 0)
+
+
+def write_chunk(output_dir: str, chunk_index: int, records: List[Tuple[int, Dict]]) -> Dict:
+    """
+    写入一个 chunk 并追加索引
+
+    Args:
+        records: (任务索引, 结果) 列表
+
+    Returns:
+        该 chunk 的统计
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = chunk_file_name(chunk_index)
+    entries = []
+    stats = new_stats()
+    offset = 0
+    with open(os.path.join(output_dir, name), 'wb') as f:
+        for task_index, result in records:
+            data = (json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8')
+            f.write(data)
+            summary_item = summarize_result(result)
+            add_stats(stats, summary_item)
+            entries.append([task_index, offset, len(data), summary_item])
+            offset += len(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # chunk 文件落盘后才写索引，索引中出现的 chunk 一定是完整的
+    index_line = json.dumps({"chunk": chunk_index, "file": name, "stats": stats, "records": entries},
+                            ensure_ascii=False) + '\n'
+    with open(os.path.join(output_dir, CHUNK_INDEX_FILE), 'a', encoding='utf-8') as f:
+        f.write(index_line)
+        f.flush()
+        os.fsync(f.fileno())
+    return stats
+
+
+def load_chunk_index(output_dir: str) -> Dict[int, Dict]:
+    """读取索引 (同一 chunk 编号出现多次时以最后一次为准)"""
+    path = os.path.join(output_dir, CHUNK_INDEX_FILE)
+    chunks: Dict[int, Dict] = {}
+    if not os.path.exists(path):
+        return chunks
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时可能留下不完整的最后一行
+                continue
+            chunks[entry["chunk"]] = entry
+    return chunks
+
+
+def task_order(chunks: Dict[int, Dict]) -> List[Tuple[int, str, int, int, Dict]]:
+    """
+    按任务索引排序的记录位置 (同一任务出现在多个 chunk 中时取较晚的 chunk)
+
+    Returns:
+        [(任务索引, chunk 文件名, 偏移, 长度, 摘要), ...]
+    """
+    latest = {}
+    for chunk_index in sorted(chunks):
+        entry = chunks[chunk_index]
+        for task_index, offset, length, summary_item in entry["records"]:
+            latest[task_index] = (task_index, entry["file"], offset, length, summary_item)
+    return [latest[i] for i in sorted(latest)]
+
+
+def legacy_chunk_files(output_dir: str) -> List[str]:
+    """旧格式 (JSON 数组) 的 chunk 文件"""
+    if not os.path.isdir(output_dir):
+        return []
+    return sorted(f for f in os.listdir(output_dir)
+                  if f.startswith(CHUNK_PREFIX) and f.endswith('.json') and '_summary' not in f)
+
+
+def clear_chunks(output_dir: str) -> int:
+    """
+    删除所有 chunk 文件和索引 (重新开始处理时调用，否则旧运行中编号更大的 chunk 会覆盖新结果)
+
+    Returns:
+        删除的文件数
+    """
+    if not os.path.isdir(output_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(output_dir):
+        if name == CHUNK_INDEX_FILE or name.startswith(CHUNK_PREFIX):
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+    return removed
+
+
+class _ChunkReader:
+    """按偏移读取 chunk 中的单条记录，只保持少量文件句柄"""
+
+    def __init__(self, output_dir: str, max_open: int = 16):
+        self.output_dir = output_dir
+        self.max_open = max_open
+        self._files: "OrderedDict[str, object]" = OrderedDict()
+
+    def read(self, name: str, offset: int, length: int) -> bytes:
+        f = self._files.get(name)
+        if f is None:
+            if len(self._files) >= self.max_open:
+                _, old = self._files.popitem(last=False)
+                old.close()
+            f = open(os.path.join(self.output_dir, name), 'rb')
+            self._files[name] = f
+        else:
+            self._files.move_to_end(name)
+        f.seek(offset)
+        return f.read(length)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def iter_results(output_dir: str) -> Iterator[Dict]:
+    """逐条返回所有结果 (先是旧格式 chunk，然后按任务索引顺序)"""
+    for name in legacy_chunk_files(output_dir):
+        with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+    reader = _ChunkReader(output_dir)
+    try:
+        for _, name, offset, length, _ in task_order(load_chunk_index(output_dir)):
+            yield json.loads(reader.read(name, offset, length))
+    finally:
+        reader.close()
+
+
+def _open_output(path: str, compress: bool):
+    if compress:
+        return gzip.open(path + '.gz', 'wb', compresslevel=6)
+    return open(path, 'wb')
+
+
+def merged_task_order(output_dirs: List[str]) -> List[Tuple[int, str, int, int, Dict]]:
+    """
+    多个输出目录 (如共享任务队列中各进程的目录) 的记录合并后按任务索引排序，文件名为完整路径
+
+    同一任务出现在多个目录中时 (租约到期后被重新处理) 优先取成功的结果。
+    """
+    merged = {}
+    for output_dir in output_dirs:
+        for task_index, name, offset, length, summary_item in task_order(load_chunk_index(output_dir)):
+            previous = merged.get(task_index)
+            if previous is None or previous[4].get("status") != "success":
+                merged[task_index] = (task_index, os.path.join(output_dir, name), offset, length, summary_item)
+    return [merged[i] for i in sorted(merged)]
+
+
+def merge_chunks(output_dir: str, output_path: str, compress: bool = False) -> Optional[Dict]:
+    """
+    流式合并所有 chunk 为一个 JSON 数组文件 (结果逐条写出，不在内存中聚合)，
+    并根据索引写出摘要文件
+
+    Args:
+        compress: 为 True 时输出 gzip 压缩的 output_path + '.gz'
+
+    Returns:
+        合并结果的统计，没有任何 chunk 时返回 None
+    """
+    return merge_chunk_dirs([output_dir], output_path, compress)
+
+
+def merge_chunk_dirs(output_dirs: List[str], output_path: str, compress: bool = False) -> Optional[Dict]:
+    """合并多个输出目录中的 chunk (见 merge_chunks)"""
+    legacy = [os.path.join(d, name) for d in output_dirs for name in legacy_chunk_files(d)]
+    order = merged_task_order(output_dirs)
+    if not legacy and not order:
+        return None
+
+    stats = new_stats()
+    summary_path = output_path.replace('.json', '_summary.json')
+    tmp_path = output_path + '.tmp'
+    reader = _ChunkReader('')
+    first = True
+    with _open_output(tmp_path, compress) as out, \
+            open(summary_path + '.tmp', 'w', encoding='utf-8') as summary_out:
+        out.write(b'[\n')
+        summary_out.write('[\n')
+
+        def emit(data: bytes, summary_item: Dict):
+            nonlocal first
+            if not first:
+                out.write(b',\n')
+                summary_out.write(',\n')
+            first = False
+            out.write(data.rstrip(b'\n'))
+            summary_out.write(json.dumps(summary_item, ensure_ascii=False))
+            add_stats(stats, summary_item)
+
+        for path in legacy:
+            logging.info(f"  Converting legacy chunk {path}")
+            with open(path, 'r', encoding='utf-8') as f:
+                for r in json.load(f):
+                    emit(json.dumps(r, ensure_ascii=False).encode('utf-8'), summarize_result(r))
+        try:
+            for _, name, offset, length, summary_item in order:
+                emit(reader.read(name, offset, length), summary_item)
+        finally:
+            reader.close()
+
+        out.write(b'\n]\n')
+        summary_out.write('\n]\n')
+
+    final_path = output_path + '.gz' if compress else output_path
+    os.replace(tmp_path + '.gz' if compress else tmp_path, final_path)
+    os.replace(summary_path + '.tmp', summary_path)
+    return stats
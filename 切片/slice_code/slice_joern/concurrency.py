@@ -0,0 +1,169 @@
+"""
+自适应并发控制
+根据系统可用内存、换页、负载和每个工作进程 (含 Joern JVM 子进程) 的常驻内存，
+在 [min_processes, max_processes] 范围内逐步增减活跃工作进程数，并用观测到的吞吐量做爬山:
+增加进程后吞吐量没有明显提升就退回，并在一段时间内不再尝试更高的进程数。
+
+只依赖 /proc (Linux)；读取失败的指标视为未知，不会据此增加进程数。
+"""
+import os
+import time
+import logging
+from typing import Dict, Iterable, Optional
+
+from workspace import mem_available
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def swapped_out_pages() -> Optional[int]:
+    """累计换出页数 (/proc/vmstat 的 pswpout)"""
+    try:
+        with open('/proc/vmstat', 'r') as f:
+            for line in f:
+                if line.startswith('pswpout '):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def load_per_cpu() -> Optional[float]:
+    """1 分钟平均负载 / CPU 核数"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def process_group_rss(pgids: Iterable[int]) -> Dict[int, int]:
+    """
+    各进程组的常驻内存总和 (字节)
+
+    工作进程各自是一个进程组的组长 (见 worker_pool)，组内包括 Joern 等子进程。
+    """
+    wanted = set(pgids)
+    totals = {pgid: 0 for pgid in wanted}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return totals
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm 字段可能包含空格，从最后一个 ')' 之后开始解析
+        fields = stat.rsplit(')', 1)[-1].split()
+        try:
+            pgrp = int(fields[2])
+            if pgrp in wanted:
+                totals[pgrp] += int(fields[21]) * _PAGE_SIZE
+        except (IndexError, ValueError):
+            continue
+    return totals
+
+
+class AdaptiveConcurrency:
+    """
+    自适应并发控制器，作为 WatchdogPool 的 controller 使用 (每轮调度调用一次，返回目标进程数)
+
+    Args:
+        initial / min_processes / max_processes: 初始、最小、最大进程数
+        mem_reserve_bytes: 始终保留的可用内存；低于该值或发生换页时立即减少进程
+        max_load_per_cpu: 平均负载 / 核数 超过该值时减少进程
+        interval: 两次调整之间至少间隔的秒数 (新进程启动 JVM 需要时间，调整过快会误判)
+        min_gain: 增加一个进程后吞吐量至少提升的比例，否则退回
+        ceiling_cooldown: 退回后多少秒内不再尝试更高的进程数
+    """
+
+    def __init__(self, initial: int, min_processes: int = 1, max_processes: Optional[int] = None,
+                 mem_reserve_bytes: int = 2 * 1024 ** 3, max_load_per_cpu: float = 1.0,
+                 interval: float = 60.0, min_gain: float = 0.05, ceiling_cooldown: float = 1800.0):
+        self.min_processes = max(1, min_processes)
+        self.max_processes = max(self.min_processes, max_processes or os.cpu_count() or 1)
+        self.target = min(max(initial, self.min_processes), self.max_processes)
+        self.mem_reserve_bytes = mem_reserve_bytes
+        self.max_load_per_cpu = max_load_per_cpu
+        self.interval = interval
+        self.min_gain = min_gain
+        self.ceiling_cooldown = ceiling_cooldown
+
+        self._last_check = time.time()
+        self._last_completed = 0
+        self._last_swap = swapped_out_pages()
+        self._throughput: Dict[int, float] = {}  # 进程数 -> 最近一次观测到的吞吐量
+        self._grown_from: Optional[int] = None
+        self._ceiling: Optional[int] = None
+        self._ceiling_until = 0.0
+        self.history = []  # [(时间, 目标进程数, 原因)]
+
+    def __call__(self, pool) -> int:
+        now = time.time()
+        if now - self._last_check < self.interval:
+            return self.target
+        elapsed = now - self._last_check
+        self._last_check = now
+
+        completed = pool.completed_count - self._last_completed
+        self._last_completed = pool.completed_count
+        # 只有实际运行着 target 个进程时，吞吐量才代表该进程数
+        if len(pool.workers) >= self.target:
+            self._throughput[self.target] = completed / elapsed
+
+        swap = swapped_out_pages()
+        swapping = swap is not None and self._last_swap is not None and swap > self._last_swap
+        self._last_swap = swap
+        available = mem_available()
+        load = load_per_cpu()
+
+        rss = process_group_rss(pool.workers.keys())
+        per_worker = max(rss.values()) if rss else 0
+
+        if swapping or (available is not None and available < self.mem_reserve_bytes):
+            self._grown_from = None
+            return self._set(self.target - 1, f"memory pressure (available={_gb(available)}, swapping={swapping})")
+        if load is not None and load > self.max_load_per_cpu:
+            self._grown_from = None
+            return self._set(self.target - 1, f"load {load:.2f}/cpu")
+
+        # 上一次增加进程后吞吐量没有明显提升: 退回并暂时封顶
+        if self._grown_from is not None:
+            before = self._throughput.get(self._grown_from, 0.0)
+            after = self._throughput.get(self.target)
+            grown_from, self._grown_from = self._grown_from, None
+            if after is not None and after < before * (1 + self.min_gain):
+                self._ceiling = self.target
+                self._ceiling_until = now + self.ceiling_cooldown
+                return self._set(grown_from, f"no throughput gain ({before:.3f} -> {after:.3f} groups/s)")
+
+        if self.target >= self.max_processes:
+            return self.target
+        if self._ceiling is not None and now < self._ceiling_until and self.target + 1 >= self._ceiling:
+            return self.target
+        if available is None or load is None:
+            return self.target
+        # 再启动一个进程后仍需留出保留内存；还没有工作进程时按保留内存估算
+        if available - (per_worker or self.mem_reserve_bytes) < self.mem_reserve_bytes:
+            return self.target
+        if load > self.max_load_per_cpu * 0.8:
+            return self.target
+
+        self._grown_from = self.target
+        return self._set(self.target + 1, f"headroom (available={_gb(available)}, "
+                                          f"worker rss={_gb(per_worker)}, load={load:.2f}/cpu)")
+
+    def _set(self, target: int, reason: str) -> int:
+        target = min(max(target, self.min_processes), self.max_processes)
+        if target != self.target:
+            logging.info(f"Adaptive concurrency: {self.target} -> {target} processes ({reason})")
+            self.history.append((time.time(), target, reason))
+            self.target = target
+        return self.target
+
+
+def _gb(value: Optional[int]) -> str:
+    return "unknown" if value is None else f"{value / 1024 ** 3:.1f}GB"
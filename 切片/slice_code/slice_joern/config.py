@@ -14,11 +14,43 @@ PDG_DIR = os.path.join(INPUT_DIR, "pdg")
 # 数据文件
 DATA_JSON = os.path.join(INPUT_DIR, "data.json")
 OUTPUT_JSON = os.path.join(OUTPUT_DIR, "slices.json")
+OUTPUT_COMPRESS = False  # 合并结果是否输出为 gzip 压缩的 slices.json.gz
+RESULT_STORE = None  # 合并时同时追加到的压缩结果库目录（可按任务或位置随机读取，见 result_store.py；None 表示不启用）
+
+# Joern 配置
+JOERN_PATH = "/opt/joern-cli"  # Joern 安装目录
+JOERN_SERVER_MODE = False  # 是否使用常驻 Joern 服务 (每个工作进程一个 JVM)
+JOERN_SERVER_STARTUP_TIMEOUT = 180  # Joern 服务启动超时（秒）
+JOERN_SERVER_QUERY_TIMEOUT = 180  # 单次导入+导出查询超时（秒）
+JOERN_TARGETED_EXPORT = False  # 是否只导出包含目标行的方法 (单次 Joern 调用，输出 JSON)
+JOERN_EXPORT_SCRIPT = os.path.join(BASE_DIR, "joern_scripts", "export_methods.sc")  # 定向导出脚本
+
+# 批量模式配置 (每个项目版本只运行一次 Joern 导入，PDG 存入 PDG_DIR)
+BULK_MODE = False  # 是否启用批量模式
+BULK_SHARD_SIZE = None  # 每个分片的源文件数（None 表示整个项目目录一次导入，可获得跨文件上下文）
+BULK_BUILD_TIMEOUT = 3600  # 单个分片导入+导出的超时（秒）
+
+# tree-sitter 快速路径配置 (进程内构建 PDG，不启动 Joern)
+TS_FAST_PATH = False  # 是否对小函数使用 tree-sitter 构建 PDG
+TS_FAST_PATH_MAX_LINES = 50  # 目标行所在函数不超过该行数时使用快速路径
+TS_FALLBACK = True  # 启用快速路径时，Joern 失败或超时是否改用 tree-sitter 构建
+
+# PDG 缓存配置
+PDG_CACHE_DIR = None  # 持久化 PDG 缓存目录（None 表示不启用）
+PDG_CACHE_MAX_BYTES = 20 * 1024 ** 3  # 缓存总大小上限，超过后按 LRU 淘汰
+
+# 切片结果缓存配置 (按所在函数文本跨项目版本复用切片结果，需要 tree-sitter)
+SLICE_CACHE_DIR = None  # 切片结果缓存目录（None 表示不启用）
+
+# 工作目录配置
+WORKSPACE_DIR = None  # 每个工作进程常驻工作目录的位置（如 "/dev/shm"，None 表示系统临时目录）
+WORKSPACE_MIN_FREE_BYTES = 2 * 1024 ** 3  # 可用空间或可用内存低于此值时改用磁盘上的工作目录
 
 # 切片参数
 BACKWARD_DEPTH = 4  # 后向切片深度
 FORWARD_DEPTH = 4   # 前向切片深度
 MIN_SLICE_LINES = 5  # 最小切片行数（少于此数则包含整个函数）
+SLICE_DISTANCE_DEPTH = None  # 记录 BFS 距离标签的最大深度，之后可用 depth_materializer.py 生成更小深度的切片（None 表示不记录）
 
 # AST 修复配置
 ENABLE_AST_FIX = True  # 是否启用 AST 语法修复
@@ -41,7 +73,39 @@ CHUNK_SIZE = 100  # 每个chunk保存的任务数
 ENABLE_CHECKPOINT = True  # 是否启用断点续传
 CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, "checkpoint.json")  # 断点文件
 PROGRESS_FILE = os.path.join(OUTPUT_DIR, "progress.json")  # 进度文件
+CHECKPOINT_JOURNAL = os.path.join(OUTPUT_DIR, "checkpoint.jsonl")  # 断点追加日志（启动时压缩进 CHECKPOINT_FILE）
+CHECKPOINT_FLUSH_EVERY = 100  # 断点日志每累积多少条记录落盘一次
+CHECKPOINT_FLUSH_INTERVAL = 5.0  # 断点日志最长落盘间隔（秒）
+PROGRESS_INTERVAL = 10.0  # 进度文件最短写入间隔（秒）
+TIMING_WINDOW_TASKS = 2000  # 各阶段耗时分位数统计最近多少个任务
+THROUGHPUT_WINDOW = 600  # 吞吐量滑动窗口（秒），剩余时间按窗口内吞吐量估算
+
+# 失败重试与隔离配置
+FAILURE_LOG = os.path.join(OUTPUT_DIR, "failures.jsonl")  # 失败记录（类别、尝试次数、耗时），跨运行保留，--clear 不会删除
+FAILURE_REPORT = os.path.join(OUTPUT_DIR, "failure_report.json")  # 每次运行结束时写出的按文件汇总的失败耗时报告
+RETRY_MAX_ATTEMPTS = 3  # 超时、进程崩溃等暂时性失败最多尝试几次，之后隔离（解析失败、无 PDG、源文件缺失直接隔离）
+RETRY_BACKOFF_BASE = 60  # 第 n 次失败后至少等待 RETRY_BACKOFF_BASE * 2^(n-1) 秒再重试
+RETRY_BACKOFF_MAX = 3600  # 退避时间上限（秒）
+RETRY_MAX_WAIT = 300  # 运行末尾最多为重试等待多久（秒），退避时间更长的任务留到下次运行
+RETRY_QUARANTINED = False  # 是否重新处理已隔离的任务
 
 # 多进程配置
 NUM_PROCESSES = 3  # 并行进程数
 ENABLE_MULTIPROCESSING = True  # 是否启用多进程
+TASK_TIMEOUT = 900  # 单个文件组的基础墙钟时间上限（秒），超时由主进程终止工作进程及其 Joern 子进程
+TASK_TIMEOUT_PER_TASK = 60  # 文件组中每多一个任务增加的时间（秒），Joern 只对每个文件运行一次
+TASK_TIMEOUT_MAX = 3600  # 单个文件组的时间上限（秒），不论组内有多少任务
+MAX_TASKS_PER_WORKER = 200  # 工作进程处理多少个文件组后退出并替换（None 表示不回收）
+ADAPTIVE_CONCURRENCY = False  # 是否根据内存、换页、负载和吞吐量自动调整进程数（NUM_PROCESSES 作为初始值）
+MIN_PROCESSES = 1  # 自适应模式下的最少进程数
+MAX_PROCESSES = None  # 自适应模式下的最多进程数（None 表示 CPU 核数）
+ADAPTIVE_MEM_RESERVE_BYTES = 2 * 1024 ** 3  # 始终保留的可用内存，低于该值或发生换页时减少进程
+ADAPTIVE_MAX_LOAD_PER_CPU = 1.0  # 平均负载 / 核数 超过该值时减少进程
+ADAPTIVE_INTERVAL = 60  # 两次调整之间的最短间隔（秒）
+
+# 共享任务队列配置 (多个进程/主机共享一个 SQLite 数据库动态领取任务，代替静态切分数据集)
+QUEUE_DB = None  # 队列数据库文件（None 表示不启用；必须放在支持 POSIX 文件锁的文件系统上）
+QUEUE_WORKER_ID = None  # 当前进程的标识（None 表示 主机名-进程号），结果写入 OUTPUT_DIR/workers/<标识>/
+QUEUE_LEASE_SECONDS = 300  # 租约时长（秒），进程失联超过该时间后其任务被重新租用
+QUEUE_HEARTBEAT_INTERVAL = 60  # 心跳间隔（秒），应明显短于租约时长
+QUEUE_POLL_INTERVAL = 30  # 剩余任务都被其他进程租用时的等待间隔（秒）
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+按保存的距离标签生成其他深度的切片
+以 SLICE_DISTANCE_DEPTH (或 --distance-depth) 运行后，每个成功结果带有 slice_distances:
+{"max_depth": D, "nodes": [[行号, 后向距离, 前向距离], ...]}。
+深度 (b, f) <= D 的切片就是后向距离 <= b 或前向距离 <= f 的节点，本工具据此重新计算切片行号、
+AST 增强行号、代码和元数据，只读取源文件，不需要 Joern 和 PDG。
+
+用法:
+    python depth_materializer.py --backward-depth 2 --forward-depth 2
+    python depth_materializer.py -i slice_output/slices.json -o slices_d2.json --backward-depth 2 --forward-depth 1
+"""
+import os
+import sys
+import gzip
+import json
+import logging
+import argparse
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+
+import config
+import chunk_store
+from slice_engine import nodes_within
+from single_file_slicer import finish_slice
+
+
+class MaterializeError(Exception):
+    """结果中没有可用的距离标签，或请求的深度超过记录的最大深度"""
+    pass
+
+
+@lru_cache(maxsize=64)
+def _source_lines(project: str, file_path: str) -> List[str]:
+    full_path = os.path.join(config.REPOSITORY_DIR, project, file_path)
+    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.readlines()
+
+
+def slice_metadata(metadata: Dict, nodes: List[List[Optional[int]]],
+                   backward_depth: int, forward_depth: int) -> Dict:
+    """按深度 (backward_depth, forward_depth) 的节点重新计算切片统计 (与 SliceEngine._merge 一致)"""
+    metadata = dict(metadata)
+    slice_lines = {line for line, _, _ in nodes if line}
+    criteria = sum(1 for _, b, _ in nodes if b == 0)
+    start, end = metadata.get("function_start_line"), metadata.get("function_end_line")
+    metadata["backward_nodes"] = sum(1 for _, b, _ in nodes if b is not None and b <= backward_depth)
+    metadata["forward_nodes"] = sum(1 for _, _, f in nodes if f is not None and f <= forward_depth) - criteria
+    metadata["total_slice_nodes"] = len(nodes)
+    metadata["total_slice_lines"] = len(slice_lines)
+    metadata["slice_density"] = len(slice_lines) / (end - start + 1) if end and start else 0
+    return metadata
+
+
+def materialize(result: Dict, backward_depth: int, forward_depth: int,
+                code_lines: Optional[List[str]] = None) -> Dict:
+    """
+    生成一个结果在指定深度下的切片 (返回新的结果，失败的结果原样返回)
+
+    Args:
+        code_lines: 源文件行，为 None 时从 REPOSITORY_DIR 读取
+    """
+    if result.get("status") != "success":
+        return result
+    distances = result.get("slice_distances")
+    if not distances:
+        raise MaterializeError(f"No distance labels in result for {result.get('file')}:{result.get('line')}")
+    if max(backward_depth, forward_depth) > distances["max_depth"]:
+        raise MaterializeError(f"Depth ({backward_depth}, {forward_depth}) exceeds recorded "
+                               f"max depth {distances['max_depth']}")
+
+    if code_lines is None:
+        code_lines = _source_lines(result["project"], result["file"])
+    nodes = nodes_within(distances["nodes"], backward_depth, forward_depth)
+    metadata = slice_metadata(result.get("metadata", {}), nodes, backward_depth, forward_depth)
+    metadata["materialized_depth"] = [backward_depth, forward_depth]
+
+    materialized = dict(result)
+    finish_slice(materialized, {line for line, _, _ in nodes if line}, len(nodes), metadata, code_lines)
+    return materialized
+
+
+def iter_input(path: str) -> Iterator[Dict]:
+    """逐条读取结果: 切片输出目录 (chunk) 或合并后的 slices.json / slices.json.gz"""
+    if os.path.isdir(path):
+        yield from chunk_store.iter_results(path)
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        yield from json.load(f)
+
+
+def materialize_all(input_path: str, output_path: str, backward_depth: int, forward_depth: int) -> Dict:
+    """流式生成 input_path 中所有结果在指定深度下的切片，写为 JSON 数组"""
+    stats = {"total": 0, "success": 0, "error": 0, "skipped": 0}
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[\n')
+        for result in iter_input(input_path):
+            try:
+                result = materialize(result, backward_depth, forward_depth)
+            except (MaterializeError, OSError) as e:
+                # 不能生成该深度的切片时记为错误，不把原深度的结果混入输出
+                logging.warning(f"Cannot materialize {result.get('project')}/{result.get('file')}:{result.get('line')}: {e}")
+                result = {key: result[key] for key in ("project", "file", "line") if key in result}
+                result.update(status="error", error=f"Materialize failed: {e}")
+                stats["skipped"] += 1
+            if stats["total"]:
+                out.write(',\n')
+            json.dump(result, out, ensure_ascii=False)
+            stats["total"] += 1
+            stats["success" if result.get("status") == "success" else "error"] += 1
+        out.write('\n]\n')
+    os.replace(tmp_path, output_path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize slices at a smaller depth from recorded distance labels')
+    parser.add_argument('-i', '--input', type=str, default=config.OUTPUT_DIR,
+                        help='Slice output directory or merged slices.json(.gz) (default: OUTPUT_DIR)')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='Output JSON (default: slices_b<B>_f<F>.json next to OUTPUT_JSON)')
+    parser.add_argument('--backward-depth', type=int, required=True)
+    parser.add_argument('--forward-depth', type=int, required=True)
+    parser.add_argument('--no-ast-fix', action='store_true', help='Skip AST enhancement')
+    args = parser.parse_args()
+
+    if args.no_ast_fix:
+        config.ENABLE_AST_FIX = False
+    output = args.output or os.path.join(os.path.dirname(config.OUTPUT_JSON),
+                                         f"slices_b{args.backward_depth}_f{args.forward_depth}.json")
+
+    stats = materialize_all(args.input, output, args.backward_depth, args.forward_depth)
+    logging.info(f"✓ Materialized {stats['total']} results ({stats['success']} success, "
+                 f"{stats['skipped']} without usable distance labels) into {output}")
+    return 1 if stats["skipped"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+"""
+DOT 快速解析模块
+专为 Joern 导出的 DOT 文件设计的解析器，直接构建紧凑的图结构，
+不经过 pygraphviz / NetworkX
+
+紧凑图 (CompactGraph) 包含:
+- 整数节点编号 (0..n-1)，保留原始 DOT 节点名
+- LINE_NUMBER / NODE_TYPE / CODE 属性列，其余属性按节点稀疏保存
+- 按边类型 (DDG/CDG/CFG/AST/OTHER) 拆分的 CSR 邻接数组 (出边和入边各一份)
+"""
+import re
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+# 边类型
+EDGE_CLASSES = ('DDG', 'CDG', 'CFG', 'AST', 'OTHER')
+_CLASS_INDEX = {name: i for i, name in enumerate(EDGE_CLASSES)}
+
+# 以列形式保存的节点属性
+COLUMN_ATTRS = ('LINE_NUMBER', 'NODE_TYPE', 'CODE')
+
+NO_LINE = -1
+
+
+class DotParseError(Exception):
+    """DOT 解析异常"""
+    pass
+
+
+def edge_class(label: str) -> int:
+    """根据边标签确定边类型编号"""
+    if label.startswith('DDG'):
+        return 0
+    if label.startswith('CDG'):
+        return 1
+    if label.startswith('CFG'):
+        return 2
+    if 'AST' in label:
+        return 3
+    return 4
+
+
+class CompactGraph:
+    """紧凑的有向多重图"""
+
+    def __init__(self, names: List[str], lines: array, node_types: List[Optional[str]],
+                 codes: List[Optional[str]], extra_attrs: List[Optional[Dict[str, str]]],
+                 edge_labels: List[str], out_csr: List[Tuple[array, array, array]],
+                 in_csr: List[Tuple[array, array, array]], graph_name: Optional[str] = None,
+                 edge_orders: Optional[Dict[int, int]] = None):
+        self.names = names
+        self.lines = lines
+        self.node_types = node_types
+        self.codes = codes
+        self.extra_attrs = extra_attrs
+        self.edge_labels = edge_labels
+        # 每个边类型一组 (offsets, neighbors, edge_ids)
+        self.out_csr = out_csr
+        self.in_csr = in_csr
+        self.graph_name = graph_name
+        # 边的 order 属性 (边编号 -> 值)，只记录带该属性的边
+        self.edge_orders = edge_orders or {}
+        self.index = {name: i for i, name in enumerate(names)}
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_labels)
+
+    def edges(self) -> Iterator[Tuple[int, int, str]]:
+        """按原始顺序遍历所有边 (源, 目标, 标签)"""
+        m = self.num_edges
+        src = [0] * m
+        dst = [0] * m
+        for offsets, neighbors, edge_ids in self.out_csr:
+            for node in range(self.num_nodes):
+                for k in range(offsets[node], offsets[node + 1]):
+                    src[edge_ids[k]] = node
+                    dst[edge_ids[k]] = neighbors[k]
+        for e in range(m):
+            yield src[e], dst[e], self.edge_labels[e]
+
+    def node_attrs(self, node: int) -> Dict[str, str]:
+        """还原节点的属性字典 (与 DOT 中的属性一致，值均为字符串)"""
+        attrs = dict(self.extra_attrs[node]) if self.extra_attrs[node] else {}
+        if self.lines[node] != NO_LINE:
+            attrs['LINE_NUMBER'] = str(self.lines[node])
+        if self.node_types[node] is not None:
+            attrs['NODE_TYPE'] = self.node_types[node]
+        if self.codes[node] is not None:
+            attrs['CODE'] = self.codes[node]
+        return attrs
+
+    def get_attr(self, node: int, key: str, default=None):
+        """读取单个节点属性"""
+        if key == 'LINE_NUMBER':
+            return str(self.lines[node]) if self.lines[node] != NO_LINE else default
+        if key == 'NODE_TYPE':
+            return self.node_types[node] if self.node_types[node] is not None else default
+        if key == 'CODE':
+            return self.codes[node] if self.codes[node] is not None else default
+        extra = self.extra_attrs[node]
+        return extra.get(key, default) if extra else default
+
+    def _neighbors(self, csr, node: int, classes: Iterable[int]) -> Iterator[Tuple[int, str]]:
+        labels = self.edge_labels
+        for cls in classes:
+            offsets, neighbors, edge_ids = csr[cls]
+            for k in range(offsets[node], offsets[node + 1]):
+                yield neighbors[k], labels[edge_ids[k]]
+
+    def ordered_successors(self, node: int, label: str) -> List[int]:
+        """
+        某个边类型的出边邻居，按边的 order 属性排序 (没有该属性的边视为 -1)，
+        order 相同时保持边在 DOT 中的顺序
+        """
+        offsets, neighbors, edge_ids = self.out_csr[_CLASS_INDEX[label]]
+        ks = range(offsets[node], offsets[node + 1])
+        orders = self.edge_orders
+        return [neighbors[k] for k in sorted(ks, key=lambda k: orders.get(edge_ids[k], -1))]
+
+    def successors(self, node: int, label: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """
+        出边邻居 (邻居编号, 边标签)
+
+        label 为 None 时返回所有边；为边类型名时直接使用对应的 CSR；
+        其他值按边标签前缀过滤。
+        """
+        return self._filtered(self.out_csr, node, label)
+
+    def predecessors(self, node: int, label: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """入边邻居 (邻居编号, 边标签)，label 的含义同 successors"""
+        return self._filtered(self.in_csr, node, label)
+
+    def _filtered(self, csr, node: int, label: Optional[str]) -> Iterator[Tuple[int, str]]:
+        if label is None:
+            return self._neighbors(csr, node, range(len(EDGE_CLASSES)))
+        if label in _CLASS_INDEX and label != 'OTHER':
+            return self._neighbors(csr, node, (_CLASS_INDEX[label],))
+        return ((n, l) for n, l in self._neighbors(csr, node, range(len(EDGE_CLASSES)))
+                if l.startswith(label))
+
+
+class GraphBuilder:
+    """增量构建 CompactGraph (DOT 解析、JSON 导出等共用)"""
+
+    def __init__(self, keep_attrs: Optional[Set[str]] = None):
+        """
+        Args:
+            keep_attrs: 需要保留的非列属性名集合，None 表示全部保留
+        """
+        self.keep_attrs = keep_attrs
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.lines = array('l')
+        self.node_types: List[Optional[str]] = []
+        self.codes: List[Optional[str]] = []
+        self.extra_attrs: List[Optional[Dict[str, str]]] = []
+        self.edges: List[Tuple[int, int, str]] = []
+        self.edge_orders: Dict[int, int] = {}
+        self.graph_name: Optional[str] = None
+
+    def node(self, name: str) -> int:
+        """获取节点编号，不存在时创建"""
+        idx = self.index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.index[name] = idx
+            self.names.append(name)
+            self.lines.append(NO_LINE)
+            self.node_types.append(None)
+            self.codes.append(None)
+            self.extra_attrs.append(None)
+        return idx
+
+    def add_node(self, name: str, attrs: Optional[Dict[str, str]] = None) -> int:
+        """添加节点或更新其属性"""
+        idx = self.node(name)
+        if attrs:
+            self.set_attrs(idx, attrs)
+        return idx
+
+    def set_attrs(self, idx: int, attrs: Dict[str, str]):
+        keep = self.keep_attrs
+        for key, value in attrs.items():
+            if key == 'LINE_NUMBER':
+                try:
+                    self.lines[idx] = int(value)
+                except (TypeError, ValueError):
+                    pass
+            elif key == 'NODE_TYPE':
+                self.node_types[idx] = value
+            elif key == 'CODE':
+                self.codes[idx] = value
+            elif keep is None or key in keep:
+                if self.extra_attrs[idx] is None:
+                    self.extra_attrs[idx] = {}
+                self.extra_attrs[idx][key] = value
+
+    def add_edge(self, src: str, dst: str, label: str = '', order: Optional[int] = None):
+        """添加一条边 (节点不存在时自动创建)；order 为边的 order 属性 (AST 子节点顺序)"""
+        if order is not None:
+            self.edge_orders[len(self.edges)] = order
+        self.edges.append((self.node(src), self.node(dst), label))
+
+    def build(self) -> CompactGraph:
+        n = len(self.names)
+        edge_labels = [label for _, _, label in self.edges]
+        classes = [edge_class(label) for label in edge_labels]
+        out_csr = []
+        in_csr = []
+        for cls in range(len(EDGE_CLASSES)):
+            ids = [e for e, c in enumerate(classes) if c == cls]
+            out_csr.append(_build_csr(n, ids, self.edges, 0))
+            in_csr.append(_build_csr(n, ids, self.edges, 1))
+        return CompactGraph(self.names, self.lines, self.node_types, self.codes,
+                            self.extra_attrs, edge_labels, out_csr, in_csr, self.graph_name,
+                            self.edge_orders)
+
+
+def _build_csr(n: int, edge_ids: List[int], edges: List[Tuple[int, int, str]], side: int):
+    """按 side (0=源, 1=目标) 构建 CSR，邻居为边的另一端，保持边的原始顺序"""
+    counts = [0] * (n + 1)
+    for e in edge_ids:
+        counts[edges[e][side] + 1] += 1
+    for i in range(n):
+        counts[i + 1] += counts[i]
+    offsets = array('l', counts)
+    neighbors = array('l', [0] * len(edge_ids))
+    ids = array('l', [0] * len(edge_ids))
+    cursor = list(counts)
+    other = 1 - side
+    for e in edge_ids:
+        node = edges[e][side]
+        pos = cursor[node]
+        neighbors[pos] = edges[e][other]
+        ids[pos] = e
+        cursor[node] = pos + 1
+    return offsets, neighbors, ids
+
+
+# ---------------------------------------------------------------------------
+# DOT 词法与语法
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+|//[^\n]*|/\*.*?\*/|\#[^\n]*)
+  | (?P<qstr>"(?:[^"\\]|\\.)*")
+  | (?P<arrow>->|--)
+  | (?P<punct>[\[\]{}=;,:+])
+  | (?P<id>[^\W\d]\w*|-?(?:\.\d+|\d+(?:\.\d*)?))
+  | (?P<html><)
+''', re.VERBOSE | re.DOTALL)
+
+_KEYWORDS = {'graph', 'digraph', 'subgraph', 'node', 'edge', 'strict'}
+
+
+def _unquote(s: str) -> str:
+    """去掉 DOT 字符串的引号，只处理 \\" 和续行符 (与 graphviz 行为一致)"""
+    s = s[1:-1]
+    if '\\' in s:
+        s = s.replace('\\\r\n', '').replace('\\\n', '').replace('\\"', '"')
+    return s
+
+
+def _tokenize(text: str) -> Iterator[Tuple[str, str]]:
+    """生成 (类型, 值) 词法单元，类型为 'id' / 'arrow' / 'punct'"""
+    pos = 0
+    length = len(text)
+    match = _TOKEN_RE.match
+    while pos < length:
+        m = match(text, pos)
+        if m is None:
+            raise DotParseError(f"Unexpected character {text[pos]!r} at offset {pos}")
+        kind = m.lastgroup
+        if kind == 'ws':
+            pos = m.end()
+            continue
+        if kind == 'html':
+            # HTML 字符串: 匹配成对的尖括号
+            depth = 0
+            end = pos
+            while end < length:
+                c = text[end]
+                if c == '<':
+                    depth += 1
+                elif c == '>':
+                    depth -= 1
+                    if depth == 0:
+                        break
+                end += 1
+            if depth != 0:
+                raise DotParseError(f"Unterminated HTML string at offset {pos}")
+            yield 'id', text[pos + 1:end]
+            pos = end + 1
+            continue
+        value = m.group(kind)
+        pos = m.end()
+        if kind == 'qstr':
+            yield 'id', _unquote(value)
+        elif kind == 'id':
+            yield ('kw' if value.lower() in _KEYWORDS else 'id'), value
+        else:
+            yield kind, value
+
+
+class _Parser:
+    """DOT 语法分析 (只处理 Joern / graphviz 输出中出现的子集)"""
+
+    def __init__(self, text: str, builder: GraphBuilder):
+        # 词法单元按需生成，只保留一个前瞻
+        self._tokens = _tokenize(text)
+        self._lookahead = deque()
+        self.builder = builder
+
+    def peek(self) -> Tuple[str, str]:
+        if not self._lookahead:
+            self._lookahead.append(next(self._tokens, ('eof', '')))
+        return self._lookahead[0]
+
+    def next(self) -> Tuple[str, str]:
+        tok = self.peek()
+        self._lookahead.popleft()
+        return tok
+
+    def expect(self, kind: str, value: Optional[str] = None) -> str:
+        k, v = self.next()
+        if k != kind or (value is not None and v != value):
+            raise DotParseError(f"Expected {value or kind}, got {v!r}")
+        return v
+
+    def parse(self):
+        # [strict] (graph|digraph) [ID] { stmt_list }
+        k, v = self.peek()
+        if k == 'kw' and v.lower() == 'strict':
+            self.next()
+        self.expect('kw')
+        if self.peek()[0] == 'id':
+            self.builder.graph_name = self.next()[1]
+        self.expect('punct', '{')
+        self.parse_stmt_list()
+        self.expect('punct', '}')
+
+    def parse_stmt_list(self):
+        while True:
+            k, v = self.peek()
+            if k == 'eof' or (k == 'punct' and v == '}'):
+                return
+            if k == 'punct' and v == ';':
+                self.next()
+                continue
+            self.parse_stmt()
+
+    def parse_stmt(self):
+        k, v = self.peek()
+        if k == 'kw':
+            kw = v.lower()
+            self.next()
+            if kw == 'subgraph':
+                if self.peek()[0] == 'id':
+                    self.next()
+                self.expect('punct', '{')
+                self.parse_stmt_list()
+                self.expect('punct', '}')
+            else:
+                # graph / node / edge 默认属性，切片不需要
+                if self.peek() == ('punct', '['):
+                    self.parse_attr_list()
+            return
+
+        if k == 'punct' and v == '{':
+            # 匿名子图
+            self.next()
+            self.parse_stmt_list()
+            self.expect('punct', '}')
+            return
+
+        name = self.parse_node_id()
+
+        if self.peek() == ('punct', '='):
+            # 图属性 ID = ID
+            self.next()
+            self.expect('id')
+            return
+
+        if self.peek()[0] == 'arrow':
+            chain = [name]
+            while self.peek()[0] == 'arrow':
+                self.next()
+                chain.append(self.parse_node_id())
+            attrs = self.parse_attr_list() if self.peek() == ('punct', '[') else {}
+            label = attrs.get('label', '')
+            try:
+                order = int(attrs['order']) if 'order' in attrs else None
+            except ValueError:
+                order = None
+            for src, dst in zip(chain, chain[1:]):
+                self.builder.add_edge(src, dst, label, order)
+            return
+
+        attrs = self.parse_attr_list() if self.peek() == ('punct', '[') else {}
+        self.builder.add_node(name, attrs)
+
+    def parse_node_id(self) -> str:
+        name = self.expect('id')
+        # 忽略端口 (node:port[:compass])
+        while self.peek() == ('punct', ':'):
+            self.next()
+            self.expect('id')
+        return name
+
+    def parse_attr_list(self) -> Dict[str, str]:
+        attrs = {}
+        while self.peek() == ('punct', '['):
+            self.next()
+            while True:
+                k, v = self.peek()
+                if k == 'punct' and v == ']':
+                    self.next()
+                    break
+                if k == 'punct' and v in ',;':
+                    self.next()
+                    continue
+                if k == 'eof':
+                    raise DotParseError("Unexpected end of input in attribute list")
+                key = self.next()[1]
+                if self.peek() == ('punct', '='):
+                    self.next()
+                    value = self.expect('id')
+                    # "a" + "b" 字符串拼接
+                    while self.peek() == ('punct', '+'):
+                        self.next()
+                        value += self.expect('id')
+                    attrs[key] = value
+                else:
+                    attrs[key] = 'true'
+        return attrs
+
+
+def parse_dot(text: str, keep_attrs: Optional[Set[str]] = None,
+              builder: Optional[GraphBuilder] = None) -> CompactGraph:
+    """
+    解析 DOT 文本
+
+    Args:
+        text: DOT 文本
+        keep_attrs: 需要保留的非列属性名，None 表示全部保留
+        builder: 可选的已有构建器 (用于把多个 DOT 合并成一张图)
+
+    Returns:
+        CompactGraph
+    """
+    builder = builder or GraphBuilder(keep_attrs)
+    _Parser(text, builder).parse()
+    return builder.build()
+
+
+def read_dot(path: str, keep_attrs: Optional[Set[str]] = None) -> CompactGraph:
+    """读取并解析 DOT 文件"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return parse_dot(f.read(), keep_attrs)
+
+
+class _HeaderFound(Exception):
+    """内部使用: 找到 METHOD 节点时中止解析"""
+
+    def __init__(self, attrs: Dict[str, str]):
+        super().__init__()
+        self.attrs = attrs
+
+
+class _HeaderBuilder(GraphBuilder):
+    """只关心 METHOD 节点属性的构建器，找到后立即中止解析"""
+
+    def set_attrs(self, idx: int, attrs: Dict[str, str]):
+        if attrs.get('NODE_TYPE') == 'METHOD':
+            raise _HeaderFound(attrs)
+
+
+def read_method_header(path: str, chunk_size: int = 1 << 16) -> Optional[Dict[str, str]]:
+    """
+    只读取 PDG 文件中 METHOD 节点的属性，不构建整张图
+
+    METHOD 节点通常在文件开头，先只解析前 chunk_size 字节，
+    找不到时再解析整个文件。
+
+    Returns:
+        METHOD 节点属性字典，文件中没有 METHOD 节点时返回 None
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read(chunk_size)
+        complete = len(text) < chunk_size
+        while True:
+            try:
+                _Parser(text, _HeaderBuilder()).parse()
+            except _HeaderFound as found:
+                return found.attrs
+            except DotParseError:
+                # 截断处可能产生语法错误，读完整个文件后再试
+                if complete:
+                    raise
+            if complete:
+                return None
+            text += f.read()
+            complete = True
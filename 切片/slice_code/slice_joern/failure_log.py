@@ -0,0 +1,215 @@
+"""
+失败任务的分类、重试和隔离
+每个失败的任务按错误信息归类，追加到 FAILURE_LOG (JSON Lines，跨运行保留):
+    {"type": "fail", "index": ..., "project": ..., "file": ..., "class": ..., "error": ..., "seconds": ..., "at": ...}
+    {"type": "ok", "index": ...}        之前失败的任务重试成功
+
+- 超时、工作进程崩溃和其他未知错误视为暂时性失败，按指数退避重试，累计 max_attempts 次后隔离
+- Joern 解析/导出失败、目标行没有 PDG、源文件缺失是确定性失败，第一次失败就隔离
+- 隔离的任务在之后的运行中跳过 (--retry-quarantined 时重新处理)
+"""
+import os
+import re
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+
+from checkpoint_journal import write_json_atomic, truncate_partial_line
+
+# 失败类别
+TIMEOUT = 'timeout'
+PARSE_ERROR = 'parse-error'
+NO_PDG = 'no-pdg'
+MISSING_SOURCE = 'missing-source'
+CRASH = 'crash'
+OTHER = 'other'
+
+# 确定性失败: 重试不会有不同的结果
+DETERMINISTIC = {PARSE_ERROR, NO_PDG, MISSING_SOURCE}
+
+# 按顺序匹配错误信息
+_PATTERNS = [
+    (re.compile(r'timeout|timed out|time budget', re.I), TIMEOUT),
+    (re.compile(r'Source file not found|Project directory not found|Failed to read', re.I), MISSING_SOURCE),
+    (re.compile(r'No PDG found', re.I), NO_PDG),
+    (re.compile(r'Joern (server )?(project )?(parse|export) failed|produced no (output|index)|Joern query failed',
+                re.I), PARSE_ERROR),
+    (re.compile(r'Worker exited unexpectedly', re.I), CRASH),
+]
+
+
+def classify_error(error: Optional[str]) -> str:
+    """按错误信息判断失败类别"""
+    for pattern, failure_class in _PATTERNS:
+        if error and pattern.search(error):
+            return failure_class
+    return OTHER
+
+
+def backoff_delay(attempts: int, backoff_base: float, backoff_max: float) -> float:
+    """第 attempts 次失败后到下次重试至少等待的时间 (秒)"""
+    return min(backoff_base * 2 ** (attempts - 1), backoff_max)
+
+
+class FailureLog:
+    """
+    失败记录
+
+    Args:
+        path: 失败记录文件 (JSON Lines)
+        max_attempts: 暂时性失败最多尝试的次数
+        backoff_base: 第 n 次失败后至少等待 backoff_base * 2^(n-1) 秒再重试
+        backoff_max: 退避时间上限 (秒)
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3, backoff_base: float = 60.0, backoff_max: float = 3600.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.tasks: Dict[int, Dict] = {}  # 任务索引 -> 当前仍失败的任务的累计记录
+        self.files: Dict[tuple, Dict] = {}  # (项目, 文件) -> 所有失败的累计耗时 (包括后来成功的)
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下不完整的最后一行
+                    continue
+                self._apply(record)
+
+    def _apply(self, record: Dict):
+        index = record['index']
+        if record.get('type') == 'ok':
+            self.tasks.pop(index, None)
+            return
+        entry = self.tasks.setdefault(index, {"attempts": 0, "seconds": 0.0})
+        entry["attempts"] += 1
+        entry["seconds"] += record.get("seconds") or 0.0
+        for key in ("project", "file", "class", "error", "at"):
+            entry[key] = record.get(key)
+
+        stats = self.files.setdefault((record.get("project"), record.get("file")),
+                                      {"failures": 0, "seconds": 0.0, "timeout_seconds": 0.0, "classes": {}})
+        stats["failures"] += 1
+        stats["seconds"] += record.get("seconds") or 0.0
+        if record.get("class") == TIMEOUT:
+            stats["timeout_seconds"] += record.get("seconds") or 0.0
+        stats["classes"][record.get("class")] = stats["classes"].get(record.get("class"), 0) + 1
+
+    def _append(self, record: Dict):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path):
+                truncate_partial_line(self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._apply(record)
+
+    # ---------- 记录 ----------
+
+    def record(self, index: int, result: Dict, seconds: Optional[float] = None):
+        """
+        记录一个任务的结果 (成功时只在之前失败过的情况下记录)
+
+        Args:
+            seconds: 本次尝试耗费的时间，默认取结果中各阶段耗时之和
+        """
+        if result.get("status") == "success":
+            if index in self.tasks:
+                self._append({"type": "ok", "index": index})
+            return
+        if seconds is None:
+            seconds = sum((result.get("timings") or {}).values())
+        self._append({
+            "type": "fail",
+            "index": index,
+            "project": result.get("project"),
+            "file": result.get("file"),
+            "class": result.get("failure_class") or classify_error(result.get("error")),
+            "error": (result.get("error") or "")[:500],
+            "seconds": round(seconds, 3),
+            "at": time.time()
+        })
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    # ---------- 查询 ----------
+
+    def is_quarantined(self, index: int) -> bool:
+        entry = self.tasks.get(index)
+        if entry is None:
+            return False
+        return entry["class"] in DETERMINISTIC or entry["attempts"] >= self.max_attempts
+
+    def next_retry_at(self, index: int) -> Optional[float]:
+        """可以重试的最早时间，没有失败记录或已隔离时返回 None"""
+        entry = self.tasks.get(index)
+        if entry is None or self.is_quarantined(index):
+            return None
+        return (entry["at"] or 0) + backoff_delay(entry["attempts"], self.backoff_base, self.backoff_max)
+
+    def status(self, index: int, now: Optional[float] = None) -> Optional[str]:
+        """
+        Returns:
+            None (没有失败记录)、'quarantined'、'retry' (可以重试) 或 'backoff' (还在退避时间内)
+        """
+        if index not in self.tasks:
+            return None
+        if self.is_quarantined(index):
+            return 'quarantined'
+        return 'retry' if self.next_retry_at(index) <= (now or time.time()) else 'backoff'
+
+    def summary(self) -> Dict:
+        """当前仍失败的任务按类别统计，以及其中被隔离的数量"""
+        classes: Dict[str, int] = {}
+        for entry in self.tasks.values():
+            classes[entry["class"]] = classes.get(entry["class"], 0) + 1
+        return {
+            "failed_tasks": len(self.tasks),
+            "quarantined_tasks": sum(1 for index in self.tasks if self.is_quarantined(index)),
+            "classes": classes
+        }
+
+    def file_report(self) -> List[Dict]:
+        """按文件汇总失败次数、失败耗费的时间 (其中超时部分) 和被隔离的任务数，耗时多的在前"""
+        quarantined: Dict[tuple, int] = {}
+        for index, entry in self.tasks.items():
+            if self.is_quarantined(index):
+                key = (entry["project"], entry["file"])
+                quarantined[key] = quarantined.get(key, 0) + 1
+        report = []
+        for (project, file_path), stats in self.files.items():
+            report.append({
+                "project": project,
+                "file": file_path,
+                "failures": stats["failures"],
+                "seconds": round(stats["seconds"], 1),
+                "timeout_seconds": round(stats["timeout_seconds"], 1),
+                "classes": stats["classes"],
+                "quarantined_tasks": quarantined.get((project, file_path), 0)
+            })
+        report.sort(key=lambda r: r["seconds"], reverse=True)
+        return report
+
+    def write_report(self, path: str):
+        """写出汇总和按文件的报告"""
+        try:
+            write_json_atomic(path, {"summary": self.summary(), "files": self.file_report()})
+        except Exception as e:
+            logging.warning(f"Failed to write failure report: {e}")
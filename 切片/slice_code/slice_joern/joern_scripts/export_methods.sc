@@ -0,0 +1,123 @@
+// 定向导出: 只导出包含目标行的方法，输出 PDG/CFG 边和切片器用到的节点属性 (JSON)
+//
+// 子进程模式下 single_file_slicer.py 在本文件后拼接一个 @main 调用并用 joern --script 运行；
+// 服务模式下本文件在常驻 JVM 中定义一次，之后每个任务只发送 exportMethods(...) 调用。
+// exportProject 用于批量模式: 整个项目 (或一个分片) 只导入一次，按源文件分别输出。
+//
+// 输出格式:
+//   {"methods": [{"id": "<METHOD id>",
+//                 "nodes": [{"id": "...", "NODE_TYPE": "...", "LINE_NUMBER": "...", ...}],
+//                 "edges": [["<src>", "<dst>", "DDG: x" | "CDG: " | "CFG"], ...]}]}
+
+import scala.jdk.CollectionConverters._
+import java.nio.file.{Files, Paths}
+import io.shiftleft.codepropertygraph.generated.nodes.{CfgNode, MethodParameterIn}
+
+val slicerNodeAttrs = Seq("LINE_NUMBER", "LINE_NUMBER_END", "CODE", "NAME", "FILENAME", "ORDER")
+val slicerEdgeTypes = Seq("REACHING_DEF", "CDG", "CFG")
+
+def slicerJson(s: String): String = {
+  val sb = new StringBuilder("\"")
+  s.foreach {
+    case '"'  => sb.append("\\\"")
+    case '\\' => sb.append("\\\\")
+    case '\n' => sb.append("\\n")
+    case '\r' => sb.append("\\r")
+    case '\t' => sb.append("\\t")
+    case c if c < ' ' => sb.append("\\u%04x".format(c.toInt))
+    case c => sb.append(c)
+  }
+  sb.append("\"").toString
+}
+
+// 与 dotPdg 一致: 方法本身、CFG 节点和形参，以及它们之间的 DDG/CDG/CFG 边
+def slicerMethodJson(m: io.shiftleft.codepropertygraph.generated.nodes.Method): String = {
+  val out = new StringBuilder
+  val nodes = (m :: m.ast.l.filter(n => n.isInstanceOf[CfgNode] || n.isInstanceOf[MethodParameterIn])).distinct
+  val ids = nodes.map(_.id).toSet
+
+  out.append(s"""{"id": "${m.id}", "nodes": [""")
+  nodes.zipWithIndex.foreach { case (n, j) =>
+    if (j > 0) out.append(", ")
+    out.append(s"""{"id": "${n.id}", "NODE_TYPE": ${slicerJson(n.label)}""")
+    val props = n.propertiesMap.asScala
+    slicerNodeAttrs.foreach { k =>
+      props.get(k).foreach(v => out.append(s""", "$k": ${slicerJson(String.valueOf(v))}"""))
+    }
+    out.append("}")
+  }
+
+  out.append("], \"edges\": [")
+  var first = true
+  nodes.foreach { n =>
+    n.outE(slicerEdgeTypes: _*).asScala.foreach { e =>
+      val dst = e.inNode.id
+      if (ids.contains(dst)) {
+        val label = e.label match {
+          case "REACHING_DEF" => "DDG: " + Option(e.property("VARIABLE")).map(String.valueOf).getOrElse("")
+          case "CDG" => "CDG: "
+          case other => other
+        }
+        if (!first) out.append(", ")
+        first = false
+        out.append(s"""["${n.id}", "$dst", ${slicerJson(label)}]""")
+      }
+    }
+  }
+  out.append("]}")
+  out.toString
+}
+
+def exportMethods(inputPath: String, lines: String, outFile: String, projectName: String): Unit = {
+  importCode(inputPath = inputPath, projectName = projectName)
+  try {
+    val targets = lines.split(",").map(_.trim).filter(_.nonEmpty).map(_.toInt).toSet
+    val methods = cpg.method.isExternal(false).l.filter { m =>
+      (m.lineNumber, m.lineNumberEnd) match {
+        case (Some(start), Some(end)) => targets.exists(t => start <= t && t <= end)
+        case _ => false
+      }
+    }
+
+    val out = new StringBuilder("{\"methods\": [")
+    out.append(methods.map(slicerMethodJson).mkString(", "))
+    out.append("]}\n")
+    Files.writeString(Paths.get(outFile), out.toString)
+  } finally {
+    delete(projectName)
+  }
+  println("__SLICER_EXPORT_OK__")
+}
+
+// 批量导出: 导入 inputPath 一次，把 files (相对 inputPath 的路径，逗号分隔；为空表示全部) 中
+// 每个源文件的方法写入 outDir/files/<序号>.json，最后写 outDir/index.json ({"相对路径": "files/<序号>.json"})
+def exportProject(inputPath: String, files: String, outDir: String, projectName: String): Unit = {
+  importCode(inputPath = inputPath, projectName = projectName)
+  try {
+    val root = Paths.get(inputPath).toAbsolutePath.normalize
+    val wanted = files.split(",").map(_.trim).filter(_.nonEmpty).toSet
+    def relative(f: String): String = {
+      val p = Paths.get(f)
+      if (p.isAbsolute) root.relativize(p.normalize).toString else p.normalize.toString
+    }
+
+    val byFile = cpg.method.isExternal(false).l.groupBy(m => relative(m.filename))
+      .filter { case (f, _) => wanted.isEmpty || wanted.contains(f) }
+
+    val filesDir = Paths.get(outDir).resolve("files")
+    Files.createDirectories(filesDir)
+    val index = new StringBuilder("{")
+    byFile.toSeq.sortBy(_._1).zipWithIndex.foreach { case ((f, methods), i) =>
+      Files.writeString(filesDir.resolve(s"$i.json"),
+        "{\"methods\": [" + methods.map(slicerMethodJson).mkString(", ") + "]}\n")
+      if (i > 0) index.append(", ")
+      index.append(s"""${slicerJson(f)}: ${slicerJson(s"files/$i.json")}""")
+    }
+    index.append("}\n")
+    // index.json 最后写入，作为该分片导出完成的标志
+    Files.writeString(Paths.get(outDir).resolve("index.json"), index.toString)
+  } finally {
+    delete(projectName)
+  }
+  println("__SLICER_EXPORT_OK__")
+}
@@ -0,0 +1,168 @@
+"""
+Joern 服务模式
+每个工作进程启动一个常驻的 Joern JVM (joern --server)，通过 HTTP 接口执行查询，
+避免每个任务都为 joern-parse / joern-export 重新启动 JVM
+"""
+import os
+import json
+import socket
+import signal
+import logging
+import subprocess
+import time
+import urllib.request
+import urllib.error
+from typing import Optional
+
+
+class JoernServerError(Exception):
+    """Joern 服务异常"""
+    pass
+
+
+class JoernServerTimeout(JoernServerError):
+    """Joern 查询超时"""
+    pass
+
+
+def _find_free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _die_with_parent():
+    """子进程在父进程退出时收到 SIGTERM (仅 Linux)，避免进程池被终止后残留 JVM"""
+    try:
+        import ctypes
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        PR_SET_PDEATHSIG = 1
+        libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except Exception:
+        pass
+
+
+class JoernServer:
+    """常驻 Joern 进程 - 通过 /query-sync 接口执行 Scala 查询"""
+
+    def __init__(self, joern_path: str, workdir: str,
+                 startup_timeout: float = 180, query_timeout: float = 180):
+        self.joern = os.path.join(joern_path, "joern")
+        self.workdir = workdir
+        self.startup_timeout = startup_timeout
+        self.query_timeout = query_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+        self.restart_count = 0
+
+        if not os.path.exists(self.joern):
+            raise JoernServerError(f"Joern not found at {joern_path}")
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/query-sync"
+
+    def is_running(self) -> bool:
+        """JVM 进程是否存活"""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """启动 Joern 服务并等待其可用"""
+        os.makedirs(self.workdir, exist_ok=True)
+        self.port = _find_free_port()
+
+        logging.info(f"Starting Joern server on port {self.port}...")
+        self.process = subprocess.Popen(
+            [self.joern, '--server', '--server-host', '127.0.0.1', '--server-port', str(self.port)],
+            cwd=self.workdir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            preexec_fn=_die_with_parent if os.name == 'posix' else None
+        )
+
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if not self.is_running():
+                raise JoernServerError(f"Joern server exited during startup (code {self.process.returncode})")
+            try:
+                self.query('1 + 1', timeout=10)
+                logging.info(f"✓ Joern server ready (pid {self.process.pid})")
+                return
+            except JoernServerError:
+                time.sleep(1)
+
+        self.stop()
+        raise JoernServerTimeout(f"Joern server did not become ready within {self.startup_timeout}s")
+
+    def stop(self):
+        """停止 Joern 服务"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def restart(self):
+        """重启 Joern 服务"""
+        logging.warning("Restarting Joern server...")
+        self.restart_count += 1
+        self.stop()
+        self.start()
+
+    def health_check(self) -> bool:
+        """检查服务是否存活且能响应查询"""
+        if not self.is_running():
+            return False
+        try:
+            return '2' in self.query('1 + 1', timeout=10)
+        except JoernServerError:
+            return False
+
+    def ensure_healthy(self):
+        """服务未启动或无响应时 (重新) 启动"""
+        if self.process is None:
+            self.start()
+        elif not self.health_check():
+            self.restart()
+
+    def query(self, query: str, timeout: Optional[float] = None) -> str:
+        """
+        同步执行一条 Scala 查询
+
+        Returns:
+            查询的标准输出
+        """
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"query": query}).encode('utf-8'),
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.query_timeout) as response:
+                body = json.loads(response.read().decode('utf-8'))
+        except socket.timeout:
+            raise JoernServerTimeout("Joern server query timeout")
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, socket.timeout):
+                raise JoernServerTimeout("Joern server query timeout")
+            raise JoernServerError(f"Joern server unreachable: {e.reason}")
+        except (ConnectionError, ValueError) as e:
+            raise JoernServerError(f"Joern server request failed: {e}")
+
+        if not body.get('success', False):
+            raise JoernServerError(f"Joern query failed: {body.get('stderr') or body.get('stdout', '')}")
+        return body.get('stdout', '')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
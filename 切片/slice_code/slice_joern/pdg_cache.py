@@ -0,0 +1,134 @@
+"""
+PDG 磁盘缓存模块
+按 (源文件内容哈希, Joern 版本, 导出选项) 缓存预处理后的方法级 PDG，
+跨运行、跨项目版本复用 Joern 的分析结果
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Optional
+
+from pdg_loader import METHODS_JSON
+
+
+class PDGCache:
+    """
+    内容寻址的 PDG 缓存
+
+    目录结构: <cache_dir>/<key[:2]>/<key>/methods.json (旧版本缓存为 *-pdg.dot)
+    每次命中会刷新条目的修改时间，总大小超过上限时按修改时间淘汰最旧的条目 (LRU)。
+    条目先写入临时目录再原子重命名，多个进程并发写同一个键是安全的。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, evict_every: int = 50):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._puts_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source_file: str, joern_version: str, options: Dict) -> str:
+        """
+        计算缓存键
+
+        Args:
+            source_file: 源文件路径 (只使用其内容和文件名)
+            joern_version: Joern 版本
+            options: 影响导出结果的选项
+
+        Returns:
+            十六进制 sha256 字符串
+        """
+        h = hashlib.sha256()
+        with open(source_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        # PDG 的 FILENAME 属性会按文件名匹配，因此文件名也是键的一部分
+        h.update(os.path.basename(source_file).encode('utf-8'))
+        h.update(joern_version.encode('utf-8'))
+        h.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[str]:
+        """查找缓存条目，命中时返回条目目录并刷新其 LRU 时间"""
+        entry = self._entry_path(key)
+        if os.path.isdir(entry):
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, key: str, pdg_dir: str) -> str:
+        """
+        将 PDG 目录中的 *-pdg.dot 和 methods.json 存入缓存
+
+        Returns:
+            缓存条目目录 (后续可直接从该目录加载 PDG)
+        """
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        staging = tempfile.mkdtemp(prefix=f".{key[:8]}_", dir=os.path.dirname(entry))
+        try:
+            for name in os.listdir(pdg_dir):
+                if name.endswith('-pdg.dot') or name == METHODS_JSON:
+                    shutil.copyfile(os.path.join(pdg_dir, name), os.path.join(staging, name))
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # 其他进程已写入同一个键
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self._puts_since_evict += 1
+        if self._puts_since_evict >= self.evict_every:
+            self.evict()
+        return entry
+
+    def evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除条目"""
+        self._puts_since_evict = 0
+        entries = []
+        total = 0
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                if key.startswith('.'):
+                    continue
+                entry = os.path.join(shard_dir, key)
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(entry))
+                    entries.append((os.stat(entry).st_mtime, size, entry))
+                    total += size
+                except OSError:
+                    continue
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        logging.info(f"PDG cache eviction: removed {removed} entries, {total / 1024 / 1024:.1f} MB remaining")
@@ -1,12 +1,26 @@
 """
 PDG 加载和解析模块
 负责从 Joern 生成的 DOT 文件中加载和解析程序依赖图
+(使用 dot_parser 直接构建紧凑图，不依赖 pygraphviz / NetworkX)
 """
 import os
-import networkx as nx
+import json
+import bisect
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Set
 import logging
 
+from dot_parser import CompactGraph, GraphBuilder, NO_LINE, read_dot, read_method_header
+
+# 定向导出的输出文件名
+METHODS_JSON = 'methods.json'
+
+# 切片流程用到的节点属性 (预处理时只保留这些字段)
+PDG_NODE_ATTRS = ('NODE_TYPE', 'LINE_NUMBER', 'LINE_NUMBER_END', 'CODE', 'NAME', 'FILENAME', 'ORDER')
+
+# 预处理时删除的无意义 DDG 边
+IGNORED_EDGE_LABELS = ('DDG: ', 'DDG: this')
+
 
 class PDGNode:
     """PDG 节点类"""
@@ -14,13 +28,13 @@ class PDGNode:
     def __init__(self, node_id: int, attrs: dict):
         self.node_id = node_id
         self.attrs = attrs
+        # 行号在切片内层循环中频繁访问，只解析一次
+        self._line_number = int(attrs['LINE_NUMBER']) if 'LINE_NUMBER' in attrs else None
         
     @property
     def line_number(self) -> Optional[int]:
         """获取行号"""
-        if 'LINE_NUMBER' in self.attrs:
-            return int(self.attrs['LINE_NUMBER'])
-        return None
+        return self._line_number
     
     @property
     def node_type(self) -> str:
@@ -49,129 +63,255 @@ class PDGNode:
 class PDG:
     """程序依赖图类"""
     
-    def __init__(self, pdg_path: str):
+    def __init__(self, pdg_path: str = None, graph: CompactGraph = None):
+        """
+        Args:
+            pdg_path: PDG DOT 文件路径
+            graph: 已构建好的紧凑图 (不从文件加载时使用)
+        """
         self.pdg_path = pdg_path
-        if not os.path.exists(pdg_path):
-            raise FileNotFoundError(f"PDG file not found: {pdg_path}")
+        self.backend = 'joern'  # 生成该 PDG 的后端 (tree-sitter 快速路径构建的为 'tree-sitter')
+        self.backend_reason: Optional[str] = None  # 使用 tree-sitter 的原因: small-function / joern-failed
+        if graph is None:
+            if not os.path.exists(pdg_path):
+                raise FileNotFoundError(f"PDG file not found: {pdg_path}")
+            
+            # 加载图
+            graph = read_dot(pdg_path)
         
-        # 加载图
-        self.g: nx.MultiDiGraph = nx.nx_agraph.read_dot(pdg_path)
+        self.g: CompactGraph = graph
         
         # 查找 METHOD 节点
         self._method_node = None
-        for node in self.g.nodes():
-            if self.g.nodes[node].get('NODE_TYPE') == 'METHOD':
+        for node, node_type in enumerate(self.g.node_types):
+            if node_type == 'METHOD':
                 self._method_node = node
                 break
         
         if self._method_node is None:
-            raise ValueError(f"No METHOD node found in {pdg_path}")
+            raise ValueError(f"No METHOD node found in {pdg_path or self.g.graph_name}")
+        
+        # 节点对象池：每个节点只创建一个 PDGNode
+        self._nodes: List[Optional[PDGNode]] = [None] * self.g.num_nodes
+        
+        # 行号 -> 节点编号
+        self._line_index: Dict[int, List[int]] = {}
+        for node_id, line in enumerate(self.g.lines):
+            if line != NO_LINE:
+                self._line_index.setdefault(line, []).append(node_id)
+        
+        # 按标签物化的前驱/后继邻接表 (首次按该标签查询时构建)
+        self._pred_adj: Dict[Optional[str], List[List[Tuple[PDGNode, str]]]] = {}
+        self._succ_adj: Dict[Optional[str], List[List[Tuple[PDGNode, str]]]] = {}
+        
+        # 方法的数值属性
+        self._start_line = self._int_attr('LINE_NUMBER')
+        self._end_line = self._int_attr('LINE_NUMBER_END')
+    
+    def _int_attr(self, key: str) -> Optional[int]:
+        value = self.g.get_attr(self._method_node, key)
+        return int(value) if value else None
+    
+    @classmethod
+    def from_graph(cls, graph: CompactGraph, source: str = None) -> 'PDG':
+        """从内存中的紧凑图构建 PDG"""
+        pdg = cls(graph=graph)
+        pdg.pdg_path = source
+        return pdg
     
     @property
     def method_node(self) -> PDGNode:
         """获取方法节点"""
-        return PDGNode(self._method_node, self.g.nodes[self._method_node])
+        return self.get_node(self._method_node)
     
     @property
     def method_name(self) -> Optional[str]:
         """获取方法名"""
-        return self.g.nodes[self._method_node].get('NAME')
+        return self.g.get_attr(self._method_node, 'NAME')
     
     @property
     def start_line(self) -> Optional[int]:
         """获取方法起始行"""
-        line = self.g.nodes[self._method_node].get('LINE_NUMBER')
-        return int(line) if line else None
+        return self._start_line
     
     @property
     def end_line(self) -> Optional[int]:
         """获取方法结束行"""
-        line = self.g.nodes[self._method_node].get('LINE_NUMBER_END')
-        return int(line) if line else None
+        return self._end_line
     
     @property
     def filename(self) -> Optional[str]:
         """获取文件名"""
-        return self.g.nodes[self._method_node].get('FILENAME')
+        return self.g.get_attr(self._method_node, 'FILENAME')
     
     def get_node(self, node_id) -> PDGNode:
         """获取指定节点"""
         if isinstance(node_id, PDGNode):
             node_id = node_id.node_id
-        return PDGNode(node_id, self.g.nodes[node_id])
+        node = self._nodes[node_id]
+        if node is None:
+            node = PDGNode(node_id, self.g.node_attrs(node_id))
+            self._nodes[node_id] = node
+        return node
     
     def get_ast_parent(self, node_id: int) -> Optional[PDGNode]:
         """获取节点的 AST 父节点"""
-        # 在 Joern 的 PDG 导出中，AST 边通常没有特定标签
-        # 我们需要找到指向该节点的、没有标签或标签为 'AST' 的边
-        for pred_id in self.g.predecessors(node_id):
-            # NetworkX 中，多重图的边是 (u, v, key)
-            # key 通常是边的标签
-            for key, data in self.g[pred_id][node_id].items():
-                label = data.get('label', '')
-                # Joern 的 AST 边通常是 'AST'
-                if 'AST' in label:
-                    return self.get_node(pred_id)
+        # Joern 的 AST 边标签包含 'AST'
+        for pred_id, label in self.g.predecessors(node_id, 'AST'):
+            return self.get_node(pred_id)
         return None
 
     def get_ast_children(self, node_id: int) -> List[PDGNode]:
         """获取节点的 AST 子节点"""
-        children = []
-        for succ_id in self.g.successors(node_id):
-            for key, data in self.g[node_id][succ_id].items():
-                label = data.get('label', '')
-                if 'AST' in label:
-                    # 按子节点顺序排序
-                    order = data.get('order', -1)
-                    children.append((self.get_node(succ_id), int(order)))
-        
-        # 根据 order 属性排序
-        return [node for node, order in sorted(children, key=lambda x: x[1])]
+        # 按 AST 边的 order 属性排序 (Joern 导出的边通常没有该属性，此时保持边的顺序)
+        return [self.get_node(succ_id) for succ_id in self.g.ordered_successors(node_id, 'AST')]
 
     def get_nodes_by_line(self, line_number: int) -> List[PDGNode]:
         """根据行号获取节点列表"""
-        nodes = []
-        for node_id in self.g.nodes():
-            node = PDGNode(node_id, self.g.nodes[node_id])
-            if node.line_number == line_number:
-                nodes.append(node)
-        return nodes
+        return [self.get_node(node_id) for node_id in self._line_index.get(line_number, ())]
+    
+    def _adjacency(self, cache: Dict, neighbors, label: Optional[str]) -> List[List[Tuple[PDGNode, str]]]:
+        """获取 (必要时构建) 某个标签的物化邻接表"""
+        adj = cache.get(label)
+        if adj is None:
+            adj = [[(self.get_node(other), edge_label) for other, edge_label in neighbors(node_id, label)]
+                   for node_id in range(self.g.num_nodes)]
+            cache[label] = adj
+        return adj
     
     def get_predecessors(self, node_id, label: Optional[str] = None) -> List[Tuple[PDGNode, str]]:
         """获取前驱节点"""
-        preds = []
-        for pred_id in self.g.predecessors(node_id):
-            for key, edge_data in self.g[pred_id][node_id].items():
-                edge_label = edge_data.get('label', '')
-                if label is None or edge_label.startswith(label):
-                    preds.append((PDGNode(pred_id, self.g.nodes[pred_id]), edge_label))
-        return preds
+        if isinstance(node_id, PDGNode):
+            node_id = node_id.node_id
+        # 返回副本，调用方可以直接 extend
+        return list(self._adjacency(self._pred_adj, self.g.predecessors, label)[node_id])
     
     def get_successors(self, node_id, label: Optional[str] = None) -> List[Tuple[PDGNode, str]]:
         """获取后继节点"""
-        succs = []
-        for succ_id in self.g.successors(node_id):
-            for key, edge_data in self.g[node_id][succ_id].items():
-                edge_label = edge_data.get('label', '')
-                if label is None or edge_label.startswith(label):
-                    succs.append((PDGNode(succ_id, self.g.nodes[succ_id]), edge_label))
-        return succs
+        if isinstance(node_id, PDGNode):
+            node_id = node_id.node_id
+        return list(self._adjacency(self._succ_adj, self.g.successors, label)[node_id])
     
     def __repr__(self):
         return f"PDG({self.method_name}, {self.filename}, lines {self.start_line}-{self.end_line})"
 
 
+def load_pdgs_from_json(json_path: str) -> List[PDG]:
+    """
+    加载定向导出 (joern_scripts/export_methods.sc) 生成的 JSON，每个方法构建一个 PDG
+    
+    与 preprocess_pdg 一致，空的 DDG 边被丢弃。
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    pdgs = []
+    for method in data.get('methods', []):
+        builder = GraphBuilder()
+        for node in method['nodes']:
+            attrs = {k: v for k, v in node.items() if k != 'id'}
+            builder.add_node(node['id'], attrs)
+        for src, dst, label, *order in method['edges']:
+            if label in IGNORED_EDGE_LABELS:
+                continue
+            builder.add_edge(src, dst, label, order[0] if order else None)
+        try:
+            pdgs.append(PDG.from_graph(builder.build(), f"{json_path}#{method['id']}"))
+        except ValueError as e:
+            logging.warning(f"Failed to load method {method['id']} from {json_path}: {e}")
+    return pdgs
+
+
+def dump_pdgs_to_json(pdgs: List[PDG], json_path: str):
+    """将 PDG 按定向导出的 JSON 格式写出 (可由 load_pdgs_from_json 读回)"""
+    methods = []
+    for pdg in pdgs:
+        g = pdg.g
+        nodes = []
+        for node in range(g.num_nodes):
+            item = {'id': g.names[node]}
+            item.update(g.node_attrs(node))
+            nodes.append(item)
+        methods.append({
+            'id': g.names[pdg._method_node],
+            'nodes': nodes,
+            # 带 order 属性的边写为 [源, 目标, 标签, order]
+            'edges': [[g.names[src], g.names[dst], label] + ([g.edge_orders[e]] if e in g.edge_orders else [])
+                      for e, (src, dst, label) in enumerate(g.edges())]
+        })
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'methods': methods}, f, ensure_ascii=False)
+
+
+def read_pdg_header(pdg_path: str) -> Optional[Tuple[Optional[str], Optional[int], Optional[int]]]:
+    """
+    只读取 PDG 文件中 METHOD 节点的 (FILENAME, LINE_NUMBER, LINE_NUMBER_END)，不构建整张图
+
+    Returns:
+        (文件名, 起始行, 结束行)，文件中没有 METHOD 节点时返回 None
+    """
+    attrs = read_method_header(pdg_path)
+    if attrs is None:
+        return None
+    start = attrs.get('LINE_NUMBER')
+    end = attrs.get('LINE_NUMBER_END')
+    return attrs.get('FILENAME'), int(start) if start else None, int(end) if end else None
+
+
+class MethodIntervalIndex:
+    """
+    单个源文件的方法行号区间索引
+
+    区间按起始行排序并记录前缀最大结束行，查询时二分定位后向前扫描，
+    区间可以重叠 (如嵌套函数)。
+    """
+
+    def __init__(self, intervals: List[Tuple[int, int, str]]):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in intervals]
+        self.ends = [end for _, end, _ in intervals]
+        self.paths = [path for _, _, path in intervals]
+        self.max_ends = []
+        max_end = None
+        for end in self.ends:
+            max_end = end if max_end is None else max(max_end, end)
+            self.max_ends.append(max_end)
+
+    def query(self, line_number: int) -> List[str]:
+        """返回包含该行的方法 PDG 路径，起始行越靠后 (越内层) 越靠前"""
+        hits = []
+        i = bisect.bisect_right(self.starts, line_number) - 1
+        while i >= 0 and self.max_ends[i] >= line_number:
+            if self.ends[i] >= line_number:
+                hits.append(self.paths[i])
+            i -= 1
+        return hits
+
+    def __len__(self):
+        return len(self.paths)
+
+
 class PDGLoader:
-    """PDG 加载器"""
+    """
+    PDG 加载器
+
+    构造时只读取每个 PDG 文件的 METHOD 节点 (文件名和行号范围) 并为每个源文件建立区间索引，
+    查询命中时才完整解析对应的 PDG，已加载的 PDG 按 LRU 保留最多 max_loaded 个。
+    """
     
-    def __init__(self, pdg_dir: str):
+    def __init__(self, pdg_dir: str, max_loaded: int = 256):
         self.pdg_dir = pdg_dir
-        self.pdgs: Dict[str, List[PDG]] = {}  # filename -> [PDG]
-        self._load_all_pdgs()
+        self.max_loaded = max_loaded
+        self.method_index: Dict[str, MethodIntervalIndex] = {}  # filename -> 区间索引
+        self.method_paths: Dict[str, List[str]] = {}  # filename -> [PDG 文件路径]
+        self._loaded: 'OrderedDict[str, PDG]' = OrderedDict()
+        self._index_headers()
     
-    def _load_all_pdgs(self):
-        """加载所有 PDG 文件"""
-        logging.info(f"Loading PDGs from {self.pdg_dir}")
+    def _index_headers(self):
+        """扫描所有 PDG 文件的 METHOD 节点，建立索引"""
+        logging.info(f"Indexing PDGs in {self.pdg_dir}")
+        
+        intervals: Dict[str, List[Tuple[int, int, str]]] = {}
         
         # 遍历项目目录
         for project_name in os.listdir(self.pdg_dir):
@@ -186,32 +326,61 @@ class PDGLoader:
                 
                 pdg_path = os.path.join(project_pdg_dir, pdg_file)
                 try:
-                    pdg = PDG(pdg_path)
-                    filename = pdg.filename
-                    
-                    if filename:
-                        if filename not in self.pdgs:
-                            self.pdgs[filename] = []
-                        self.pdgs[filename].append(pdg)
+                    header = read_pdg_header(pdg_path)
+                    if header is None:
+                        raise ValueError("No METHOD node found")
                 except Exception as e:
-                    logging.warning(f"Failed to load {pdg_path}: {e}")
+                    logging.warning(f"Failed to index {pdg_path}: {e}")
+                    continue
+                
+                filename, start_line, end_line = header
+                if not filename:
+                    continue
+                self.method_paths.setdefault(filename, []).append(pdg_path)
+                if start_line and end_line:
+                    intervals.setdefault(filename, []).append((start_line, end_line, pdg_path))
+        
+        self.method_index = {filename: MethodIntervalIndex(items) for filename, items in intervals.items()}
+        logging.info(f"Indexed {sum(len(v) for v in self.method_paths.values())} PDGs from {len(self.method_paths)} files")
+    
+    def load(self, pdg_path: str) -> Optional[PDG]:
+        """加载 (或从 LRU 中取出) 指定的 PDG"""
+        pdg = self._loaded.get(pdg_path)
+        if pdg is not None:
+            self._loaded.move_to_end(pdg_path)
+            return pdg
+        
+        try:
+            pdg = PDG(pdg_path)
+        except Exception as e:
+            logging.warning(f"Failed to load {pdg_path}: {e}")
+            return None
         
-        logging.info(f"Loaded {sum(len(v) for v in self.pdgs.values())} PDGs from {len(self.pdgs)} files")
+        self._loaded[pdg_path] = pdg
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+        return pdg
     
     def find_pdg_for_line(self, filename: str, line_number: int) -> Optional[PDG]:
         """查找包含指定行的 PDG"""
-        if filename not in self.pdgs:
+        if filename not in self.method_paths:
             logging.warning(f"No PDGs found for file: {filename}")
             return None
         
-        for pdg in self.pdgs[filename]:
-            if pdg.start_line and pdg.end_line:
-                if pdg.start_line <= line_number <= pdg.end_line:
-                    return pdg
+        index = self.method_index.get(filename)
+        for pdg_path in (index.query(line_number) if index else []):
+            pdg = self.load(pdg_path)
+            if pdg:
+                return pdg
         
         logging.warning(f"No PDG found for {filename}:{line_number}")
         return None
     
     def get_all_pdgs_for_file(self, filename: str) -> List[PDG]:
         """获取文件的所有 PDG"""
-        return self.pdgs.get(filename, [])
+        pdgs = []
+        for pdg_path in self.method_paths.get(filename, []):
+            pdg = self.load(pdg_path)
+            if pdg:
+                pdgs.append(pdg)
+        return pdgs
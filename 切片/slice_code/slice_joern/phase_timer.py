@@ -0,0 +1,148 @@
+"""
+分阶段计时
+任务处理过程中用 timed(阶段名) 包住各个阶段，耗时累加到当前记录中；
+主进程用 PhaseStats 汇总最近若干任务的各阶段分位数和滑动窗口吞吐量，写入 progress.json。
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+# 记录的阶段名
+PHASES = (
+    'source_load',     # 读取源文件
+    'workspace',       # 准备 / 清空工作目录
+    'pdg_cache',       # PDG 缓存查找与写入
+    'slice_cache',     # 切片结果缓存查找与写入 (命中时包括行号平移和代码提取)
+    'joern_parse',     # joern-parse 生成 CPG
+    'export_pdg',      # joern-export --repr pdg
+    'export_cfg',      # joern-export --repr cfg
+    'export_cpg',      # joern-export --repr all
+    'export_methods',  # 定向导出 (一次 Joern 调用)
+    'joern_server',    # 服务模式下的导入+导出查询
+    'ts_build',        # tree-sitter 构建 PDG (快速路径或 Joern 失败后的回退)
+    'preprocess',      # PDG 预处理
+    'pdg_load',        # 读取 methods.json / DOT
+    'slicing',         # 切片
+    'ast_enhance',     # AST 增强
+    'code_extract',    # 代码提取
+)
+
+_active: Optional[Dict[str, float]] = None
+
+
+@contextmanager
+def timed(phase: str):
+    """把代码块的耗时计入当前记录 (没有正在进行的记录时不做任何事)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _active is not None:
+            _active[phase] = _active.get(phase, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def recording() -> Iterator[Dict[str, float]]:
+    """开始一条新的计时记录，返回 {阶段: 秒}"""
+    global _active
+    previous = _active
+    _active = timings = {}
+    try:
+        yield timings
+    finally:
+        _active = previous
+
+
+def add_timings(target: Dict[str, float], timings: Dict[str, float], scale: float = 1.0):
+    """累加计时记录 (scale 用于把整组共享的耗时平摊到组内每个任务)"""
+    for phase, seconds in timings.items():
+        target[phase] = target.get(phase, 0.0) + seconds * scale
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """已排序序列的分位数 (线性插值)"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+class PhaseStats:
+    """
+    汇总最近 window_tasks 个任务的各阶段耗时，以及最近 window_seconds 秒内的吞吐量
+
+    各阶段耗时是工作进程内的墙钟时间，多进程时吞吐量约为 进程数 / 单任务耗时。
+    """
+
+    def __init__(self, window_tasks: int = 2000, window_seconds: float = 600.0):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Dict[str, float]] = deque(maxlen=window_tasks)
+        self._completions: Deque[float] = deque()
+        self._started = time.time()
+        self.total = 0
+
+    def add(self, timings: Optional[Dict[str, float]]):
+        """记录一个已完成的任务"""
+        now = time.time()
+        self.total += 1
+        self._completions.append(now)
+        self._expire(now)
+        if timings:
+            self._samples.append(timings)
+
+    def _expire(self, now: float):
+        while self._completions and now - self._completions[0] > self.window_seconds:
+            self._completions.popleft()
+
+    def throughput(self) -> float:
+        """滑动窗口内的吞吐量 (任务/秒)；运行时间不足一个窗口时按实际运行时间计算"""
+        now = time.time()
+        self._expire(now)
+        span = min(self.window_seconds, now - self._started)
+        if span <= 0 or not self._completions:
+            return 0.0
+        return len(self._completions) / span
+
+    def phase_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        {阶段: {mean, p50, p90, p99, coverage, share}}
+        
+        平均值和分位数都只统计经过该阶段的任务，coverage 为这些任务占窗口内任务的比例，
+        share 为该阶段占全部阶段总耗时的比例
+        """
+        values: Dict[str, List[float]] = {}
+        for timings in self._samples:
+            for phase, seconds in timings.items():
+                values.setdefault(phase, []).append(seconds)
+        n = len(self._samples)
+        grand_total = sum(sum(v) for v in values.values())
+        summary = {}
+        for phase, samples in values.items():
+            samples.sort()
+            total = sum(samples)
+            summary[phase] = {
+                "mean": total / len(samples),
+                "p50": percentile(samples, 0.5),
+                "p90": percentile(samples, 0.9),
+                "p99": percentile(samples, 0.99),
+                "coverage": len(samples) / n,
+                "share": total / grand_total if grand_total > 0 else 0.0
+            }
+        return summary
+
+    def snapshot(self, remaining: int) -> Dict:
+        """progress.json 中的计时部分"""
+        rate = self.throughput()
+        return {
+            "phases": self.phase_summary(),
+            "sampled_tasks": len(self._samples),
+            "throughput": {
+                "window_seconds": self.window_seconds,
+                "tasks_per_second": rate,
+                "tasks_per_hour": rate * 3600
+            },
+            "eta_seconds": remaining / rate if rate > 0 else None
+        }
@@ -0,0 +1,151 @@
+"""
+项目级 PDG 存储 (批量模式)
+每个项目版本 (或其中一个分片) 只运行一次 Joern 导入，把所有有告警的源文件的方法级 PDG 导出到
+<root>/<项目>/shards/<分片>/，每个源文件一个 JSON (格式同 methods.json)。
+分片导出完成后由 Joern 脚本写入 index.json，主进程再把所有分片的索引合并为 manifest.json，
+之后该项目的任务直接从存储中读取 PDG，不再调用 Joern。
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pdg_loader import PDG, load_pdgs_from_json
+
+MANIFEST = 'manifest.json'
+SHARD_INDEX = 'index.json'
+SHARD_FILES = 'files.json'  # 分片请求导出的文件列表 (没有方法的文件不会出现在 index.json 中)
+SHARD_VERSION = 'joern_version'
+HEADER_SUFFIXES = ('.h', '.hh', '.hpp', '.hxx')
+
+
+def _safe_name(name: str) -> str:
+    return name.replace(os.sep, '_').replace('/', '_')
+
+
+def shard_id(files: Iterable[str]) -> str:
+    """分片标识 (由文件列表决定，重新运行时相同的分片不会重复构建)"""
+    digest = hashlib.sha1('\n'.join(sorted(files)).encode('utf-8')).hexdigest()
+    return digest[:16]
+
+
+def plan_shards(files: Iterable[str], shard_size: Optional[int]) -> List[List[str]]:
+    """
+    把源文件划分为分片：shard_size 为空时整个项目一个分片，否则同一目录的文件尽量放在同一分片
+    """
+    files = sorted(set(files), key=lambda f: (os.path.dirname(f), f))
+    if not shard_size:
+        return [files] if files else []
+    return [files[i:i + shard_size] for i in range(0, len(files), shard_size)]
+
+
+def stage_sources(project_dir: str, files: Iterable[str], code_dir: str) -> int:
+    """
+    把分片中的源文件和项目中的所有头文件按原相对路径放入 code_dir (优先硬链接)，
+    分片导入时仍能看到类型和宏定义
+
+    Returns:
+        放入的文件数
+    """
+    wanted = set(os.path.normpath(f) for f in files)
+    for root, _, names in os.walk(project_dir):
+        for name in names:
+            if name.endswith(HEADER_SUFFIXES):
+                wanted.add(os.path.relpath(os.path.join(root, name), project_dir))
+    count = 0
+    for rel in wanted:
+        source = os.path.join(project_dir, rel)
+        if not os.path.isfile(source):
+            continue
+        target = os.path.join(code_dir, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        count += 1
+    return count
+
+
+class ProjectStore:
+    """一个项目版本的 PDG 存储"""
+
+    def __init__(self, root: str, project: str):
+        self.project = project
+        self.path = os.path.join(root, _safe_name(project))
+        self.files: Dict[str, Optional[str]] = {}  # 相对路径 -> JSON 路径 (None 表示该文件没有方法)
+        self.joern_version: Optional[str] = None
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                self.files = manifest.get('files', {})
+                self.joern_version = manifest.get('joern_version')
+            except Exception as e:
+                logging.warning(f"Failed to load project store manifest {manifest_path}: {e}")
+
+    def shard_dir(self, shard: str) -> str:
+        return os.path.join(self.path, 'shards', shard)
+
+    def is_current(self, joern_version: str) -> bool:
+        """存储是否由当前 Joern 版本生成"""
+        return self.joern_version == joern_version
+
+    def missing(self, files: Iterable[str]) -> List[str]:
+        """尚未导出的源文件"""
+        return [f for f in files if os.path.normpath(f) not in self.files]
+
+    def load(self, file_path: str) -> Optional[List[PDG]]:
+        """读取源文件的所有方法 PDG；存储中没有该文件时返回 None"""
+        key = os.path.normpath(file_path)
+        if key not in self.files:
+            return None
+        rel = self.files[key]
+        if rel is None:
+            return []
+        return load_pdgs_from_json(os.path.join(self.path, rel))
+    
+    def finish_shard(self, shard_dir: str, files: List[str], joern_version: str):
+        """分片导出成功后记录请求的文件列表和 Joern 版本 (合并索引时使用)"""
+        with open(os.path.join(shard_dir, SHARD_FILES), 'w', encoding='utf-8') as f:
+            json.dump(files, f)
+        with open(os.path.join(shard_dir, SHARD_VERSION), 'w', encoding='utf-8') as f:
+            f.write(joern_version)
+
+    def update_manifest(self, joern_version: str):
+        """合并所有已完成分片的索引，写入 manifest.json (版本不同时丢弃旧分片的索引)"""
+        if not self.is_current(joern_version):
+            self.files = {}
+        shards_dir = os.path.join(self.path, 'shards')
+        if os.path.isdir(shards_dir):
+            for shard in sorted(os.listdir(shards_dir)):
+                shard_dir = os.path.join(shards_dir, shard)
+                version_path = os.path.join(shard_dir, SHARD_VERSION)
+                if not os.path.exists(version_path):
+                    # 导出未完成的分片
+                    continue
+                try:
+                    with open(version_path, 'r', encoding='utf-8') as f:
+                        if f.read().strip() != joern_version:
+                            continue
+                    with open(os.path.join(shard_dir, SHARD_INDEX), 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                    with open(os.path.join(shard_dir, SHARD_FILES), 'r', encoding='utf-8') as f:
+                        requested = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Skipping shard {shard} of {self.project}: {e}")
+                    continue
+                for file_path in requested:
+                    self.files.setdefault(os.path.normpath(file_path), None)
+                for file_path, rel in index.items():
+                    self.files[os.path.normpath(file_path)] = os.path.join('shards', shard, rel)
+
+        self.joern_version = joern_version
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"project": self.project, "joern_version": joern_version, "files": self.files}, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
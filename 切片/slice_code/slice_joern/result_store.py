@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+压缩、可随机访问的切片结果库
+结果按任务顺序分成若干块，每块最多 BLOCK_RECORDS 条 JSON Lines，zlib 压缩后追加到 blocks.bin；
+index.db (SQLite) 记录每个块的偏移，以及每个结果所在的块、块内偏移和 (项目, 文件, 行号, 状态)。
+读取单个结果只需解压一个块，按项目/文件/状态筛选的子集只解压包含这些结果的块，不再解析整个 slices.json。
+
+追加时只写入新的或内容有变化的结果，旧的块不会被重写；同一任务再次写入时索引指向新的位置。
+先写块再提交索引，写入中途崩溃只会在 blocks.bin 末尾留下未被索引引用的数据，下次追加前截掉。
+同一时间只能有一个进程写入，读取不受限制。
+
+用法:
+    python result_store.py import slice_output/result_store slice_output
+    python result_store.py get slice_output/result_store 42
+    python result_store.py find slice_output/result_store libpng-1.6.37 png.c 120
+    python result_store.py export slice_output/result_store --project libpng-1.6.37 --status success -o subset.jsonl
+    python result_store.py stats slice_output/result_store
+"""
+import os
+import sys
+import gzip
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+import chunk_store
+
+STORE_FORMAT = 1
+BLOCK_FILE = 'blocks.bin'
+INDEX_FILE = 'index.db'
+BLOCK_RECORDS = 256  # 每块最多多少条结果
+FLUSH_BLOCKS = 16  # 每写多少个块提交一次索引
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    block_id INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,                 -- 在 blocks.bin 中的偏移
+    length INTEGER NOT NULL,                 -- 压缩后的长度
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    task_index INTEGER PRIMARY KEY,
+    project TEXT,
+    file TEXT,
+    line INTEGER,
+    status TEXT,
+    block_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,                  -- 解压后块内的偏移
+    length INTEGER NOT NULL,
+    digest TEXT NOT NULL                     -- 结果内容的摘要，内容不变时不重复写入
+);
+CREATE INDEX IF NOT EXISTS results_location ON results (project, file, line);
+CREATE INDEX IF NOT EXISTS results_status ON results (status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# (任务索引, 结果 JSON 字节, 项目, 文件, 行号, 状态)
+_RawRecord = Tuple[int, bytes, Optional[str], Optional[str], Optional[int], Optional[str]]
+
+
+class ResultStoreError(Exception):
+    """结果库格式不兼容等错误"""
+    pass
+
+
+def _raw_record(task_index: int, result: Dict) -> _RawRecord:
+    data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+    return task_index, data, result.get("project"), result.get("file"), result.get("line"), result.get("status")
+
+
+class ResultStore:
+    """
+    切片结果库
+
+    Args:
+        path: 结果库目录 (不存在时创建)
+        cached_blocks: 读取时缓存多少个解压后的块
+    """
+
+    def __init__(self, path: str, cached_blocks: int = 8, compress_level: int = 6):
+        self.path = path
+        self.compress_level = compress_level
+        self.cached_blocks = cached_blocks
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._reader = None
+        os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, INDEX_FILE), timeout=60)
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None:
+            with self.db:
+                self.db.execute("INSERT INTO meta (key, value) VALUES ('format', ?)", (str(STORE_FORMAT),))
+        elif int(row[0]) != STORE_FORMAT:
+            raise ResultStoreError(f"Unsupported result store format {row[0]} in {path}")
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ---------- 写入 ----------
+
+    def append(self, records: Iterable[Tuple[int, Dict]]) -> int:
+        """
+        追加 (任务索引, 结果)；内容与库中相同的结果跳过
+
+        Returns:
+            实际写入的结果数
+        """
+        return self.append_raw(_raw_record(task_index, result) for task_index, result in records)
+
+    def append_raw(self, records: Iterable[_RawRecord]) -> int:
+        """追加已序列化的结果 (见 append)，导入 chunk 时不需要重新解析 JSON"""
+        digests = dict(self.db.execute("SELECT task_index, digest FROM results"))
+        block_path = os.path.join(self.path, BLOCK_FILE)
+        end, next_block = self.db.execute(
+            "SELECT COALESCE(MAX(offset + length), 0), COALESCE(MAX(block_id), 0) + 1 FROM blocks").fetchone()
+
+        written = 0
+        block: List[Tuple[int, bytes, tuple, str]] = []
+        pending_blocks = []
+        with open(block_path, 'ab') as f:
+            # 丢弃上次崩溃时留下的未被索引引用的数据
+            f.truncate(end)
+
+            def close_block():
+                nonlocal end, next_block, block
+                if not block:
+                    return
+                payload = bytearray()
+                rows = []
+                for task_index, data, location, digest in block:
+                    rows.append((task_index, *location, next_block, len(payload), len(data), digest))
+                    payload += data + b'\n'
+                compressed = zlib.compress(bytes(payload), self.compress_level)
+                f.write(compressed)
+                pending_blocks.append(((next_block, end, len(compressed), len(block)), rows))
+                end += len(compressed)
+                next_block += 1
+                block = []
+                if len(pending_blocks) >= FLUSH_BLOCKS:
+                    flush()
+
+            def flush():
+                # 块落盘后才提交索引
+                f.flush()
+                os.fsync(f.fileno())
+                with self.db:
+                    for block_row, rows in pending_blocks:
+                        self.db.execute("INSERT INTO blocks (block_id, offset, length, count) VALUES (?, ?, ?, ?)",
+                                        block_row)
+                        self.db.executemany(
+                            "INSERT OR REPLACE INTO results (task_index, project, file, line, status, "
+                            "block_id, start, length, digest) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                pending_blocks.clear()
+
+            for task_index, data, project, file_path, line, status in records:
+                digest = hashlib.sha1(data).hexdigest()
+                if digests.get(task_index) == digest:
+                    continue
+                digests[task_index] = digest
+                block.append((task_index, data, (project, file_path, line, status), digest))
+                written += 1
+                if len(block) >= BLOCK_RECORDS:
+                    close_block()
+            close_block()
+            flush()
+        return written
+
+    # ---------- 读取 ----------
+
+    def _read_block(self, block_id: int) -> bytes:
+        data = self._blocks.get(block_id)
+        if data is not None:
+            self._blocks.move_to_end(block_id)
+            return data
+        offset, length = self.db.execute("SELECT offset, length FROM blocks WHERE block_id = ?",
+                                         (block_id,)).fetchone()
+        if self._reader is None:
+            self._reader = open(os.path.join(self.path, BLOCK_FILE), 'rb')
+        self._reader.seek(offset)
+        data = zlib.decompress(self._reader.read(length))
+        self._blocks[block_id] = data
+        if len(self._blocks) > self.cached_blocks:
+            self._blocks.popitem(last=False)
+        return data
+
+    def _raw(self, block_id: int, start: int, length: int) -> bytes:
+        return self._read_block(block_id)[start:start + length]
+
+    def get_raw(self, task_index: int) -> Optional[bytes]:
+        row = self.db.execute("SELECT block_id, start, length FROM results WHERE task_index = ?",
+                              (task_index,)).fetchone()
+        return self._raw(*row) if row else None
+
+    def get(self, task_index: int) -> Optional[Dict]:
+        """按任务索引读取一个结果，不存在时返回 None"""
+        data = self.get_raw(task_index)
+        return json.loads(data) if data is not None else None
+
+    def find(self, project: str, file_path: str, line: Optional[int] = None) -> List[Tuple[int, Dict]]:
+        """按 (项目, 文件[, 行号]) 查找结果"""
+        return list(self.iter(project=project, file_path=file_path, line=line))
+
+    def _query(self, columns: str, project: Optional[str], file_path: Optional[str], line: Optional[int],
+               status: Optional[str], tasks: Optional[Iterable[int]]) -> Iterator[tuple]:
+        conditions, params = [], []
+        for column, value in (("project", project), ("file", file_path), ("line", line), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = " AND ".join(conditions) or "1"
+        if tasks is None:
+            yield from self.db.execute(f"SELECT {columns} FROM results WHERE {where} ORDER BY task_index", params)
+            return
+        # 指定任务列表时分批查询，保持调用方给出的顺序
+        tasks = list(tasks)
+        for i in range(0, len(tasks), 500):
+            batch = tasks[i:i + 500]
+            rows = {row[0]: row for row in self.db.execute(
+                f"SELECT {columns} FROM results WHERE {where} AND task_index IN ({','.join('?' * len(batch))})",
+                params + batch)}
+            for task_index in batch:
+                if task_index in rows:
+                    yield rows[task_index]
+
+    def iter_raw(self, project: Optional[str] = None, file_path: Optional[str] = None, line: Optional[int] = None,
+                 status: Optional[str] = None, tasks: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, bytes]]:
+        """按条件逐条返回 (任务索引, 结果 JSON 字节)"""
+        # 先取出所有位置再读块，避免读取时长时间占用查询游标
+        for task_index, block_id, start, length in list(self._query(
+                "task_index, block_id, start, length", project, file_path, line, status, tasks)):
+            yield task_index, self._raw(block_id, start, length)
+
+    def iter(self, project: Optional[str] = None, file_path: Optional[str] = None, line: Optional[int] = None,
+             status: Optional[str] = None, tasks: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        按条件逐条返回 (任务索引, 结果)
+
+        Args:
+            tasks: 只返回这些任务 (按给出的顺序)；为 None 时按任务索引顺序返回所有符合条件的结果
+        """
+        for task_index, data in self.iter_raw(project, file_path, line, status, tasks):
+            yield task_index, json.loads(data)
+
+    def count(self, project: Optional[str] = None, file_path: Optional[str] = None,
+              status: Optional[str] = None) -> int:
+        return sum(1 for _ in self._query("task_index", project, file_path, None, status, None))
+
+    def stats(self) -> Dict:
+        """结果数、各状态数、块数、文件大小和仍被引用的块所占比例"""
+        statuses = dict(self.db.execute("SELECT status, COUNT(*) FROM results GROUP BY status"))
+        blocks, stored = self.db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM blocks").fetchone()
+        live = self.db.execute(
+            "SELECT COALESCE(SUM(length), 0) FROM blocks WHERE block_id IN (SELECT DISTINCT block_id FROM results)"
+        ).fetchone()[0]
+        return {
+            "results": sum(statuses.values()),
+            "status": statuses,
+            "blocks": blocks,
+            "bytes": stored,
+            "live_block_ratio": live / stored if stored else 1.0
+        }
+
+
+# ---------- 导入 ----------
+
+def import_chunk_dirs(store: ResultStore, output_dirs: List[str]) -> int:
+    """
+    把切片输出目录中的 chunk 导入结果库 (直接复制 JSON 字节，不重新解析)
+
+    多个目录中出现同一任务时优先取成功的结果 (与 chunk_store.merge_chunk_dirs 相同)。
+    """
+    for d in output_dirs:
+        if chunk_store.legacy_chunk_files(d):
+            # 旧格式 chunk 没有记录任务索引，只能通过合并后的 slices.json 导入
+            logging.warning(f"Skipping legacy chunk files in {d}; import the merged slices.json instead")
+
+    written = 0
+    reader = chunk_store._ChunkReader('')
+    try:
+        records = (
+            (task_index, reader.read(name, offset, length).rstrip(b'\n'),
+             summary_item.get("project"), summary_item.get("file"), summary_item.get("line"),
+             summary_item.get("status"))
+            for task_index, name, offset, length, summary_item in chunk_store.merged_task_order(output_dirs)
+        )
+        written += store.append_raw(records)
+    finally:
+        reader.close()
+    return written
+
+
+def import_json(store: ResultStore, path: str) -> int:
+    """
+    导入合并后的 slices.json / slices.json.gz
+
+    合并结果中没有任务索引，以数组下标代替 (只有全部任务都已完成时才与 data.json 中的索引一致)，
+    能直接导入输出目录时优先导入输出目录。下标与已有结果的任务索引无法对应，因此只能导入空的结果库。
+    """
+    if store.count():
+        raise ResultStoreError(f"{path} has no task indices and can only be imported into an empty store")
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        results = json.load(f)
+    return store.append(enumerate(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compressed, seekable slice result store')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('import', help='Append results from slice output directories or merged JSON files')
+    p.add_argument('store')
+    p.add_argument('sources', nargs='*', help='Output directories or slices.json(.gz) (default: OUTPUT_DIR)')
+
+    p = sub.add_parser('get', help='Print the result of one task')
+    p.add_argument('store')
+    p.add_argument('task_index', type=int)
+
+    p = sub.add_parser('find', help='Print the results at a project/file[/line]')
+    p.add_argument('store')
+    p.add_argument('project')
+    p.add_argument('file')
+    p.add_argument('line', type=int, nargs='?')
+
+    p = sub.add_parser('export', help='Write a filtered subset as JSON Lines')
+    p.add_argument('store')
+    p.add_argument('--project')
+    p.add_argument('--file')
+    p.add_argument('--status', choices=['success', 'error'])
+    p.add_argument('--tasks', help='Comma-separated task indices, or @file with one index per line')
+    p.add_argument('-o', '--output', help='Output file (default: stdout)')
+
+    p = sub.add_parser('stats', help='Print store statistics')
+    p.add_argument('store')
+
+    args = parser.parse_args()
+
+    if args.command != 'import' and not os.path.exists(os.path.join(args.store, INDEX_FILE)):
+        print(f"No result store at {args.store}", file=sys.stderr)
+        return 1
+
+    if args.command == 'import':
+        sources = args.sources or [config.OUTPUT_DIR]
+        dirs = [s for s in sources if os.path.isdir(s)]
+        files = [s for s in sources if not os.path.isdir(s)]
+        if files and (dirs or len(files) > 1):
+            # 合并结果按数组下标导入，会覆盖其他来源中按任务索引导入的结果
+            parser.error('a merged JSON file must be the only import source')
+
+    with ResultStore(args.store) as store:
+        if args.command == 'import':
+            try:
+                written = import_chunk_dirs(store, dirs) if dirs else import_json(store, files[0])
+            except ResultStoreError as e:
+                print(e, file=sys.stderr)
+                return 1
+            logging.info(f"✓ Appended {written} new or changed results to {args.store}")
+        elif args.command == 'get':
+            data = store.get_raw(args.task_index)
+            if data is None:
+                print(f"Task {args.task_index} not found", file=sys.stderr)
+                return 1
+            print(json.dumps(json.loads(data), indent=2, ensure_ascii=False))
+        elif args.command == 'find':
+            for task_index, result in store.find(args.project, args.file, args.line):
+                print(json.dumps({"task_index": task_index, **result}, ensure_ascii=False))
+        elif args.command == 'export':
+            tasks = None
+            if args.tasks:
+                if args.tasks.startswith('@'):
+                    with open(args.tasks[1:], 'r', encoding='utf-8') as f:
+                        tasks = [int(line) for line in f if line.strip()]
+                else:
+                    tasks = [int(t) for t in args.tasks.split(',') if t.strip()]
+            out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+            try:
+                for _, data in store.iter_raw(args.project, args.file, None, args.status, tasks):
+                    out.write(data + b'\n')
+            finally:
+                if args.output:
+                    out.close()
+        elif args.command == 'stats':
+            print(json.dumps(store.stats(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -21,6 +21,40 @@ def format_time(iso_string):
         return iso_string
 
 
+def format_duration(seconds):
+    """秒数 -> 可读的时长"""
+    if seconds is None:
+        return "N/A"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}min"
+    return f"{seconds:.2f}s"
+
+
+def show_timing(timing):
+    """显示吞吐量、剩余时间和各阶段耗时 (按占比从高到低，即瓶颈在前)"""
+    throughput = timing.get('throughput', {})
+    print("-" * 60)
+    print(f"吞吐量:       {throughput.get('tasks_per_hour', 0):,.0f} 任务/小时 "
+          f"(最近 {throughput.get('window_seconds', 0) / 60:.0f} 分钟)")
+    print(f"预计剩余:     {format_duration(timing.get('eta_seconds'))}")
+    
+    phases = timing.get('phases', {})
+    if not phases:
+        return
+    print("-" * 60)
+    print(f"阶段耗时 (最近 {timing.get('sampled_tasks', 0):,} 个任务，组内共享阶段已平摊)")
+    print("(平均和分位数只统计经过该阶段的任务，覆盖为这些任务所占比例)")
+    print(f"{'阶段':<16}{'占比':>7}{'覆盖':>7}{'平均':>10}{'p50':>10}{'p90':>10}{'p99':>10}")
+    for name, p in sorted(phases.items(), key=lambda item: item[1].get('share', 0), reverse=True):
+        bar = '#' * int(round(p.get('share', 0) * 20))
+        coverage = f"{p['coverage'] * 100:6.1f}%" if 'coverage' in p else f"{'-':>7}"
+        print(f"{name:<16}{p.get('share', 0) * 100:6.1f}%{coverage}"
+              f"{format_duration(p.get('mean')):>10}{format_duration(p.get('p50')):>10}"
+              f"{format_duration(p.get('p90')):>10}{format_duration(p.get('p99')):>10}  {bar}")
+
+
 def show_progress():
     """显示进度"""
     if not os.path.exists(config.PROGRESS_FILE):
@@ -61,6 +95,10 @@ def show_progress():
             remaining = total - processed
             print(f"剩余任务:     {remaining:,}")
         
+        timing = progress.get('timing')
+        if timing:
+            show_timing(timing)
+        
         print("=" * 60 + "\n")
         
     except Exception as e:
@@ -74,7 +112,7 @@ def show_chunks():
         return
     
     chunk_files = sorted([f for f in os.listdir(config.OUTPUT_DIR) 
-                         if f.startswith('slices_chunk_') and f.endswith('.json')
+                         if f.startswith('slices_chunk_') and f.endswith(('.json', '.jsonl'))
                          and '_summary' not in f])
     
     if not chunk_files:
@@ -92,7 +130,7 @@ def show_chunks():
         chunk_path = os.path.join(config.OUTPUT_DIR, chunk_file)
         try:
             with open(chunk_path, 'r') as f:
-                data = json.load(f)
+                data = json.load(f) if chunk_file.endswith('.json') else f.readlines()
             
             size_mb = os.path.getsize(chunk_path) / 1024 / 1024
             total_items += len(data)
@@ -11,12 +11,30 @@ import tempfile
 import shutil
 from typing import Dict, List, Set, Tuple, Optional
 import traceback
-from multiprocessing import Pool, Manager, Lock
 import time
+import atexit
+import re
 
 import config
-from pdg_loader import PDG, PDGNode
+from pdg_loader import (PDG, PDGNode, METHODS_JSON, PDG_NODE_ATTRS, IGNORED_EDGE_LABELS,
+                        load_pdgs_from_json, dump_pdgs_to_json, read_pdg_header)
+from dot_parser import GraphBuilder, read_dot
 from slice_engine import SliceEngine
+from joern_server import JoernServer, JoernServerError, JoernServerTimeout
+from pdg_cache import PDGCache
+from workspace import Workspace, place_source
+from worker_pool import WatchdogPool
+from concurrency import AdaptiveConcurrency
+from project_store import ProjectStore, plan_shards, shard_id, stage_sources
+from ast_enhancer import TREE_SITTER_AVAILABLE
+from ts_pdg_builder import small_function_pdgs, build_pdgs as build_ts_pdgs
+from slice_cache import SliceCache, function_keys, make_entry, apply_entry
+import chunk_store
+from phase_timer import timed, recording, add_timings, PhaseStats
+from checkpoint_journal import CheckpointJournal, empty_checkpoint, write_json_atomic
+from work_queue import WorkQueue, Heartbeat, default_worker_id
+from result_store import ResultStore, import_chunk_dirs
+from failure_log import FailureLog, DETERMINISTIC, backoff_delay, classify_error
 
 
 logging.basicConfig(
@@ -33,7 +51,7 @@ class SingleFileSlicerException(Exception):
 class JoernAnalyzer:
     """Joern 分析器 - 对单个文件生成 PDG"""
     
-    def __init__(self, joern_path: str = "/opt/joern-cli"):
+    def __init__(self, joern_path: str = config.JOERN_PATH):
         self.joern_path = joern_path
         self.joern_parse = os.path.join(joern_path, "joern-parse")
         self.joern_export = os.path.join(joern_path, "joern-export")
@@ -41,6 +59,32 @@ class JoernAnalyzer:
         # 检查 Joern 是否可用
         if not os.path.exists(self.joern_parse):
             raise SingleFileSlicerException(f"Joern not found at {joern_path}")
+        
+        self._version = None
+    
+    @property
+    def version(self) -> str:
+        """Joern 版本 (从 lib 目录中的 jar 文件名读取，读取失败时使用安装目录)"""
+        if self._version is None:
+            self._version = os.path.realpath(self.joern_path)
+            lib_dir = os.path.join(self.joern_path, 'lib')
+            if os.path.isdir(lib_dir):
+                for name in sorted(os.listdir(lib_dir)):
+                    match = re.match(r'io\.joern\.(?:joern-cli|console)_?[\w.]*?-(\d+\.\d+\.\d+[\w.-]*)\.jar$', name)
+                    if match:
+                        self._version = match.group(1)
+                        break
+        return self._version
+    
+    @property
+    def cache_options(self) -> Dict:
+        """影响 PDG 导出结果的选项 (作为 PDG 缓存键的一部分)"""
+        return {
+            "mode": "subprocess",
+            "language": config.LANGUAGE,
+            "repr": ["pdg", "cfg", "all"],
+            "preprocess": True
+        }
     
     def analyze_file(self, source_file: str, output_dir: str) -> str:
         """
@@ -55,26 +99,22 @@ class JoernAnalyzer:
         """
         logging.info(f"Analyzing file with Joern: {source_file}")
         
-        # 创建临时目录结构
+        # 将源文件放入工作目录 (优先硬链接)
         code_dir = os.path.join(output_dir, "code")
-        os.makedirs(code_dir, exist_ok=True)
-        
-        # 复制源文件到临时目录
-        file_name = os.path.basename(source_file)
-        target_file = os.path.join(code_dir, file_name)
-        shutil.copy2(source_file, target_file)
+        place_source(source_file, code_dir)
         
         # 生成 CPG
         logging.info("Generating CPG...")
         try:
-            subprocess.run(
-                [self.joern_parse, '--language', 'c', os.path.abspath(code_dir)],
-                cwd=output_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                timeout=60
-            )
+            with timed('joern_parse'):
+                subprocess.run(
+                    [self.joern_parse, '--language', 'c', os.path.abspath(code_dir)],
+                    cwd=output_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    timeout=60
+                )
         except subprocess.TimeoutExpired:
             raise SingleFileSlicerException("Joern parse timeout")
         except subprocess.CalledProcessError as e:
@@ -84,14 +124,15 @@ class JoernAnalyzer:
         pdg_dir = os.path.join(output_dir, 'pdg')
         logging.info("Exporting PDG...")
         try:
-            subprocess.run(
-                [self.joern_export, '--repr', 'pdg', '--out', os.path.abspath(pdg_dir)],
-                cwd=output_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                timeout=60
-            )
+            with timed('export_pdg'):
+                subprocess.run(
+                    [self.joern_export, '--repr', 'pdg', '--out', os.path.abspath(pdg_dir)],
+                    cwd=output_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    timeout=60
+                )
         except subprocess.TimeoutExpired:
             raise SingleFileSlicerException("Joern export timeout")
         except subprocess.CalledProcessError as e:
@@ -101,14 +142,15 @@ class JoernAnalyzer:
         cfg_dir = os.path.join(output_dir, 'cfg')
         logging.info("Exporting CFG...")
         try:
-            subprocess.run(
-                [self.joern_export, '--repr', 'cfg', '--out', os.path.abspath(cfg_dir)],
-                cwd=output_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                timeout=60
-            )
+            with timed('export_cfg'):
+                subprocess.run(
+                    [self.joern_export, '--repr', 'cfg', '--out', os.path.abspath(cfg_dir)],
+                    cwd=output_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    timeout=60
+                )
         except Exception as e:
             logging.warning(f"CFG export failed (non-critical): {e}")
         
@@ -116,41 +158,149 @@ class JoernAnalyzer:
         cpg_dir = os.path.join(output_dir, 'cpg')
         logging.info("Exporting CPG...")
         try:
-            subprocess.run(
-                [self.joern_export, '--repr', 'all', '--out', os.path.abspath(cpg_dir)],
-                cwd=output_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                timeout=60
-            )
+            with timed('export_cpg'):
+                subprocess.run(
+                    [self.joern_export, '--repr', 'all', '--out', os.path.abspath(cpg_dir)],
+                    cwd=output_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    timeout=60
+                )
         except Exception as e:
             logging.warning(f"CPG export failed (non-critical): {e}")
         
         logging.info(f"✓ Analysis complete. PDG saved to {pdg_dir}")
         return pdg_dir
     
-    def preprocess_pdg(self, pdg_dir: str, cfg_dir: str, cpg_dir: str):
+    @property
+    def joern(self) -> str:
+        return os.path.join(self.joern_path, "joern")
+    
+    def export_methods(self, source_file: str, target_lines: List[int], output_dir: str) -> str:
         """
-        预处理 PDG：合并 CFG，清理无用边
+        定向导出：一次 Joern 调用只导出包含目标行的方法
         
-        这个函数参考了 Mystique 项目中的 joern.py 的预处理逻辑
+        输出 <output_dir>/pdg/methods.json，已包含 PDG/CFG 边和切片所需的节点属性，无需预处理。
+        
+        Args:
+            source_file: 源文件路径
+            target_lines: 目标行号列表
+            output_dir: 输出目录
+            
+        Returns:
+            PDG 目录路径
         """
-        import networkx as nx
+        logging.info(f"Exporting enclosing methods with Joern: {source_file} {sorted(set(target_lines))}")
         
-        logging.info("Preprocessing PDGs...")
+        code_dir = os.path.join(output_dir, "code")
+        place_source(source_file, code_dir)
         
-        if not os.path.exists(cpg_dir) or not os.path.exists(os.path.join(cpg_dir, 'export.dot')):
-            logging.warning("CPG not found, skipping preprocessing")
-            return
+        pdg_dir = os.path.join(output_dir, 'pdg')
+        os.makedirs(pdg_dir, exist_ok=True)
+        json_path = os.path.join(pdg_dir, METHODS_JSON)
+        
+        # 在导出脚本后拼接一次调用，整个导入+导出只启动一次 JVM
+        script_path = os.path.join(output_dir, 'export_methods.sc')
+        with open(config.JOERN_EXPORT_SCRIPT, 'r', encoding='utf-8') as f:
+            script = f.read()
+        script += "\n@main def exec() = exportMethods({}, {}, {}, {})\n".format(
+            json.dumps(os.path.abspath(code_dir)),
+            json.dumps(format_target_lines(target_lines)),
+            json.dumps(os.path.abspath(json_path)),
+            json.dumps("slice")
+        )
+        with open(script_path, 'w', encoding='utf-8') as f:
+            f.write(script)
         
         try:
-            cpg = nx.nx_agraph.read_dot(os.path.join(cpg_dir, 'export.dot'))
-        except Exception as e:
-            logging.warning(f"Failed to load CPG: {e}")
-            return
+            with timed('export_methods'):
+                subprocess.run(
+                    [self.joern, '--script', os.path.abspath(script_path)],
+                    cwd=output_dir,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True,
+                    timeout=120
+                )
+        except subprocess.TimeoutExpired:
+            raise SingleFileSlicerException("Joern export timeout")
+        except subprocess.CalledProcessError as e:
+            raise SingleFileSlicerException(f"Joern export failed: {e.stderr.decode()}")
         
-        for pdg_file in os.listdir(pdg_dir):
+        if not os.path.exists(json_path):
+            raise SingleFileSlicerException("Joern export produced no output")
+        
+        logging.info(f"✓ Export complete. Methods saved to {json_path}")
+        return pdg_dir
+    
+    def _project_export_call(self, code_dir: str, files: List[str], shard_dir: str, project: str) -> str:
+        return "exportProject({}, {}, {}, {})".format(
+            json.dumps(os.path.abspath(code_dir)),
+            json.dumps(",".join(files)),
+            json.dumps(os.path.abspath(shard_dir)),
+            json.dumps(project)
+        )
+    
+    def export_project(self, code_dir: str, files: List[str], shard_dir: str, output_dir: str):
+        """
+        批量导出：一次 Joern 调用导入 code_dir，把 files (相对 code_dir 的路径) 中每个源文件的方法
+        写入 shard_dir (见 joern_scripts/export_methods.sc 中的 exportProject)
+        """
+        logging.info(f"Exporting project with Joern: {code_dir} ({len(files)} files)")
+        os.makedirs(shard_dir, exist_ok=True)
+        
+        script_path = os.path.join(output_dir, 'export_project.sc')
+        with open(config.JOERN_EXPORT_SCRIPT, 'r', encoding='utf-8') as f:
+            script = f.read()
+        script += "\n@main def exec() = {}\n".format(
+            self._project_export_call(code_dir, files, shard_dir, "slice_project"))
+        with open(script_path, 'w', encoding='utf-8') as f:
+            f.write(script)
+        
+        try:
+            subprocess.run(
+                [self.joern, '--script', os.path.abspath(script_path)],
+                cwd=output_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=True,
+                timeout=config.BULK_BUILD_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            raise SingleFileSlicerException("Joern project export timeout")
+        except subprocess.CalledProcessError as e:
+            raise SingleFileSlicerException(f"Joern project export failed: {e.stderr.decode()[-2000:]}")
+        
+        if not os.path.exists(os.path.join(shard_dir, 'index.json')):
+            raise SingleFileSlicerException("Joern project export produced no index")
+    
+    def preprocess_pdg(self, pdg_dir: str, cfg_dir: str, cpg_dir: str) -> List[PDG]:
+        """
+        预处理 PDG：合并 CFG，清理无用边，从 CPG 复制节点属性
+        
+        这个函数参考了 Mystique 项目中的 joern.py 的预处理逻辑。
+        整个过程在内存中完成并直接返回 PDG 对象，不再写回 DOT 文件；
+        节点属性只保留切片用到的字段 (PDG_NODE_ATTRS)。
+        
+        Returns:
+            PDG 目录中每个方法的 PDG
+        """
+        logging.info("Preprocessing PDGs...")
+        keep_attrs = set(PDG_NODE_ATTRS) | {'label'}
+        
+        cpg = None
+        cpg_path = os.path.join(cpg_dir, 'export.dot')
+        if os.path.exists(cpg_path):
+            try:
+                cpg = read_dot(cpg_path, keep_attrs)
+            except Exception as e:
+                logging.warning(f"Failed to load CPG: {e}")
+        else:
+            logging.warning("CPG not found, node attributes will not be copied")
+        
+        pdgs = []
+        for pdg_file in sorted(os.listdir(pdg_dir)):
             if not pdg_file.endswith('-pdg.dot'):
                 continue
             
@@ -159,58 +309,785 @@ class JoernAnalyzer:
             cfg_path = os.path.join(cfg_dir, f'{file_id}-cfg.dot')
             
             try:
-                pdg_graph = nx.nx_agraph.read_dot(pdg_path)
+                graphs = [read_dot(pdg_path, keep_attrs)]
                 
                 # 加载 CFG（如果存在）
                 if os.path.exists(cfg_path):
-                    cfg_graph = nx.nx_agraph.read_dot(cfg_path)
-                    pdg_graph = nx.compose(pdg_graph, cfg_graph)
+                    graphs.append(read_dot(cfg_path, keep_attrs))
                 
-                # 清理空的 DDG 边
-                edges_to_remove = []
-                for u, v, k, d in pdg_graph.edges(data=True, keys=True):
-                    label = d.get('label', '')
-                    if label in ['DDG: ', 'DDG: this']:
-                        edges_to_remove.append((u, v, k))
+                builder = GraphBuilder()
                 
-                pdg_graph.remove_edges_from(edges_to_remove)
-                
-                # 添加 CFG 标签
-                for u, v, k, d in pdg_graph.edges(data=True, keys=True):
-                    if 'label' not in d:
-                        pdg_graph.edges[u, v, k]['label'] = 'CFG'
-                
-                # 从 CPG 复制节点属性
-                for node in pdg_graph.nodes:
-                    if node in cpg.nodes:
-                        for key, value in cpg.nodes[node].items():
-                            pdg_graph.nodes[node][key] = value
+                # 合并节点属性 (CFG 覆盖 PDG，再从 CPG 复制)，只保留切片用到的字段
+                merged = {}
+                for g in graphs:
+                    for node in range(g.num_nodes):
+                        merged.setdefault(g.names[node], {}).update(g.node_attrs(node))
+                for name, attrs in merged.items():
+                    if cpg is not None and name in cpg.index:
+                        attrs.update(cpg.node_attrs(cpg.index[name]))
                     
                     # 设置 NODE_TYPE
-                    if 'label' in pdg_graph.nodes[node]:
-                        pdg_graph.nodes[node]['NODE_TYPE'] = pdg_graph.nodes[node]['label']
+                    if 'label' in attrs:
+                        attrs['NODE_TYPE'] = attrs['label']
+                    builder.add_node(name, {k: v for k, v in attrs.items() if k in PDG_NODE_ATTRS})
+                
+                for g in graphs:
+                    for e, (src, dst, label) in enumerate(g.edges()):
+                        # 清理空的 DDG 边
+                        if label in IGNORED_EDGE_LABELS:
+                            continue
+                        # 添加 CFG 标签
+                        builder.add_edge(g.names[src], g.names[dst], label or 'CFG', g.edge_orders.get(e))
                 
-                # 保存处理后的 PDG
-                nx.nx_agraph.write_dot(pdg_graph, pdg_path)
+                pdgs.append(PDG.from_graph(builder.build(), pdg_path))
                 
             except Exception as e:
                 logging.warning(f"Failed to preprocess {pdg_file}: {e}")
         
         logging.info("✓ PDG preprocessing complete")
+        return pdgs
+
+
+# 服务模式下在常驻 JVM 中执行的导入+导出查询，输出目录结构与 joern-export 一致
+SERVER_EXPORT_QUERY = r'''
+{
+  import scala.jdk.CollectionConverters._
+  import java.nio.file.{Files, Paths}
+
+  importCode(inputPath = @CODE_DIR@, projectName = @PROJECT@)
+
+  val pdgDir = Paths.get(@PDG_DIR@)
+  val cfgDir = Paths.get(@CFG_DIR@)
+  val cpgDir = Paths.get(@CPG_DIR@)
+  Seq(pdgDir, cfgDir, cpgDir).foreach(d => Files.createDirectories(d))
+
+  val methods = cpg.method.isExternal(false).l
+  methods.zip(methods.dotPdg.l).foreach { case (m, dot) =>
+    Files.writeString(pdgDir.resolve(s"${m.id}-pdg.dot"), dot)
+  }
+  methods.zip(methods.dotCfg.l).foreach { case (m, dot) =>
+    Files.writeString(cfgDir.resolve(s"${m.id}-cfg.dot"), dot)
+  }
+
+  def esc(v: String) = v.replace("\\", "\\\\").replace("\"", "\\\"")
+  val sb = new StringBuilder("digraph {\n")
+  cpg.all.foreach { n =>
+    val props = n.propertiesMap.asScala.map { case (k, v) => s"""$k="${esc(String.valueOf(v))}"""" }.mkString(" ")
+    sb.append(s"""  "${n.id}" [label="${n.label}" $props]""").append("\n")
+  }
+  sb.append("}\n")
+  Files.writeString(cpgDir.resolve("export.dot"), sb.toString)
+
+  delete(@PROJECT@)
+  println("__SLICER_EXPORT_OK__")
+}
+'''
+
+
+class JoernServerAnalyzer(JoernAnalyzer):
+    """
+    基于常驻 Joern 服务的分析器
+
+    每个工作进程持有一个 JVM，导入代码和导出 PDG/CFG/CPG 都在该 JVM 内完成，
+    输出目录结构与 JoernAnalyzer 相同，后续的预处理和切片流程无需改动。
+    服务无响应或查询超时时自动重启。
+    """
+
+    def __init__(self, joern_path: str = config.JOERN_PATH):
+        super().__init__(joern_path)
+        self.workdir = tempfile.mkdtemp(prefix=f"joern_server_{os.getpid()}_")
+        try:
+            self.server = JoernServer(
+                joern_path,
+                self.workdir,
+                startup_timeout=config.JOERN_SERVER_STARTUP_TIMEOUT,
+                query_timeout=config.JOERN_SERVER_QUERY_TIMEOUT
+            )
+        except BaseException as e:
+            # 服务没有启动成功时 close 不会被调用，工作目录在这里删除
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            if isinstance(e, JoernServerError):
+                raise SingleFileSlicerException(str(e))
+            raise
+        self._project_counter = 0
+        self._script_pid = None  # 已定义导出脚本的 JVM 进程号
+        atexit.register(self.close)
+    
+    @property
+    def cache_options(self) -> Dict:
+        options = super().cache_options
+        options["mode"] = "server"
+        return options
+
+    def analyze_file(self, source_file: str, output_dir: str) -> str:
+        """
+        在常驻 Joern 服务中分析单个源文件，生成 PDG
+
+        Args:
+            source_file: 源文件路径
+            output_dir: 输出目录
+
+        Returns:
+            PDG 目录路径
+        """
+        logging.info(f"Analyzing file with Joern server: {source_file}")
+
+        code_dir = os.path.join(output_dir, "code")
+        place_source(source_file, code_dir)
+
+        pdg_dir = os.path.join(output_dir, 'pdg')
+        self._project_counter += 1
+        project = f"slice_{os.getpid()}_{self._project_counter}"
+
+        query = SERVER_EXPORT_QUERY
+        for placeholder, value in (
+            ('@CODE_DIR@', os.path.abspath(code_dir)),
+            ('@PDG_DIR@', os.path.abspath(pdg_dir)),
+            ('@CFG_DIR@', os.path.abspath(os.path.join(output_dir, 'cfg'))),
+            ('@CPG_DIR@', os.path.abspath(os.path.join(output_dir, 'cpg'))),
+            ('@PROJECT@', project),
+        ):
+            query = query.replace(placeholder, json.dumps(value))
+
+        with timed('joern_server'):
+            stdout = self._run_query(query)
+
+        if '__SLICER_EXPORT_OK__' not in stdout:
+            raise SingleFileSlicerException(f"Joern server export failed: {stdout[-500:]}")
+
+        logging.info(f"✓ Analysis complete. PDG saved to {pdg_dir}")
+        return pdg_dir
+
+    def export_methods(self, source_file: str, target_lines: List[int], output_dir: str) -> str:
+        """
+        在常驻 Joern 服务中定向导出包含目标行的方法 (见 JoernAnalyzer.export_methods)
+        
+        导出脚本在每个 JVM 中只定义一次，之后每个任务只发送一条调用。
+        """
+        logging.info(f"Exporting enclosing methods with Joern server: {source_file}")
+        
+        code_dir = os.path.join(output_dir, "code")
+        place_source(source_file, code_dir)
+        
+        pdg_dir = os.path.join(output_dir, 'pdg')
+        os.makedirs(pdg_dir, exist_ok=True)
+        json_path = os.path.join(pdg_dir, METHODS_JSON)
+        self._project_counter += 1
+        project = f"slice_{os.getpid()}_{self._project_counter}"
+        
+        query = "exportMethods({}, {}, {}, {})".format(
+            json.dumps(os.path.abspath(code_dir)),
+            json.dumps(format_target_lines(target_lines)),
+            json.dumps(os.path.abspath(json_path)),
+            json.dumps(project)
+        )
+        with timed('joern_server'):
+            stdout = self._run_query(query, script=True)
+        
+        if '__SLICER_EXPORT_OK__' not in stdout or not os.path.exists(json_path):
+            raise SingleFileSlicerException(f"Joern server export failed: {stdout[-500:]}")
+        
+        logging.info(f"✓ Export complete. Methods saved to {json_path}")
+        return pdg_dir
+    
+    def export_project(self, code_dir: str, files: List[str], shard_dir: str, output_dir: str):
+        """在常驻 Joern 服务中批量导出 (见 JoernAnalyzer.export_project)"""
+        logging.info(f"Exporting project with Joern server: {code_dir} ({len(files)} files)")
+        os.makedirs(shard_dir, exist_ok=True)
+        self._project_counter += 1
+        project = f"slice_{os.getpid()}_{self._project_counter}"
+        
+        query = self._project_export_call(code_dir, files, shard_dir, project)
+        stdout = self._run_query(query, script=True, timeout=config.BULK_BUILD_TIMEOUT)
+        
+        if '__SLICER_EXPORT_OK__' not in stdout or not os.path.exists(os.path.join(shard_dir, 'index.json')):
+            raise SingleFileSlicerException(f"Joern server project export failed: {stdout[-500:]}")
+    
+    def _run_query(self, query: str, script: bool = False, timeout: Optional[float] = None) -> str:
+        """
+        执行查询，处理超时和服务崩溃
+        
+        Args:
+            script: 是否需要先在当前 JVM 中定义导出脚本
+            timeout: 本次查询的超时 (秒)，默认使用 JOERN_SERVER_QUERY_TIMEOUT
+        """
+        try:
+            self.server.ensure_healthy()
+            if script and self._script_pid != self.server.process.pid:
+                with open(config.JOERN_EXPORT_SCRIPT, 'r', encoding='utf-8') as f:
+                    self.server.query(f.read())
+                self._script_pid = self.server.process.pid
+            return self.server.query(query, timeout=timeout)
+        except JoernServerTimeout:
+            # 卡住的 JVM 无法继续使用，重启后由下一个任务复用
+            self._restart_quietly()
+            raise SingleFileSlicerException("Joern server timeout")
+        except JoernServerError as e:
+            if not self.server.is_running():
+                self._restart_quietly()
+            raise SingleFileSlicerException(f"Joern server failed: {e}")
+    
+    def _restart_quietly(self):
+        try:
+            self.server.restart()
+        except JoernServerError as e:
+            logging.warning(f"Failed to restart Joern server: {e}")
+
+    def close(self):
+        """停止 Joern 服务并清理工作目录"""
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def format_target_lines(target_lines: List[int]) -> str:
+    """目标行号 -> 导出脚本参数 ("12,40,41")"""
+    return ",".join(str(line) for line in sorted(set(target_lines)))
+
+
+def create_joern_analyzer() -> JoernAnalyzer:
+    """根据配置创建 Joern 分析器"""
+    if config.JOERN_SERVER_MODE:
+        return JoernServerAnalyzer(config.JOERN_PATH)
+    return JoernAnalyzer(config.JOERN_PATH)
+
+
+# 每个工作进程常驻的分析器 (服务模式下持有一个 JVM)
+_worker_analyzer: Optional[JoernAnalyzer] = None
+
+
+def _get_worker_analyzer() -> JoernAnalyzer:
+    """获取当前进程的分析器，首次调用时创建"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = create_joern_analyzer()
+    return _worker_analyzer
+
+
+# 每个工作进程的 PDG 缓存 (未配置缓存目录时为 None)
+_worker_cache: Optional[PDGCache] = None
+
+
+def get_pdg_cache() -> Optional[PDGCache]:
+    """获取当前进程的 PDG 缓存，首次调用时按配置创建"""
+    global _worker_cache
+    if _worker_cache is None and config.PDG_CACHE_DIR:
+        _worker_cache = PDGCache(config.PDG_CACHE_DIR, config.PDG_CACHE_MAX_BYTES)
+    return _worker_cache
+
+
+# 每个工作进程的切片结果缓存
+_worker_slice_cache: Optional[SliceCache] = None
+
+
+def get_slice_cache() -> Optional[SliceCache]:
+    """获取当前进程的切片结果缓存，首次调用时按配置创建 (需要 tree-sitter 确定函数边界)"""
+    global _worker_slice_cache
+    if _worker_slice_cache is None and config.SLICE_CACHE_DIR and TREE_SITTER_AVAILABLE:
+        _worker_slice_cache = SliceCache(config.SLICE_CACHE_DIR)
+    return _worker_slice_cache
+
+
+# 每个工作进程的常驻工作目录
+_worker_workspace: Optional[Workspace] = None
+
+
+def get_worker_workspace() -> Workspace:
+    """获取当前进程的工作目录，首次调用时按配置创建"""
+    global _worker_workspace
+    if _worker_workspace is None:
+        _worker_workspace = Workspace(config.WORKSPACE_DIR, config.WORKSPACE_MIN_FREE_BYTES)
+    return _worker_workspace
+
+
+def close_worker_resources():
+    """工作进程退出前释放常驻资源 (Joern 服务、工作目录)"""
+    global _worker_analyzer, _worker_workspace
+    if isinstance(_worker_analyzer, JoernServerAnalyzer):
+        _worker_analyzer.close()
+    _worker_analyzer = None
+    if _worker_workspace is not None:
+        _worker_workspace.close()
+        _worker_workspace = None
+
+
+def cleanup_worker_files(pid: int):
+    """工作进程被强制终止后，在主进程中删除它残留的工作目录"""
+    import glob
+    bases = {tempfile.gettempdir()}
+    if config.WORKSPACE_DIR:
+        bases.add(config.WORKSPACE_DIR)
+    for base in bases:
+        for pattern in (f"slice_ws_{pid}_*", f"joern_server_{pid}_*"):
+            for path in glob.glob(os.path.join(base, pattern)):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+# 每个工作进程已加载的项目级 PDG 存储 (批量模式)
+_worker_stores: Dict[str, ProjectStore] = {}
+
+
+def get_project_store(project_name: str) -> ProjectStore:
+    """获取当前进程中项目的 PDG 存储，首次调用时读取 manifest"""
+    store = _worker_stores.get(project_name)
+    if store is None:
+        store = ProjectStore(config.PDG_DIR, project_name)
+        _worker_stores[project_name] = store
+    return store
+
+
+def _build_project_shard(joern_analyzer: JoernAnalyzer, project_name: str, files: List[str]) -> int:
+    """
+    批量模式：对项目的一个分片运行一次 Joern 导入，导出分片内每个源文件的方法 PDG
+    
+    Returns:
+        分片中的文件数
+    """
+    store = ProjectStore(config.PDG_DIR, project_name)
+    shard_dir = store.shard_dir(shard_id(files))
+    project_dir = os.path.join(config.REPOSITORY_DIR, project_name)
+    if not os.path.isdir(project_dir):
+        raise SingleFileSlicerException(f"Project directory not found: {project_dir}")
+    
+    workspace = get_worker_workspace()
+    temp_dir = workspace.acquire()
+    try:
+        if config.BULK_SHARD_SIZE:
+            # 分片: 只导入分片内的源文件和项目的头文件
+            code_dir = os.path.join(temp_dir, 'code')
+            stage_sources(project_dir, files, code_dir)
+        else:
+            # 整个项目目录一次导入
+            code_dir = project_dir
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        joern_analyzer.export_project(code_dir, files, shard_dir, temp_dir)
+        store.finish_shard(shard_dir, files, joern_analyzer.version)
+    finally:
+        workspace.release()
+    return len(files)
+
+
+def build_project_shard(args):
+    """
+    构建项目分片的工作函数(用于多进程)
+    
+    Args:
+        args: (project_name, files)
+    """
+    project_name, files = args
+    import logging
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - [Process %(process)d] - %(levelname)s - %(message)s'
+    )
+    return _build_project_shard(_get_worker_analyzer(), project_name, files)
+
+
+def file_group_cost(group: List[Tuple[int, Dict]]) -> Tuple[int, int]:
+    """
+    估计文件组的处理代价，用于最长处理时间优先 (LPT) 调度
+    
+    Joern 分析的耗时主要取决于源文件大小，组内任务数作为次要依据。
+    """
+    task = group[0][1]
+    full_path = os.path.join(config.REPOSITORY_DIR,
+                             task.get('project_name_with_version', 'unknown'),
+                             task.get('file_path', 'unknown'))
+    try:
+        size = os.path.getsize(full_path)
+    except OSError:
+        size = 0
+    return size, len(group)
+
+
+def prepare_pdgs(joern_analyzer: JoernAnalyzer, full_path: str, temp_dir: str,
+                 target_lines: Optional[List[int]] = None,
+                 source: Optional[Tuple[str, str]] = None,
+                 code_lines: Optional[List[str]] = None) -> List[PDG]:
+    """
+    获取源文件中各方法预处理后的 PDG
+    
+    批量模式下先从项目级 PDG 存储读取；启用 tree-sitter 快速路径且所有目标行都在小函数中时，
+    直接在进程内构建 PDG；启用缓存时再按文件内容查找缓存，未命中才运行 Joern 分析和预处理，
+    并把结果存入缓存。启用定向导出且给出目标行时，只导出包含这些行的方法。
+    Joern 失败或超时且允许回退时，改用 tree-sitter 构建。
+    
+    Args:
+        source: (项目, 文件相对路径)，用于在项目级 PDG 存储中查找
+        code_lines: 已读取的源文件内容 (tree-sitter 构建时使用，为 None 时重新读取)
+    
+    Returns:
+        属于该源文件的方法 PDG 列表 (PDG.backend 记录生成它的后端)
+    """
+    file_name = os.path.basename(full_path)
+    
+    if config.BULK_MODE and source:
+        store = get_project_store(source[0])
+        if store.is_current(joern_analyzer.version):
+            with timed('pdg_load'):
+                pdgs = store.load(source[1])
+            if pdgs is not None:
+                return filter_pdgs_for_file(pdgs, file_name)
+    
+    use_tree_sitter = config.TS_FAST_PATH and TREE_SITTER_AVAILABLE
+    if use_tree_sitter and target_lines:
+        try:
+            with timed('ts_build'):
+                pdgs = small_function_pdgs(_read_source(full_path, code_lines), full_path, target_lines,
+                                           config.TS_FAST_PATH_MAX_LINES, config.LANGUAGE)
+            if pdgs:
+                return pdgs
+        except Exception as e:
+            logging.warning(f"tree-sitter fast path failed for {full_path}: {e}")
+    
+    try:
+        return _prepare_joern_pdgs(joern_analyzer, full_path, temp_dir, target_lines)
+    except Exception as e:
+        if not (use_tree_sitter and config.TS_FALLBACK):
+            raise
+        with timed('ts_build'):
+            pdgs = build_ts_pdgs(_read_source(full_path, code_lines), full_path, config.LANGUAGE, target_lines)
+        if not pdgs:
+            raise
+        logging.warning(f"Joern failed on {full_path}, using tree-sitter PDGs instead: {e}")
+        for pdg in pdgs:
+            pdg.backend_reason = 'joern-failed'
+        return pdgs
+
+
+def _read_source(full_path: str, code_lines: Optional[List[str]]) -> str:
+    if code_lines is not None:
+        return "".join(code_lines)
+    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+def _prepare_joern_pdgs(joern_analyzer: JoernAnalyzer, full_path: str, temp_dir: str,
+                        target_lines: Optional[List[int]] = None) -> List[PDG]:
+    """使用 Joern 生成 PDG (优先使用缓存)"""
+    file_name = os.path.basename(full_path)
+    targeted = config.JOERN_TARGETED_EXPORT and bool(target_lines)
+    
+    cache = get_pdg_cache()
+    key = None
+    if cache:
+        options = joern_analyzer.cache_options
+        if targeted:
+            options = dict(options, repr=["methods-json"], preprocess=False,
+                           target_lines=format_target_lines(target_lines))
+        with timed('pdg_cache'):
+            key = PDGCache.make_key(full_path, joern_analyzer.version, options)
+            cached_dir = cache.get(key)
+        if cached_dir:
+            logging.info(f"PDG cache hit: {full_path}")
+            with timed('pdg_load'):
+                return load_method_pdgs(cached_dir, file_name)
+    
+    if targeted:
+        # 定向导出已包含所需属性和 CFG 边，无需预处理
+        pdg_dir = joern_analyzer.export_methods(full_path, target_lines, temp_dir)
+        with timed('pdg_load'):
+            pdgs = load_pdgs_from_json(os.path.join(pdg_dir, METHODS_JSON))
+    else:
+        # 使用 Joern 分析文件，在内存中预处理 PDG
+        pdg_dir = joern_analyzer.analyze_file(full_path, temp_dir)
+        with timed('preprocess'):
+            pdgs = joern_analyzer.preprocess_pdg(
+                pdg_dir, os.path.join(temp_dir, 'cfg'), os.path.join(temp_dir, 'cpg'))
+    
+    if cache:
+        try:
+            with timed('pdg_cache'):
+                if not targeted:
+                    # 预处理结果只在需要缓存时写出一次
+                    pdg_dir = os.path.join(temp_dir, 'pdg_cache_entry')
+                    os.makedirs(pdg_dir, exist_ok=True)
+                    dump_pdgs_to_json(pdgs, os.path.join(pdg_dir, METHODS_JSON))
+                cache.put(key, pdg_dir)
+        except Exception as e:
+            logging.warning(f"Failed to store PDGs in cache: {e}")
+    
+    return filter_pdgs_for_file(pdgs, file_name)
+
+
+def load_method_pdgs(pdg_dir: str, file_name: str) -> List[PDG]:
+    """加载 PDG 目录中属于指定文件的所有方法 PDG"""
+    json_path = os.path.join(pdg_dir, METHODS_JSON)
+    if os.path.exists(json_path):
+        # 定向导出或内存预处理后缓存的结果
+        return filter_pdgs_for_file(load_pdgs_from_json(json_path), file_name)
+    
+    pdgs = []
+    for pdg_file in os.listdir(pdg_dir):
+        if not pdg_file.endswith('-pdg.dot'):
+            continue
+        try:
+            pdg = PDG(os.path.join(pdg_dir, pdg_file))
+        except Exception as e:
+            logging.debug(f"Failed to load {pdg_file}: {e}")
+            continue
+        pdgs.append(pdg)
+    return filter_pdgs_for_file(pdgs, file_name)
+
+
+def filter_pdgs_for_file(pdgs: List[PDG], file_name: str) -> List[PDG]:
+    """只保留属于指定文件的 PDG (没有 FILENAME 属性的 PDG 无法确定来源，一并排除)"""
+    return [pdg for pdg in pdgs if pdg.filename and pdg.filename.endswith(file_name)]
+
+
+def find_pdg_for_line(pdgs: List[PDG], target_line: int) -> Optional[PDG]:
+    """在已加载的 PDG 中查找包含目标行的 PDG"""
+    for pdg in pdgs:
+        if pdg.start_line and pdg.end_line:
+            if pdg.start_line <= target_line <= pdg.end_line:
+                return pdg
+    return None
+
+
+def slice_config_fingerprint(joern_analyzer: JoernAnalyzer) -> str:
+    """影响切片结果的配置 (作为切片结果缓存键的一部分)"""
+    return json.dumps({
+        "joern_version": joern_analyzer.version,
+        "export": joern_analyzer.cache_options,
+        "targeted_export": config.JOERN_TARGETED_EXPORT,
+        "bulk": config.BULK_MODE,
+        "fast_path": config.TS_FAST_PATH_MAX_LINES if config.TS_FAST_PATH else None,
+        "backward_depth": config.BACKWARD_DEPTH,
+        "forward_depth": config.FORWARD_DEPTH,
+        "distance_depth": distance_depth(),
+        "ast_fix": config.ENABLE_AST_FIX,
+        "language": config.LANGUAGE
+    }, sort_keys=True)
+
+
+def lookup_slice_cache(slice_cache: SliceCache, joern_analyzer: JoernAnalyzer,
+                       results: List[Tuple[int, Dict]], code_lines: List[str]) -> Dict[int, Tuple[str, int]]:
+    """
+    在切片结果缓存中查找各任务，命中的任务把行号平移到当前文件后直接完成
+    
+    Returns:
+        未命中任务的 {task_index: (缓存键, 所在函数起始行)}，切片成功后用于写入缓存
+    """
+    try:
+        keys = function_keys("".join(code_lines), [result["line"] for _, result in results],
+                             slice_config_fingerprint(joern_analyzer), config.LANGUAGE)
+    except Exception as e:
+        logging.warning(f"Slice cache lookup failed: {e}")
+        return {}
+    
+    missed = {}
+    for task_index, result in results:
+        key = keys.get(result["line"])
+        if key is None:
+            continue
+        entry = slice_cache.get(key[0])
+        if entry is None:
+            missed[task_index] = key
+            continue
+        apply_entry(result, entry, key[1])
+        result["sliced_code"], result["sliced_code_with_placeholder"] = \
+            extract_slice_code(result["enhanced_slice_lines"], code_lines)
+        result["status"] = "success"
+    return missed
+
+
+def store_slice_cache(slice_cache: SliceCache, result: Dict, key: Optional[Tuple[str, int]]):
+    """把成功的切片结果写入缓存 (Joern 失败后回退得到的结果不缓存)"""
+    if key is None or result.get("status") != "success":
+        return
+    if result.get("metadata", {}).get("backend_reason") == 'joern-failed':
+        return
+    try:
+        slice_cache.put(key[0], make_entry(result, key[1]))
+    except Exception as e:
+        logging.warning(f"Failed to store slice result in cache: {e}")
+
+
+def extract_slice_code(slice_lines, code_lines: List[str]) -> Tuple[str, str]:
+    """按行号提取切片代码，返回 (无占位符代码, 带占位符代码)"""
+    from code_extractor import extract_code
+    source_line_dict = {i + 1: line for i, line in enumerate(code_lines)}
+    return (extract_code(slice_lines=set(slice_lines), source_lines=source_line_dict, placeholder=None),
+            extract_code(slice_lines=set(slice_lines), source_lines=source_line_dict,
+                         placeholder=config.PLACEHOLDER))
+
+
+def distance_depth() -> Optional[int]:
+    """记录距离标签的最大深度 (不小于当前切片深度)，未启用时为 None"""
+    if not config.SLICE_DISTANCE_DEPTH:
+        return None
+    return max(config.SLICE_DISTANCE_DEPTH, config.BACKWARD_DEPTH, config.FORWARD_DEPTH)
+
+
+def encode_distances(pdg: PDG, labels: Dict[int, List[Optional[int]]], depth: int) -> Dict:
+    """把节点的距离标签转换为可保存的 {"max_depth": 深度, "nodes": [[行号, 后向距离, 前向距离], ...]}"""
+    unreached = depth + 1
+    nodes = sorted(([pdg.get_node(node_id).line_number, b, f] for node_id, (b, f) in labels.items()),
+                   key=lambda d: (d[0] or 0, unreached if d[1] is None else d[1], unreached if d[2] is None else d[2]))
+    return {"max_depth": depth, "nodes": nodes}
+
+
+def slice_batch(pdg: PDG, target_lines: List[int]) -> Dict[int, Tuple[Set[PDGNode], Dict, Optional[Dict]]]:
+    """
+    在同一个 PDG 上对多个目标行切片
+    
+    启用 SLICE_DISTANCE_DEPTH 时遍历到该深度并记录距离标签，当前深度的切片由标签得到 (结果不变)。
+    
+    Returns:
+        目标行号 -> (切片节点集合, 元数据, 距离标签或 None)
+    """
+    engine = SliceEngine(pdg)
+    depth = distance_depth()
+    if depth is None:
+        batch = engine.slice_many(target_lines, backward_depth=config.BACKWARD_DEPTH,
+                                  forward_depth=config.FORWARD_DEPTH)
+        return {line: (nodes, metadata, None) for line, (nodes, metadata) in batch.items()}
+    
+    labels = engine.distance_labels(target_lines, max_depth=depth)
+    sliced = {}
+    for line, line_labels in labels.items():
+        nodes, metadata = engine.slice_from_labels(line, line_labels, config.BACKWARD_DEPTH, config.FORWARD_DEPTH)
+        sliced[line] = (nodes, metadata, encode_distances(pdg, line_labels, depth) if nodes else None)
+    return sliced
+
+
+def finish_slice(result: Dict, slice_lines: Set[int], node_count: int, metadata: Dict,
+                 code_lines: List[str]) -> Dict:
+    """
+    对切片行号执行 AST 增强和代码提取，结果写入 result
+    (函数范围取自 result 的 function_start_line / function_end_line)
+    """
+    start_line = result.get("function_start_line")
+    end_line = result.get("function_end_line")
+    
+    # AST 增强
+    enhanced_lines = slice_lines
+    ast_enhanced_success = False
+    if config.ENABLE_AST_FIX:
+        try:
+            from ast_enhancer import enhance_slice_with_ast
+            func_start_idx = (start_line or 1) - 1
+            func_end_idx = (end_line or len(code_lines))
+            func_code = "".join(code_lines[func_start_idx:func_end_idx])
+            
+            with timed('ast_enhance'):
+                enhanced_lines = enhance_slice_with_ast(
+                    source_code=func_code,
+                    slice_lines=slice_lines,
+                    language=config.LANGUAGE,
+                    function_start_line=start_line or 1
+                )
+            ast_enhanced_success = len(enhanced_lines) > len(slice_lines)
+        except Exception as e:
+            logging.warning(f"AST enhancement failed, using original slice: {e}")
+            enhanced_lines = slice_lines
+    
+    # 提取切片代码
+    with timed('code_extract'):
+        sliced_code, sliced_code_with_placeholder = extract_slice_code(enhanced_lines, code_lines)
+    
+    # 构建结果
+    result["status"] = "success"
+    result["slice_lines"] = sorted(list(slice_lines))
+    result["enhanced_slice_lines"] = sorted(list(enhanced_lines))
+    result["sliced_code"] = sliced_code
+    result["sliced_code_with_placeholder"] = sliced_code_with_placeholder
+    result["metadata"] = metadata
+    
+    metadata["original_slice_lines"] = len(slice_lines)
+    metadata["enhanced_slice_lines"] = len(enhanced_lines)
+    metadata["final_node_count"] = node_count
+    metadata["ast_enhanced"] = ast_enhanced_success
+    
+    return result
+
+
+def slice_task_with_pdg(result: Dict, pdg: PDG, target_line: int, code_lines: List[str],
+                        sliced: Optional[Tuple[Set[PDGNode], Dict, Optional[Dict]]] = None) -> Dict:
+    """
+    在给定 PDG 上对目标行执行切片、AST 增强和代码提取，结果写入 result
+    
+    Args:
+        sliced: slice_batch 已算好的 (节点集合, 元数据, 距离标签)，为 None 时单独切片
+    """
+    result["function_name"] = pdg.method_name
+    result["function_start_line"] = pdg.start_line
+    result["function_end_line"] = pdg.end_line
+    result["backend"] = pdg.backend
+    
+    # 执行切片
+    if sliced is None:
+        with timed('slicing'):
+            sliced = slice_batch(pdg, [target_line])[target_line]
+    # 同一行可能对应多个任务，元数据复制一份再修改
+    slice_nodes, metadata, distances = sliced[0], dict(sliced[1]), sliced[2]
+    
+    # 提取切片行号
+    slice_lines = {node.line_number for node in slice_nodes if node.line_number}
+    
+    finish_slice(result, slice_lines, len(slice_nodes), metadata, code_lines)
+    if distances:
+        result["slice_distances"] = distances
+    
+    metadata["backend"] = pdg.backend
+    metadata["backend_reason"] = pdg.backend_reason
+    
+    return result
+
+
+def group_timeout(group_size: int) -> Optional[float]:
+    """文件组的墙钟时间上限: 基础时间加上每个额外任务的时间，不超过 TASK_TIMEOUT_MAX"""
+    if not config.TASK_TIMEOUT:
+        return None
+    budget = config.TASK_TIMEOUT + (config.TASK_TIMEOUT_PER_TASK or 0) * max(group_size - 1, 0)
+    return min(budget, config.TASK_TIMEOUT_MAX) if config.TASK_TIMEOUT_MAX else budget
+
+
+def _new_result(task: Dict) -> Dict:
+    """创建任务的初始结果记录"""
+    return {
+        "project": task.get('project_name_with_version', 'unknown'),
+        "file": task.get('file_path', 'unknown'),
+        "line": task.get('line_number', 0),
+        "status": "pending"
+    }
+
+
+def _mark_error(result: Dict, e: Exception) -> Dict:
+    """将异常记录到结果中"""
+    result["status"] = "error"
+    result["error"] = str(e)
+    result["failure_class"] = classify_error(result["error"])
+    if not isinstance(e, SingleFileSlicerException):
+        result["traceback"] = traceback.format_exc()
+    return result
+
+
+def group_tasks_by_file(indexed_tasks: List[Tuple[int, Dict]]) -> List[List[Tuple[int, Dict]]]:
+    """
+    将 (task_index, task) 按 (项目, 文件) 分组，组的顺序由组内第一个任务决定
+    """
+    groups: Dict[Tuple[str, str], List[Tuple[int, Dict]]] = {}
+    for task_index, task in indexed_tasks:
+        key = (task.get('project_name_with_version', 'unknown'), task.get('file_path', 'unknown'))
+        groups.setdefault(key, []).append((task_index, task))
+    return list(groups.values())
 
 
 # 全局工作函数,用于多进程池
-def process_single_task(args):
+def process_file_group(args):
     """
-    处理单个任务的工作函数(用于多进程)
+    处理同一源文件上的一组任务(用于多进程)
+    
+    整个组只运行一次 Joern 分析并加载一次 PDG，组内每个任务在共享的 PDG 上切片，
+    每个任务仍然产生独立的结果记录。启用切片结果缓存时先查缓存，全部命中的组不再调用 Joern。
     
     Args:
-        args: (task_index, task, output_dir)
+        args: (group, output_dir)，group 为同一 (项目, 文件) 的 [(task_index, task), ...]
     
     Returns:
-        (task_index, result)
+        [(task_index, result), ...]，每个结果的 timings 记录各阶段耗时 (整组共享的阶段按任务数平摊)
     """
-    task_index, task, output_dir = args
+    group, output_dir = args
     
     # 重新配置日志(每个进程单独配置)
     import logging
@@ -219,148 +1096,193 @@ def process_single_task(args):
         format='%(asctime)s - [Process %(process)d] - %(levelname)s - %(message)s'
     )
     
-    # 创建临时的切片器实例
-    joern_analyzer = JoernAnalyzer()
+    results = [(task_index, _new_result(task)) for task_index, task in group]
+    project_name = results[0][1]["project"]
+    file_path = results[0][1]["file"]
     
-    project_name = task.get('project_name_with_version', 'unknown')
-    file_path = task.get('file_path', 'unknown')
-    target_line = task.get('line_number', 0)
+    pending = results  # 需要切片的任务 (切片结果缓存未命中)
+    cache_keys: Dict[int, Tuple[str, int]] = {}
+    slice_cache = get_slice_cache()
+    workspace = get_worker_workspace()
     
-    result = {
-        "project": project_name,
-        "file": file_path,
-        "line": target_line,
-        "status": "pending"
-    }
+    with recording() as group_timings:
+        try:
+            # 获取当前进程的分析器 (服务模式下复用常驻 JVM)
+            joern_analyzer = _get_worker_analyzer()
+            
+            # 1. 加载源文件
+            full_path = os.path.join(config.REPOSITORY_DIR, project_name, file_path)
+            if not os.path.exists(full_path):
+                raise SingleFileSlicerException(f"Source file not found: {full_path}")
+            
+            with timed('source_load'):
+                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    code_lines = f.readlines()
+            
+            # 2. 查找切片结果缓存 (同一函数在其他项目版本中已切片过)
+            if slice_cache:
+                with timed('slice_cache'):
+                    cache_keys = lookup_slice_cache(slice_cache, joern_analyzer, results, code_lines)
+                pending = [(task_index, result) for task_index, result in results
+                           if result["status"] == "pending"]
+            
+            pdgs = []
+            if pending:
+                # 3. 获取 (已清空的) 工作目录
+                with timed('workspace'):
+                    temp_dir = workspace.acquire()
+                
+                # 4. 使用 Joern 分析文件并在内存中预处理 PDG (整组只做一次，优先使用缓存)
+                target_lines = [result["line"] for _, result in pending]
+                pdgs = prepare_pdgs(joern_analyzer, full_path, temp_dir, target_lines,
+                                    (project_name, file_path), code_lines)
+        except Exception as e:
+            # 分析失败时组内所有未完成的任务都记录同样的错误
+            for _, result in pending:
+                _mark_error(result, e)
+            pdgs = None
+        finally:
+            # 清空工作目录，供下一组复用
+            with timed('workspace'):
+                workspace.release()
     
-    temp_dir = None
+    # 整组共享的耗时平摊到每个任务
+    share = 1.0 / len(results)
+    for _, result in results:
+        result["timings"] = {}
+        add_timings(result["timings"], group_timings, share)
     
-    try:
-        # 1. 加载源文件
-        full_path = os.path.join(config.REPOSITORY_DIR, project_name, file_path)
-        if not os.path.exists(full_path):
-            raise SingleFileSlicerException(f"Source file not found: {full_path}")
-        
-        with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-            code_lines = f.readlines()
-        
-        # 2. 创建临时目录
-        temp_dir = tempfile.mkdtemp(prefix="slice_")
-        
-        # 3. 使用 Joern 分析文件
-        pdg_dir = joern_analyzer.analyze_file(full_path, temp_dir)
-        
-        # 4. 预处理 PDG
-        cfg_dir = os.path.join(temp_dir, 'cfg')
-        cpg_dir = os.path.join(temp_dir, 'cpg')
-        if os.path.exists(cfg_dir) and os.path.exists(cpg_dir):
-            joern_analyzer.preprocess_pdg(pdg_dir, cfg_dir, cpg_dir)
-        
-        # 5. 查找包含目标行的 PDG
-        file_name = os.path.basename(file_path)
-        pdg = None
-        for pdg_file in os.listdir(pdg_dir):
-            if not pdg_file.endswith('-pdg.dot'):
-                continue
-            pdg_path = os.path.join(pdg_dir, pdg_file)
-            try:
-                temp_pdg = PDG(pdg_path)
-                if temp_pdg.filename and temp_pdg.filename.endswith(file_name):
-                    if temp_pdg.start_line and temp_pdg.end_line:
-                        if temp_pdg.start_line <= target_line <= temp_pdg.end_line:
-                            pdg = temp_pdg
-                            break
-            except:
-                continue
-        
-        if not pdg:
-            raise SingleFileSlicerException(f"No PDG found for line {target_line}")
-        
-        result["function_name"] = pdg.method_name
-        result["function_start_line"] = pdg.start_line
-        result["function_end_line"] = pdg.end_line
-        
-        # 6. 执行切片
-        engine = SliceEngine(pdg)
-        slice_nodes, metadata = engine.slice(target_line)
-        
-        # 7. 提取切片行号
-        slice_lines = {node.line_number for node in slice_nodes if node.line_number}
-        
-        # 8. AST 增强
-        enhanced_lines = slice_lines
-        ast_enhanced_success = False
-        if config.ENABLE_AST_FIX:
-            try:
-                from ast_enhancer import enhance_slice_with_ast
-                func_start_idx = (pdg.start_line or 1) - 1
-                func_end_idx = (pdg.end_line or len(code_lines))
-                func_code = "".join(code_lines[func_start_idx:func_end_idx])
-                
-                enhanced_lines = enhance_slice_with_ast(
-                    source_code=func_code,
-                    slice_lines=slice_lines,
-                    language=config.LANGUAGE,
-                    function_start_line=pdg.start_line or 1
-                )
-                ast_enhanced_success = len(enhanced_lines) > len(slice_lines)
-            except:
-                enhanced_lines = slice_lines
-        
-        # 9. 提取切片代码
-        from code_extractor import extract_code
-        source_line_dict = {i + 1: line for i, line in enumerate(code_lines)}
-        
-        sliced_code = extract_code(
-            slice_lines=enhanced_lines,
-            source_lines=source_line_dict,
-            placeholder=None
-        )
-        
-        sliced_code_with_placeholder = extract_code(
-            slice_lines=enhanced_lines,
-            source_lines=source_line_dict,
-            placeholder=config.PLACEHOLDER
-        )
-        
-        # 10. 构建结果
-        result["status"] = "success"
-        result["slice_lines"] = sorted(list(slice_lines))
-        result["enhanced_slice_lines"] = sorted(list(enhanced_lines))
-        result["sliced_code"] = sliced_code
-        result["sliced_code_with_placeholder"] = sliced_code_with_placeholder
-        result["metadata"] = metadata
-        
-        metadata["original_slice_lines"] = len(slice_lines)
-        metadata["enhanced_slice_lines"] = len(enhanced_lines)
-        metadata["final_node_count"] = len(slice_nodes)
-        metadata["ast_enhanced"] = ast_enhanced_success
-        
-    except SingleFileSlicerException as e:
-        result["status"] = "error"
-        result["error"] = str(e)
-    except Exception as e:
-        result["status"] = "error"
-        result["error"] = str(e)
-        result["traceback"] = traceback.format_exc()
-    finally:
-        # 清理临时目录
-        if temp_dir and os.path.exists(temp_dir):
+    if pdgs is None:
+        return results
+    
+    # 5. 查找每个任务所在的函数，同一函数上的目标行一次批量切片
+    task_pdgs: Dict[int, PDG] = {}
+    lines_by_pdg: Dict[int, Tuple[PDG, List[int]]] = {}
+    for task_index, result in pending:
+        pdg = find_pdg_for_line(pdgs, result["line"])
+        if pdg:
+            task_pdgs[task_index] = pdg
+            lines_by_pdg.setdefault(id(pdg), (pdg, []))[1].append(result["line"])
+    
+    batch_slices: Dict[int, Dict[int, Tuple[Set[PDGNode], Dict, Optional[Dict]]]] = {}
+    batch_seconds: Dict[int, float] = {}
+    for key, (pdg, target_lines) in lines_by_pdg.items():
+        start = time.perf_counter()
+        try:
+            batch_slices[key] = slice_batch(pdg, target_lines)
+        except Exception as e:
+            # 批量切片失败时逐个任务单独切片，错误记录到各自的结果中
+            logging.warning(f"Batch slicing failed for {pdg}: {e}")
+        # 批量切片耗时按该函数上的任务数平摊
+        batch_seconds[key] = (time.perf_counter() - start) / len(target_lines)
+    
+    # 6. 对组内每个任务完成 AST 增强和代码提取
+    for task_index, result in pending:
+        target_line = result["line"]
+        with recording() as task_timings:
             try:
-                shutil.rmtree(temp_dir)
-            except:
-                pass
+                pdg = task_pdgs.get(task_index)
+                if not pdg:
+                    raise SingleFileSlicerException(f"No PDG found for line {target_line}")
+                task_timings['slicing'] = batch_seconds.get(id(pdg), 0.0)
+                sliced = batch_slices.get(id(pdg), {}).get(target_line)
+                slice_task_with_pdg(result, pdg, target_line, code_lines, sliced)
+            except Exception as e:
+                _mark_error(result, e)
+            if slice_cache:
+                with timed('slice_cache'):
+                    store_slice_cache(slice_cache, result, cache_keys.get(task_index))
+        add_timings(result["timings"], task_timings)
+    
+    return results
+
+
+def process_single_task(args):
+    """
+    处理单个任务的工作函数(用于多进程)
+    
+    Args:
+        args: (task_index, task, output_dir)
     
-    return (task_index, result)
+    Returns:
+        (task_index, result)
+    """
+    task_index, task, output_dir = args
+    return process_file_group(([(task_index, task)], output_dir))[0]
+
+
+def queue_workers_dir() -> str:
+    """共享任务队列模式下各进程输出目录的上级目录"""
+    return os.path.join(config.OUTPUT_DIR, 'workers')
+
+
+def use_worker_output_dir(worker_id: str):
+    """共享任务队列模式下把本进程的 chunk、断点和进度文件放到 OUTPUT_DIR/workers/<进程标识>/"""
+    worker_dir = os.path.join(queue_workers_dir(), worker_id.replace(os.sep, '_'))
+    config.OUTPUT_DIR = worker_dir
+    config.CHECKPOINT_FILE = os.path.join(worker_dir, "checkpoint.json")
+    config.CHECKPOINT_JOURNAL = os.path.join(worker_dir, "checkpoint.jsonl")
+    config.PROGRESS_FILE = os.path.join(worker_dir, "progress.json")
+    config.FAILURE_LOG = os.path.join(worker_dir, "failures.jsonl")
+    config.FAILURE_REPORT = os.path.join(worker_dir, "failure_report.json")
+
+
+def update_result_store(output_dirs: List[str]):
+    """把输出目录中新的或有变化的结果追加到 RESULT_STORE"""
+    if not config.RESULT_STORE:
+        return
+    try:
+        with ResultStore(config.RESULT_STORE) as store:
+            written = import_chunk_dirs(store, output_dirs)
+    except Exception as e:
+        logging.error(f"Failed to update result store {config.RESULT_STORE}: {e}")
+        return
+    logging.info(f"✓ Appended {written} new or changed results to result store {config.RESULT_STORE}")
+
+
+def print_failure_report(top: int = 20):
+    """打印失败类别统计和失败耗时最多的文件"""
+    failures = FailureLog(config.FAILURE_LOG, config.RETRY_MAX_ATTEMPTS,
+                          config.RETRY_BACKOFF_BASE, config.RETRY_BACKOFF_MAX)
+    summary = failures.summary()
+    print(f"\nFailed tasks: {summary['failed_tasks']} ({summary['quarantined_tasks']} quarantined)")
+    for failure_class, count in sorted(summary["classes"].items(), key=lambda item: -item[1]):
+        print(f"  {failure_class}: {count}")
+    report = failures.file_report()
+    if report:
+        print(f"\nFiles by time lost to failures (top {min(top, len(report))} of {len(report)}):")
+        for r in report[:top]:
+            print(f"  {r['seconds']:8.0f}s (timeouts {r['timeout_seconds']:.0f}s)  {r['failures']:3d} failures  "
+                  f"{r['quarantined_tasks']:3d} quarantined  {r['project']}/{r['file']}")
+
+
+def merge_queue_outputs() -> Optional[Dict]:
+    """把共享任务队列中所有进程的输出目录合并为 OUTPUT_JSON"""
+    workers_dir = queue_workers_dir()
+    dirs = sorted(os.path.join(workers_dir, d) for d in os.listdir(workers_dir)) if os.path.isdir(workers_dir) else []
+    logging.info(f"Merging outputs of {len(dirs)} workers from {workers_dir}")
+    stats = chunk_store.merge_chunk_dirs(dirs, config.OUTPUT_JSON, config.OUTPUT_COMPRESS)
+    if stats:
+        logging.info(f"✓ Merged {stats['total']} results ({stats['success']} success) into {config.OUTPUT_JSON}")
+        update_result_store(dirs)
+    return stats
 
 
 class SingleFileSlicer:
     """单文件切片器"""
     
     def __init__(self):
-        self.joern_analyzer = JoernAnalyzer()
+        # 只检查 Joern 是否可用；服务模式的 JVM 在单进程路径或工作进程中首次使用时才启动
+        self.joern_version = JoernAnalyzer(config.JOERN_PATH).version
         self.tasks = self._load_tasks()
+        self.journal = CheckpointJournal(config.CHECKPOINT_FILE, config.CHECKPOINT_JOURNAL,
+                                         config.CHECKPOINT_FLUSH_EVERY, config.CHECKPOINT_FLUSH_INTERVAL)
         self.checkpoint_data = self._load_checkpoint()
+        self.failures = FailureLog(config.FAILURE_LOG, config.RETRY_MAX_ATTEMPTS,
+                                   config.RETRY_BACKOFF_BASE, config.RETRY_BACKOFF_MAX)
+        self._last_progress_save = 0.0
+        self.run_stats = chunk_store.new_stats()
+        self.phase_stats = PhaseStats(config.TIMING_WINDOW_TASKS, config.THROUGHPUT_WINDOW)
         self.processed_count = 0
         self.chunk_results = []  # 当前chunk的结果
         
@@ -370,6 +1292,11 @@ class SingleFileSlicer:
         self.shared_checkpoint = None
         self.shared_stats = None
     
+    @property
+    def joern_analyzer(self) -> JoernAnalyzer:
+        """当前进程的分析器 (首次使用时创建)"""
+        return _get_worker_analyzer()
+    
     def _load_tasks(self) -> List[Dict]:
         """加载切片任务"""
         logging.info(f"Loading tasks from {config.DATA_JSON}")
@@ -385,74 +1312,150 @@ class SingleFileSlicer:
         return tasks
     
     def _load_checkpoint(self) -> Dict:
-        """加载断点信息"""
+        """加载断点信息 (快照 + 追加日志，加载后压缩为新快照)"""
         if not config.ENABLE_CHECKPOINT:
-            return {"processed_indices": [], "chunk_count": 0}
+            return empty_checkpoint()
         
-        if os.path.exists(config.CHECKPOINT_FILE):
-            try:
-                with open(config.CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                    checkpoint = json.load(f)
-                logging.info(f"Loaded checkpoint: {len(checkpoint.get('processed_indices', []))} tasks already processed")
-                return checkpoint
-            except Exception as e:
-                logging.warning(f"Failed to load checkpoint: {e}")
+        try:
+            checkpoint = self.journal.load()
+        except Exception as e:
+            logging.warning(f"Failed to load checkpoint: {e}")
+            return empty_checkpoint()
         
-        return {"processed_indices": [], "chunk_count": 0}
+        if checkpoint["processed_indices"]:
+            logging.info(f"Loaded checkpoint: {len(checkpoint['processed_indices'])} tasks already processed")
+        return checkpoint
     
-    def _save_checkpoint(self, processed_index: int):
-        """保存断点信息"""
+    def _save_checkpoint(self, processed_index: int, status: str = "success"):
+        """记录一个已完成的任务 (追加到断点日志，批量落盘)"""
         if not config.ENABLE_CHECKPOINT:
             return
         
-        self.checkpoint_data["processed_indices"].append(processed_index)
-        
-        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
         try:
-            with open(config.CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.checkpoint_data, f, indent=2)
+            self.journal.record_task(processed_index, status)
         except Exception as e:
             logging.warning(f"Failed to save checkpoint: {e}")
     
-    def _save_chunk(self, chunk_results: List[Dict], chunk_index: int):
-        """保存一个chunk的结果"""
-        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
-        
-        chunk_file = os.path.join(config.OUTPUT_DIR, f"slices_chunk_{chunk_index:04d}.json")
+    def _record_result(self, task_index: int, result: Dict, seconds: Optional[float] = None):
+        """记录断点和失败信息"""
+        self._save_checkpoint(task_index, result['status'])
+        try:
+            self.failures.record(task_index, result, seconds)
+        except Exception as e:
+            logging.warning(f"Failed to record failure: {e}")
+    
+    def _select_tasks(self) -> List[Tuple[int, Dict]]:
+        """
+        本次运行要处理的任务: 未处理的任务，以及退避时间已过、尚未隔离的失败任务
         
+        隔离的任务 (确定性失败，或暂时性失败次数达到 RETRY_MAX_ATTEMPTS) 只在 RETRY_QUARANTINED 时处理；
+        没有失败记录的旧失败任务和仍在退避时间内的任务跳过。
+        """
+        processed = set(self.checkpoint_data.get("processed_indices", []))
+        failed = set(self.checkpoint_data.get("failed_indices", []))
+        now = time.time()
+        selected = []
+        unrecorded = []  # 没有结果记录的隔离任务 (如 --clear 之后)
+        skipped = {'quarantined': 0, 'backoff': 0}
+        for i, task in enumerate(self.tasks):
+            status = self.failures.status(i, now)
+            if status == 'quarantined':
+                if config.RETRY_QUARANTINED:
+                    selected.append((i, task))
+                else:
+                    skipped['quarantined'] += 1
+                    if i not in processed:
+                        unrecorded.append((i, self._quarantined_result(i, task)))
+            elif i not in processed:
+                selected.append((i, task))
+            elif i in failed:
+                if status == 'retry':
+                    selected.append((i, task))
+                elif status == 'backoff':
+                    skipped['backoff'] += 1
+        
+        retried = sum(1 for i, _ in selected if i in failed or self.failures.status(i, now) is not None)
+        if retried:
+            logging.info(f"Retrying {retried} previously failed tasks")
+        if skipped['quarantined']:
+            logging.info(f"Skipping {skipped['quarantined']} quarantined tasks (use --retry-quarantined to retry them)")
+        if skipped['backoff']:
+            logging.info(f"Skipping {skipped['backoff']} failed tasks still in retry backoff")
+        if unrecorded:
+            # 跳过的任务仍然在输出中保留一条错误记录，保证每个任务都有结果
+            self._save_chunk(unrecorded, self.checkpoint_data.get("chunk_count", 0) + 1)
+            for i, _ in unrecorded:
+                self._save_checkpoint(i, 'error')
+        return selected
+    
+    def _quarantined_result(self, index: int, task: Dict) -> Dict:
+        """隔离任务的错误记录 (沿用最后一次失败的类别和错误信息)"""
+        entry = self.failures.tasks[index]
+        result = _new_result(task)
+        result["status"] = "error"
+        result["error"] = f"Quarantined after {entry['attempts']} failed attempts: {entry['error']}"
+        result["failure_class"] = entry["class"]
+        result["quarantined"] = True
+        return result
+    
+    def _retry_round(self, attempted: Set[int]) -> List[Tuple[int, Dict]]:
+        """
+        本次运行中暂时性失败的任务: 等到退避时间已过后返回可以重试的任务
+        (最多等待 RETRY_MAX_WAIT 秒，退避时间更长的任务留到下次运行)
+        """
+        pending = {i: self.failures.next_retry_at(i) for i in attempted if self.failures.status(i) in ('retry', 'backoff')}
+        if not pending:
+            return []
+        wait = min(pending.values()) - time.time()
+        if wait > config.RETRY_MAX_WAIT:
+            logging.info(f"{len(pending)} failed tasks will be retried in a later run (backoff {wait:.0f}s)")
+            return []
+        if wait > 0:
+            logging.info(f"Waiting {wait:.0f}s before retrying failed tasks")
+            time.sleep(wait)
+        now = time.time()
+        retry = [(i, self.tasks[i]) for i in sorted(pending) if pending[i] <= now]
+        logging.info(f"Retrying {len(retry)} tasks that failed with transient errors")
+        return retry
+    
+    def _finish_failures(self):
+        """关闭失败记录并写出按文件的失败报告"""
+        self.failures.close()
+        self.failures.write_report(config.FAILURE_REPORT)
+        summary = self.failures.summary()
+        if summary["failed_tasks"]:
+            logging.info(f"  Failed tasks: {summary['failed_tasks']} ({summary['quarantined_tasks']} quarantined), "
+                         f"by class: {summary['classes']}; per-file report: {config.FAILURE_REPORT}")
+    
+    def _save_chunk(self, chunk_results: List[Tuple[int, Dict]], chunk_index: int) -> bool:
+        """保存一个chunk的结果 (JSON Lines + 索引)，返回是否写入成功"""
         try:
-            with open(chunk_file, 'w', encoding='utf-8') as f:
-                json.dump(chunk_results, f, indent=2, ensure_ascii=False)
-            logging.info(f"✓ Saved chunk {chunk_index} ({len(chunk_results)} items) to {chunk_file}")
+            stats = chunk_store.write_chunk(config.OUTPUT_DIR, chunk_index, chunk_results)
+            logging.info(f"✓ Saved chunk {chunk_index} ({len(chunk_results)} items, "
+                         f"{stats['success']} success) to {chunk_store.chunk_file_name(chunk_index)}")
+            
+            # 累计本次运行的统计
+            for key, value in stats.items():
+                self.run_stats[key] += value
             
             # 更新checkpoint
             self.checkpoint_data["chunk_count"] = chunk_index
-            
-            # 保存简化的summary
-            summary_file = os.path.join(config.OUTPUT_DIR, f"slices_chunk_{chunk_index:04d}_summary.json")
-            summary = []
-            for r in chunk_results:
-                summary_item = {
-                    "project": r.get("project"),
-                    "file": r.get("file"),
-                    "line": r.get("line"),
-                    "status": r.get("status"),
-                    "function_name": r.get("function_name"),
-                    "slice_lines_count": len(r.get("slice_lines", [])),
-                    "enhanced_lines_count": len(r.get("enhanced_slice_lines", []))
-                }
-                if r.get("status") == "error":
-                    summary_item["error"] = r.get("error")
-                summary.append(summary_item)
-            
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
+            if config.ENABLE_CHECKPOINT:
+                self.journal.record_chunk(chunk_index)
+            return True
             
         except Exception as e:
             logging.error(f"Failed to save chunk {chunk_index}: {e}")
+            return False
     
-    def _save_progress(self, current_index: int, total: int, success: int, failed: int):
-        """保存处理进度"""
+    def _save_progress(self, current_index: int, total: int, success: int, failed: int,
+                       force: bool = False):
+        """保存处理进度 (距上次写入不足 PROGRESS_INTERVAL 秒时跳过，除非 force)"""
+        now = time.time()
+        if not force and now - self._last_progress_save < config.PROGRESS_INTERVAL:
+            return
+        self._last_progress_save = now
+        
         progress = {
             "current_index": current_index,
             "total_tasks": total,
@@ -463,13 +1466,17 @@ class SingleFileSlicer:
             "timestamp": json.dumps(None)  # Will be replaced below
         }
         
+        # 各阶段耗时分位数、滑动窗口吞吐量和据此估算的剩余时间
+        remaining = total - len(self.checkpoint_data.get("processed_indices", [])) - self.phase_stats.total
+        progress["timing"] = self.phase_stats.snapshot(max(remaining, 0))
+        
         # Add timestamp
         import datetime
         progress["timestamp"] = datetime.datetime.now().isoformat()
         
         try:
-            with open(config.PROGRESS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(progress, f, indent=2, ensure_ascii=False)
+            os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+            write_json_atomic(config.PROGRESS_FILE, progress)
         except Exception as e:
             logging.warning(f"Failed to save progress: {e}")
     
@@ -493,7 +1500,9 @@ class SingleFileSlicer:
             raise SingleFileSlicerException(f"Failed to read {full_path}: {e}")
     
     def _find_pdg_for_line(self, pdg_dir: str, target_line: int, file_name: str) -> Optional[PDG]:
-        """在 PDG 目录中查找包含目标行的 PDG"""
+        """在 PDG 目录中查找包含目标行的 PDG (先只读取每个方法的头部，命中后才完整解析)"""
+        if os.path.exists(os.path.join(pdg_dir, METHODS_JSON)):
+            return find_pdg_for_line(load_method_pdgs(pdg_dir, file_name), target_line)
         
         for pdg_file in os.listdir(pdg_dir):
             if not pdg_file.endswith('-pdg.dot'):
@@ -501,16 +1510,18 @@ class SingleFileSlicer:
             
             pdg_path = os.path.join(pdg_dir, pdg_file)
             try:
-                pdg = PDG(pdg_path)
+                header = read_pdg_header(pdg_path)
+                if header is None:
+                    continue
+                filename, start_line, end_line = header
                 
                 # 检查文件名
-                if pdg.filename and not pdg.filename.endswith(file_name):
+                if not filename or not filename.endswith(file_name):
                     continue
                 
                 # 检查行号范围
-                if pdg.start_line and pdg.end_line:
-                    if pdg.start_line <= target_line <= pdg.end_line:
-                        return pdg
+                if start_line and end_line and start_line <= target_line <= end_line:
+                    return PDG(pdg_path)
             except Exception as e:
                 logging.debug(f"Failed to load {pdg_file}: {e}")
                 continue
@@ -518,7 +1529,15 @@ class SingleFileSlicer:
         return None
     
     def slice_one(self, task: Dict) -> Dict:
-        """对单个任务执行切片"""
+        """对单个任务执行切片 (结果的 timings 记录各阶段耗时)"""
+        with recording() as timings:
+            result = self._slice_one(task)
+        result["timings"] = timings
+        if result["status"] == "error":
+            result["failure_class"] = classify_error(result.get("error"))
+        return result
+    
+    def _slice_one(self, task: Dict) -> Dict:
         project_name = task.get('project_name_with_version', 'unknown')
         file_path = task.get('file_path', 'unknown')
         target_line = task.get('line_number', 0)
@@ -533,105 +1552,54 @@ class SingleFileSlicer:
             "status": "pending"
         }
         
-        temp_dir = None
+        workspace = get_worker_workspace()
         
         try:
             # 1. 加载源文件
-            full_path, code_lines = self._load_source_file(project_name, file_path)
+            with timed('source_load'):
+                full_path, code_lines = self._load_source_file(project_name, file_path)
             logging.info(f"Loaded source file: {len(code_lines)} lines")
             
-            # 2. 创建临时目录
-            temp_dir = tempfile.mkdtemp(prefix="slice_")
-            logging.info(f"Created temp directory: {temp_dir}")
+            # 查找切片结果缓存 (同一函数在其他项目版本中已切片过)
+            slice_cache = get_slice_cache()
+            cache_key = None
+            if slice_cache:
+                with timed('slice_cache'):
+                    cache_key = lookup_slice_cache(slice_cache, self.joern_analyzer,
+                                                   [(0, result)], code_lines).get(0)
+                if result["status"] == "success":
+                    logging.info("✓ Slice cache hit")
+                    return result
             
-            # 3. 使用 Joern 分析文件
-            pdg_dir = self.joern_analyzer.analyze_file(full_path, temp_dir)
+            # 2. 获取 (已清空的) 工作目录
+            with timed('workspace'):
+                temp_dir = workspace.acquire()
+            logging.info(f"Using workspace: {temp_dir}")
             
-            # 4. 预处理 PDG
-            cfg_dir = os.path.join(temp_dir, 'cfg')
-            cpg_dir = os.path.join(temp_dir, 'cpg')
-            if os.path.exists(cfg_dir) and os.path.exists(cpg_dir):
-                self.joern_analyzer.preprocess_pdg(pdg_dir, cfg_dir, cpg_dir)
+            # 3. 使用 Joern 分析文件并预处理 PDG (优先使用缓存)
+            pdgs = prepare_pdgs(self.joern_analyzer, full_path, temp_dir, [target_line], (project_name, file_path),
+                                code_lines)
             
             # 5. 查找包含目标行的 PDG
-            file_name = os.path.basename(file_path)
-            pdg = self._find_pdg_for_line(pdg_dir, target_line, file_name)
+            pdg = find_pdg_for_line(pdgs, target_line)
             
             if not pdg:
                 raise SingleFileSlicerException(f"No PDG found for line {target_line}")
             
             logging.info(f"Found PDG: {pdg}")
-            result["function_name"] = pdg.method_name
-            result["function_start_line"] = pdg.start_line
-            result["function_end_line"] = pdg.end_line
             
-            # 6. 执行切片，获取节点集
-            engine = SliceEngine(pdg)
-            slice_nodes, metadata = engine.slice(target_line)
+            # 6. 切片、AST 增强和代码提取 (与进程池中的路径相同)
+            slice_task_with_pdg(result, pdg, target_line, code_lines)
+            metadata = result["metadata"]
             
-            logging.info(f"Slice engine returned {len(slice_nodes)} nodes.")
-            
-            # 7. 提取切片行号
-            slice_lines = {node.line_number for node in slice_nodes if node.line_number}
-            
-            # 8. AST 增强（如果启用）
-            enhanced_lines = slice_lines
-            ast_enhanced_success = False
+            logging.info(f"Slice engine returned {metadata['final_node_count']} nodes.")
             if config.ENABLE_AST_FIX:
-                try:
-                    from ast_enhancer import enhance_slice_with_ast
-                    # 提取函数代码（而不是整个文件）
-                    func_start_idx = (pdg.start_line or 1) - 1
-                    func_end_idx = (pdg.end_line or len(code_lines))
-                    func_code = "".join(code_lines[func_start_idx:func_end_idx])
-                    
-                    enhanced_lines = enhance_slice_with_ast(
-                        source_code=func_code,
-                        slice_lines=slice_lines,
-                        language=config.LANGUAGE,
-                        function_start_line=pdg.start_line or 1
-                    )
-                    ast_enhanced_success = len(enhanced_lines) > len(slice_lines)
-                    logging.info(f"AST enhancement: {len(slice_lines)} -> {len(enhanced_lines)} lines (added {len(enhanced_lines) - len(slice_lines)} lines)")
-                except Exception as e:
-                    logging.warning(f"AST enhancement failed, using original slice: {e}")
-                    import traceback
-                    logging.debug(traceback.format_exc())
-                    enhanced_lines = slice_lines
-            
-            # 9. 提取切片代码
-            from code_extractor import extract_code
-            
-            # 构建源代码行字典（1-based）
-            source_line_dict = {i + 1: line for i, line in enumerate(code_lines)}
+                logging.info(f"AST enhancement: {metadata['original_slice_lines']} -> "
+                             f"{metadata['enhanced_slice_lines']} lines")
             
-            # 提取代码（无占位符）
-            sliced_code = extract_code(
-                slice_lines=enhanced_lines,
-                source_lines=source_line_dict,
-                placeholder=None
-            )
-            
-            # 提取代码（带占位符）
-            sliced_code_with_placeholder = extract_code(
-                slice_lines=enhanced_lines,
-                source_lines=source_line_dict,
-                placeholder=config.PLACEHOLDER
-            )
-            
-            # 10. 构建结果
-            result["status"] = "success"
-            result["slice_lines"] = sorted(list(slice_lines))
-            result["enhanced_slice_lines"] = sorted(list(enhanced_lines))
-            result["sliced_code"] = sliced_code
-            result["sliced_code_with_placeholder"] = sliced_code_with_placeholder
-            result["metadata"] = metadata
-            
-            # 更新元数据
-            metadata["original_slice_lines"] = len(slice_lines)
-            metadata["enhanced_slice_lines"] = len(enhanced_lines)
-            metadata["final_node_count"] = len(slice_nodes)
-            metadata["ast_enhanced"] = ast_enhanced_success
+            if slice_cache:
+                with timed('slice_cache'):
+                    store_slice_cache(slice_cache, result, cache_key)
             
             logging.info(f"✓ Slice completed successfully")
             logging.info(f"  Function: {metadata.get('function_name', 'N/A')}")
@@ -648,20 +1616,75 @@ class SingleFileSlicer:
             logging.error(f"Unexpected error: {e}")
             logging.error(traceback.format_exc())
         finally:
-            # 清理临时目录
-            if temp_dir and os.path.exists(temp_dir):
+            # 清空工作目录，供下一个任务复用
+            with timed('workspace'):
+                workspace.release()
+        
+        return result
+    
+    def build_project_stores(self, indexed_tasks: List[Tuple[int, Dict]], multiprocess: bool = True):
+        """
+        批量模式：为待处理任务涉及的每个项目构建 PDG 存储 (已导出的文件跳过)，
+        每个分片只运行一次 Joern，之后这些任务直接从存储中读取 PDG
+        """
+        version = self.joern_version
+        files_by_project: Dict[str, Set[str]] = {}
+        for _, task in indexed_tasks:
+            project = task.get('project_name_with_version', 'unknown')
+            files_by_project.setdefault(project, set()).add(os.path.normpath(task.get('file_path', 'unknown')))
+        
+        jobs = []
+        for project, files in files_by_project.items():
+            store = ProjectStore(config.PDG_DIR, project)
+            missing = store.missing(files) if store.is_current(version) else sorted(files)
+            for shard in plan_shards(missing, config.BULK_SHARD_SIZE):
+                jobs.append((project, shard))
+        
+        if not jobs:
+            logging.info("Bulk mode: all project PDG stores are up to date")
+            return
+        
+        # 大分片先构建
+        jobs.sort(key=lambda job: len(job[1]), reverse=True)
+        logging.info(f"Bulk mode: building {len(jobs)} shards for {len(files_by_project)} projects")
+        start_time = time.time()
+        failed = 0
+        
+        if multiprocess:
+            with WatchdogPool(
+                config.NUM_PROCESSES,
+                build_project_shard,
+                task_timeout=config.BULK_BUILD_TIMEOUT + 60,
+                max_tasks_per_worker=config.MAX_TASKS_PER_WORKER,
+                finalizer=close_worker_resources,
+                on_worker_killed=cleanup_worker_files
+            ) as pool:
+                for job_index, ok, payload in pool.imap_unordered(list(enumerate(jobs))):
+                    project, shard = jobs[job_index]
+                    if ok:
+                        logging.info(f"✓ Built shard of {project} ({len(shard)} files)")
+                    else:
+                        failed += 1
+                        logging.warning(f"Failed to build shard of {project}: {payload}")
+        else:
+            for project, shard in jobs:
                 try:
-                    shutil.rmtree(temp_dir)
-                    logging.debug(f"Cleaned up temp directory: {temp_dir}")
+                    _build_project_shard(self.joern_analyzer, project, shard)
+                    logging.info(f"✓ Built shard of {project} ({len(shard)} files)")
                 except Exception as e:
-                    logging.warning(f"Failed to clean up {temp_dir}: {e}")
+                    failed += 1
+                    logging.warning(f"Failed to build shard of {project}: {e}")
         
-        return result
+        for project in files_by_project:
+            ProjectStore(config.PDG_DIR, project).update_manifest(version)
+        _worker_stores.clear()
+        
+        logging.info(f"Bulk mode: {len(jobs) - failed}/{len(jobs)} shards built in {(time.time() - start_time) / 60:.1f} min"
+                     + (" (files of failed shards fall back to per-file analysis)" if failed else ""))
     
     def slice_all(self) -> List[Dict]:
         """对所有任务执行切片（支持断点续传和分chunk保存）"""
         chunk_results = []
-        chunk_index = self.checkpoint_data.get("chunk_count", 0) + 1
         
         processed_indices = set(self.checkpoint_data.get("processed_indices", []))
         success_count = 0
@@ -671,41 +1694,51 @@ class SingleFileSlicer:
         if processed_indices:
             logging.info(f"Resuming from checkpoint: {len(processed_indices)} tasks already processed")
         
-        for i, task in enumerate(self.tasks):
-            # 跳过已处理的任务
-            if i in processed_indices:
-                logging.debug(f"Skipping already processed task {i+1}/{len(self.tasks)}")
-                continue
-            
-            logging.info(f"\n[{i+1}/{len(self.tasks)}] (Success: {success_count}, Failed: {failed_count})")
-            
-            # 执行切片
-            result = self.slice_one(task)
-            
-            # 统计结果
-            if result['status'] == 'success':
-                success_count += 1
-            else:
-                failed_count += 1
-            
-            # 添加到当前chunk
-            chunk_results.append(result)
-            
-            # 保存断点
-            self._save_checkpoint(i)
-            
-            # 保存进度
-            self._save_progress(i, len(self.tasks), success_count, failed_count)
-            
-            # 如果当前chunk已满，保存并开始新chunk
-            if len(chunk_results) >= config.CHUNK_SIZE:
-                self._save_chunk(chunk_results, chunk_index)
-                chunk_results = []
-                chunk_index += 1
+        tasks_to_process = self._select_tasks()
+        chunk_index = self.checkpoint_data.get("chunk_count", 0) + 1
+        if config.BULK_MODE:
+            self.build_project_stores(tasks_to_process, multiprocess=False)
+        
+        attempted: Set[int] = set()
+        while tasks_to_process:
+            for i, task in tasks_to_process:
+                attempted.add(i)
+                logging.info(f"\n[{i+1}/{len(self.tasks)}] (Success: {success_count}, Failed: {failed_count})")
+                
+                # 执行切片
+                result = self.slice_one(task)
+                
+                # 统计结果
+                if result['status'] == 'success':
+                    success_count += 1
+                else:
+                    failed_count += 1
+                self.phase_stats.add(result.get('timings'))
+                
+                # 添加到当前chunk
+                chunk_results.append((i, result))
+                
+                # 保存断点和失败信息
+                self._record_result(i, result)
+                
+                # 保存进度
+                self._save_progress(i, len(self.tasks), success_count, failed_count)
+                
+                # 如果当前chunk已满，保存并开始新chunk
+                if len(chunk_results) >= config.CHUNK_SIZE:
+                    self._save_chunk(chunk_results, chunk_index)
+                    chunk_results = []
+                    chunk_index += 1
+        
+            # 本次运行中暂时性失败的任务按退避时间重试
+            tasks_to_process = self._retry_round(attempted)
         
         # 保存最后一个未满的chunk
         if chunk_results:
             self._save_chunk(chunk_results, chunk_index)
+        self.journal.close()
+        self._save_progress(len(self.tasks) - 1, len(self.tasks), success_count, failed_count, force=True)
+        self._finish_failures()
         
         # 统计
         total_processed = success_count + failed_count
@@ -725,12 +1758,36 @@ class SingleFileSlicer:
         
         return []  # 不再返回所有结果，因为已经分chunk保存
     
+    def _concurrency_controller(self) -> Optional[AdaptiveConcurrency]:
+        """启用自适应并发时创建控制器"""
+        if not config.ADAPTIVE_CONCURRENCY:
+            return None
+        controller = AdaptiveConcurrency(
+            config.NUM_PROCESSES,
+            min_processes=config.MIN_PROCESSES,
+            max_processes=config.MAX_PROCESSES,
+            mem_reserve_bytes=config.ADAPTIVE_MEM_RESERVE_BYTES,
+            max_load_per_cpu=config.ADAPTIVE_MAX_LOAD_PER_CPU,
+            interval=config.ADAPTIVE_INTERVAL
+        )
+        logging.info(f"Adaptive concurrency enabled: {controller.min_processes}-{controller.max_processes} "
+                     f"processes, starting with {controller.target}")
+        return controller
+    
+    def _worker_pool(self, controller: Optional[AdaptiveConcurrency]) -> WatchdogPool:
+        return WatchdogPool(
+            controller.target if controller else config.NUM_PROCESSES,
+            process_file_group,
+            job_timeout=lambda args: group_timeout(len(args[0])),
+            max_tasks_per_worker=config.MAX_TASKS_PER_WORKER,
+            finalizer=close_worker_resources,
+            on_worker_killed=cleanup_worker_files,
+            controller=controller
+        )
+    
     def slice_all_multiprocess(self) -> List[Dict]:
         """使用多进程并行处理所有任务"""
-        from multiprocessing import Pool, Manager
-        
         chunk_results = []
-        chunk_index = self.checkpoint_data.get("chunk_count", 0) + 1
         
         processed_indices = set(self.checkpoint_data.get("processed_indices", []))
         success_count = 0
@@ -741,73 +1798,110 @@ class SingleFileSlicer:
         if processed_indices:
             logging.info(f"Resuming from checkpoint: {len(processed_indices)} tasks already processed")
         
-        # 准备待处理的任务列表
-        tasks_to_process = []
-        for i, task in enumerate(self.tasks):
-            if i not in processed_indices:
-                tasks_to_process.append((i, task, config.OUTPUT_DIR))
+        # 准备待处理的任务列表 (包括可以重试的失败任务)
+        tasks_to_process = self._select_tasks()
+        chunk_index = self.checkpoint_data.get("chunk_count", 0) + 1
         
         if not tasks_to_process:
             logging.info("All tasks already completed!")
             self.merge_chunks()
             return []
         
-        logging.info(f"Tasks to process: {len(tasks_to_process)}")
+        # 批量模式: 先按项目 (分片) 构建 PDG 存储
+        if config.BULK_MODE:
+            self.build_project_stores(tasks_to_process)
+        
+        # 按 (项目, 文件) 分组，每个文件只做一次 Joern 分析
+        file_groups = group_tasks_by_file(tasks_to_process)
+        
+        # 最长处理时间优先: 大文件先派发，避免最后只剩一个大文件拖住整个运行
+        file_groups.sort(key=file_group_cost, reverse=True)
+        
+        logging.info(f"Tasks to process: {len(tasks_to_process)} ({len(file_groups)} source files)")
+        
+        # 自适应并发: 在运行中根据内存、负载和吞吐量调整进程数
+        controller = self._concurrency_controller()
         
         # 使用进程池处理
         start_time = time.time()
         processed_count = 0
         
         try:
-            with Pool(processes=config.NUM_PROCESSES) as pool:
-                # 使用 imap_unordered 获取结果,按完成顺序返回
-                for task_index, result in pool.imap_unordered(process_single_task, tasks_to_process):
-                    processed_count += 1
-                    
-                    # 统计结果
-                    if result['status'] == 'success':
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                    
-                    # 添加到当前chunk
-                    chunk_results.append(result)
-                    
-                    # 保存断点
-                    self._save_checkpoint(task_index)
-                    
-                    # 保存进度
-                    total_processed = len(processed_indices) + processed_count
-                    self._save_progress(task_index, len(self.tasks), success_count, failed_count)
+            with self._worker_pool(controller) as pool:
+                attempted: Set[int] = set()
+                while file_groups:
+                    # 按完成顺序返回结果 (每次返回一个文件组)
+                    jobs = [(group_index, (group, config.OUTPUT_DIR)) for group_index, group in enumerate(file_groups)]
+                    for group_index, ok, payload in pool.imap_unordered(jobs):
+                        seconds = None
+                        if ok:
+                            group_results = payload
+                        else:
+                            # 超时或崩溃的组按实际耗费的时间平摊到组内任务
+                            seconds = (pool.last_elapsed or 0) / len(file_groups[group_index])
+                            # 超时或工作进程崩溃: 组内所有任务记录同样的错误
+                            group_results = [
+                                (task_index, _mark_error(_new_result(task), SingleFileSlicerException(payload)))
+                                for task_index, task in file_groups[group_index]
+                            ]
+                        
+                        for task_index, result in group_results:
+                            processed_count += 1
+                        
+                            # 统计结果
+                            if result['status'] == 'success':
+                                success_count += 1
+                            else:
+                                failed_count += 1
+                            self.phase_stats.add(result.get('timings'))
+                        
+                            # 添加到当前chunk
+                            chunk_results.append((task_index, result))
+                        
+                            # 保存断点和失败信息
+                            attempted.add(task_index)
+                            self._record_result(task_index, result, seconds)
+                        
+                            # 保存进度
+                            total_processed = len(processed_indices) + processed_count
+                            self._save_progress(task_index, len(self.tasks), success_count, failed_count)
+                        
+                            # 显示进度 (按滑动窗口内的吞吐量估算剩余时间)
+                            rate = self.phase_stats.throughput()
+                            avg_time = 1 / rate if rate > 0 else 0
+                            remaining = max(len(tasks_to_process) - processed_count, 0)
+                            eta = avg_time * remaining
+                        
+                            logging.info(
+                                f"[{total_processed}/{len(self.tasks)}] "
+                                f"Success: {success_count}, Failed: {failed_count}, "
+                                f"Speed: {avg_time:.1f}s/task, ETA: {eta/3600:.1f}h"
+                            )
+                        
+                            # 如果当前chunk已满,保存并开始新chunk
+                            if len(chunk_results) >= config.CHUNK_SIZE:
+                                self._save_chunk(chunk_results, chunk_index)
+                                chunk_results = []
+                                chunk_index += 1
                     
-                    # 显示进度
-                    elapsed = time.time() - start_time
-                    avg_time = elapsed / processed_count if processed_count > 0 else 0
-                    remaining = len(tasks_to_process) - processed_count
-                    eta = avg_time * remaining
-                    
-                    logging.info(
-                        f"[{total_processed}/{len(self.tasks)}] "
-                        f"Success: {success_count}, Failed: {failed_count}, "
-                        f"Speed: {avg_time:.1f}s/task, ETA: {eta/3600:.1f}h"
-                    )
-                    
-                    # 如果当前chunk已满,保存并开始新chunk
-                    if len(chunk_results) >= config.CHUNK_SIZE:
-                        self._save_chunk(chunk_results, chunk_index)
-                        chunk_results = []
-                        chunk_index += 1
+                    # 本次运行中暂时性失败的任务按退避时间重试 (进程池保持不变)
+                    file_groups = group_tasks_by_file(self._retry_round(attempted))
         
         except KeyboardInterrupt:
             logging.warning("\nProcess interrupted by user")
             # 保存当前已完成的chunk
             if chunk_results:
                 self._save_chunk(chunk_results, chunk_index)
+            self.journal.close()
+            self.failures.close()
             raise
         
         # 保存最后一个未满的chunk
         if chunk_results:
             self._save_chunk(chunk_results, chunk_index)
+        self.journal.close()
+        self._save_progress(len(self.tasks) - 1, len(self.tasks), success_count, failed_count, force=True)
+        self._finish_failures()
         
         # 统计
         total_processed = success_count + failed_count
@@ -821,6 +1915,9 @@ class SingleFileSlicer:
         logging.info(f"  Failed: {failed_count} ({failed_count/total_processed*100:.1f}%)" if total_processed > 0 else "  Failed: 0")
         logging.info(f"  Time elapsed: {elapsed/3600:.2f} hours")
         logging.info(f"  Average speed: {elapsed/total_processed:.1f} seconds/task" if total_processed > 0 else "")
+        logging.info(f"  Workers killed (timeout/crash): {pool.killed_count}, recycled: {pool.recycled_count}")
+        if controller:
+            logging.info(f"  Adaptive concurrency: {len(controller.history)} adjustments, final {controller.target} processes")
         logging.info(f"  Saved in {chunk_index} chunks")
         
         # 自动合并所有chunk文件
@@ -830,24 +1927,153 @@ class SingleFileSlicer:
         
         return []
     
-    def save_results(self, results: List[Dict]):
+    def slice_all_queue(self) -> List[Dict]:
         """
-        合并所有chunk文件并保存最终结果
-        注意：由于使用了分chunk保存，这个方法主要用于合并已有的chunk文件
+        共享任务队列模式: 从 QUEUE_DB 中动态租用文件组并行处理，直到队列中所有任务完成
+        
+        结果写入本进程的输出目录 (见 use_worker_output_dir)，chunk 落盘后才在队列中标记完成；
+        进程中途退出时未标记的任务在租约到期后由其他进程重新处理。
+        暂时性失败的任务放回队列，退避后重试；确定性失败和重试次数用完的任务记为 error。
         """
-        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+        queue = WorkQueue(config.QUEUE_DB, config.QUEUE_WORKER_ID, config.QUEUE_LEASE_SECONDS)
+        added = queue.populate(self.tasks, config.REPOSITORY_DIR)
+        if added:
+            logging.info(f"Initialized work queue {config.QUEUE_DB} with {added} tasks")
+        if config.RETRY_QUARANTINED:
+            requeued = queue.requeue_errors()
+            if requeued:
+                logging.info(f"Returned {requeued} failed tasks to the queue (--retry-quarantined)")
+        queue.register()
+        logging.info(f"Worker {queue.worker_id} joined queue {config.QUEUE_DB} "
+                     f"({queue.unfinished()} unfinished tasks), writing to {config.OUTPUT_DIR}")
         
-        # 如果没有传入results，尝试从chunk文件加载
-        if not results:
-            logging.info("Loading results from chunk files...")
-            results = self._load_all_chunks()
+        chunk_results = []
+        chunk_index = self.checkpoint_data.get("chunk_count", 0) + 1
+        completions = []  # (任务索引, 状态, 耗时, 错误)，所在 chunk 落盘后提交给队列
+        leased_groups: Dict[str, List[Tuple[int, Dict]]] = {}
+        success_count = 0
+        failed_count = 0
+        start_time = time.time()
+        
+        def jobs():
+            while True:
+                leased = queue.lease()
+                if leased is None:
+                    return
+                key, indices = leased
+                if indices:
+                    leased_groups[key] = [(i, self.tasks[i]) for i in indices]
+                    yield key, (leased_groups[key], config.OUTPUT_DIR)
+        
+        def flush():
+            nonlocal chunk_results, chunk_index, completions
+            saved = not chunk_results or self._save_chunk(chunk_results, chunk_index)
+            if not saved:
+                # 结果没有落盘: 不能标记完成，交还租约由其他进程重新处理，并停止本进程
+                queue.release([task_index for task_index, _ in chunk_results])
+                chunk_results = []
+                completions = []
+                raise SingleFileSlicerException(f"Failed to save chunk {chunk_index}, leases returned to the queue")
+            if chunk_results:
+                chunk_results = []
+                chunk_index += 1
+            queue.complete(completions)
+            completions = []
+        
+        controller = self._concurrency_controller()
+        try:
+            with Heartbeat(queue, config.QUEUE_HEARTBEAT_INTERVAL), self._worker_pool(controller) as pool:
+                while True:
+                    for key, ok, payload in pool.imap_unordered(jobs()):
+                        group = leased_groups.pop(key)
+                        group_seconds = None
+                        if ok:
+                            group_results = payload
+                        else:
+                            # 超时或工作进程崩溃: 组内所有任务记录同样的错误，按实际耗费的时间平摊
+                            group_seconds = (pool.last_elapsed or 0) / len(group)
+                            group_results = [
+                                (task_index, _mark_error(_new_result(task), SingleFileSlicerException(payload)))
+                                for task_index, task in group
+                            ]
+                        attempts = queue.attempts(task_index for task_index, _ in group)
+                        retries = []
+                        for task_index, result in group_results:
+                            if result['status'] == 'success':
+                                success_count += 1
+                            else:
+                                failed_count += 1
+                            timings = result.get('timings')
+                            self.phase_stats.add(timings)
+                            seconds = group_seconds if group_seconds is not None else (
+                                sum(timings.values()) if timings else None)
+                            self.failures.record(task_index, result, seconds)
+                            self._save_progress(task_index, len(self.tasks), success_count, failed_count)
+                            
+                            # 暂时性失败且尝试次数未用完: 放回队列，退避后由任意进程重试
+                            attempt = attempts.get(task_index, 1)
+                            failure_class = result.get('failure_class') or classify_error(result.get('error'))
+                            if (result['status'] != 'success' and failure_class not in DETERMINISTIC
+                                    and attempt < config.RETRY_MAX_ATTEMPTS):
+                                delay = backoff_delay(attempt, config.RETRY_BACKOFF_BASE, config.RETRY_BACKOFF_MAX)
+                                retries.append((task_index, time.time() + delay, seconds, result.get('error')))
+                                continue
+                            chunk_results.append((task_index, result))
+                            completions.append((task_index, result['status'], seconds, result.get('error')))
+                        if retries:
+                            queue.retry(retries)
+                            logging.info(f"{len(retries)} tasks of {key} failed with transient errors, "
+                                         f"returned to the queue for retry")
+                        logging.info(f"[{queue.worker_id}] Success: {success_count}, Failed: {failed_count}, "
+                                     f"{self.phase_stats.throughput() * 3600:.0f} tasks/h")
+                        if len(chunk_results) >= config.CHUNK_SIZE:
+                            flush()
+                    
+                    # 暂时没有可租用的任务: 先提交已完成的结果，其他进程的租约到期后可能还有任务
+                    flush()
+                    remaining = queue.unfinished()
+                    if remaining == 0:
+                        break
+                    logging.info(f"{remaining} tasks are leased by other workers or waiting to be retried, "
+                                 f"waiting {config.QUEUE_POLL_INTERVAL}s")
+                    time.sleep(config.QUEUE_POLL_INTERVAL)
+        except BaseException:
+            # 已完成的结果落盘并提交，其余租约交还队列
+            try:
+                flush()
+            finally:
+                queue.release()
+                self.journal.close()
+                self.failures.close()
+            raise
+        
+        self.journal.close()
+        self._save_progress(len(self.tasks) - 1, len(self.tasks), success_count, failed_count, force=True)
+        self._finish_failures()
+        
+        total_processed = success_count + failed_count
+        elapsed = time.time() - start_time
+        logging.info(f"\n{'='*60}")
+        logging.info("Work queue drained!")
+        logging.info(f"  Processed by this worker: {total_processed} (Success: {success_count}, Failed: {failed_count})")
+        logging.info(f"  Time elapsed: {elapsed/3600:.2f} hours")
+        logging.info(f"  Saved in {chunk_index - 1} chunks under {config.OUTPUT_DIR}")
+        logging.info("Merge the outputs of all workers with: python single_file_slicer.py --queue-merge")
         
+        return []
+    
+    def save_results(self, results: List[Dict]):
+        """
+        保存最终结果
+        注意：由于使用了分chunk保存，没有传入results时改为流式合并已有的chunk文件
+        """
         if not results:
-            logging.warning("No results to save")
+            self.merge_chunks()
             return
         
+        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
         output_path = config.OUTPUT_JSON
-        logging.info(f"\nSaving merged results to {output_path}")
+        logging.info(f"\nSaving results to {output_path}")
         
         try:
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -860,21 +2086,7 @@ class SingleFileSlicer:
         
         # 保存简化版本
         summary_path = output_path.replace('.json', '_summary.json')
-        summary = []
-        for r in results:
-            summary_item = {
-                "project": r.get("project"),
-                "file": r.get("file"),
-                "line": r.get("line"),
-                "status": r.get("status"),
-                "function_name": r.get("function_name"),
-                "slice_lines_count": len(r.get("slice_lines", [])),
-                "enhanced_lines_count": len(r.get("enhanced_slice_lines", [])),
-                "metadata": r.get("metadata", {})
-            }
-            if r.get("status") == "error":
-                summary_item["error"] = r.get("error")
-            summary.append(summary_item)
+        summary = [chunk_store.summarize_result(r) for r in results]
         
         with open(summary_path, 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
@@ -882,35 +2094,25 @@ class SingleFileSlicer:
         logging.info(f"✓ Summary saved to {summary_path}")
     
     def _load_all_chunks(self) -> List[Dict]:
-        """加载所有chunk文件并合并"""
-        all_results = []
-        chunk_files = sorted([f for f in os.listdir(config.OUTPUT_DIR) 
-                             if f.startswith('slices_chunk_') and f.endswith('.json') 
-                             and '_summary' not in f])
-        
-        logging.info(f"Found {len(chunk_files)} chunk files")
-        
-        for chunk_file in chunk_files:
-            chunk_path = os.path.join(config.OUTPUT_DIR, chunk_file)
-            try:
-                with open(chunk_path, 'r', encoding='utf-8') as f:
-                    chunk_data = json.load(f)
-                all_results.extend(chunk_data)
-                logging.info(f"  Loaded {chunk_file}: {len(chunk_data)} items")
-            except Exception as e:
-                logging.warning(f"  Failed to load {chunk_file}: {e}")
-        
-        return all_results
+        """加载所有chunk文件并合并 (会把所有结果读入内存，合并输出请使用 merge_chunks)"""
+        return list(chunk_store.iter_results(config.OUTPUT_DIR))
     
     def merge_chunks(self):
-        """合并所有chunk文件为最终结果文件"""
+        """按任务顺序流式合并所有chunk文件为最终结果文件"""
         logging.info("\nMerging all chunk files...")
-        results = self._load_all_chunks()
-        if results:
-            self.save_results(results)
-            logging.info(f"✓ Merged {len(results)} results from chunk files")
-        else:
+        try:
+            stats = chunk_store.merge_chunks(config.OUTPUT_DIR, config.OUTPUT_JSON, config.OUTPUT_COMPRESS)
+        except Exception as e:
+            logging.error(f"Failed to merge chunks: {e}")
+            return
+        if stats is None:
             logging.warning("No chunk files found to merge")
+            return
+        output_path = config.OUTPUT_JSON + ('.gz' if config.OUTPUT_COMPRESS else '')
+        logging.info(f"✓ Merged {stats['total']} results into {output_path} "
+                     f"(success: {stats['success']}, error: {stats['error']}, "
+                     f"slice lines: {stats['slice_lines']}, enhanced lines: {stats['enhanced_lines']})")
+        update_result_store([config.OUTPUT_DIR])
     
     def get_progress_info(self) -> Dict:
         """获取处理进度信息"""
@@ -924,12 +2126,11 @@ class SingleFileSlicer:
     
     def clear_checkpoint(self):
         """清除断点信息（重新开始处理）"""
-        if os.path.exists(config.CHECKPOINT_FILE):
-            try:
-                os.remove(config.CHECKPOINT_FILE)
-                logging.info("✓ Checkpoint cleared")
-            except Exception as e:
-                logging.warning(f"Failed to clear checkpoint: {e}")
+        try:
+            self.journal.clear()
+            logging.info("✓ Checkpoint cleared")
+        except Exception as e:
+            logging.warning(f"Failed to clear checkpoint: {e}")
         
         if os.path.exists(config.PROGRESS_FILE):
             try:
@@ -938,7 +2139,15 @@ class SingleFileSlicer:
             except Exception as e:
                 logging.warning(f"Failed to clear progress: {e}")
         
-        self.checkpoint_data = {"processed_indices": [], "chunk_count": 0}
+        # chunk 编号从 1 重新开始，旧的 chunk 和索引必须一起删除
+        try:
+            removed = chunk_store.clear_chunks(config.OUTPUT_DIR)
+            if removed:
+                logging.info(f"✓ Removed {removed} chunk files from previous run")
+        except Exception as e:
+            logging.warning(f"Failed to clear chunks: {e}")
+        
+        self.checkpoint_data = empty_checkpoint()
 
 
 def main():
@@ -956,6 +2165,49 @@ def main():
                        help='Number of parallel processes (default: 3)')
     parser.add_argument('--no-multiprocess', action='store_true',
                        help='Disable multiprocessing, run in single process')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Adjust the number of processes at runtime from free memory, swapping, load and throughput '
+                            '(--processes is the starting value)')
+    parser.add_argument('--max-processes', type=int, default=None,
+                       help='Upper bound for --adaptive (default: number of CPUs)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Persistent PDG cache directory keyed by file content, Joern version and export options')
+    parser.add_argument('--cache-size-gb', type=float, default=None,
+                       help='PDG cache size limit in GB (LRU eviction, default: 20)')
+    parser.add_argument('--joern-server', action='store_true',
+                       help='Keep one long-lived Joern server (JVM) per worker instead of spawning joern-parse/joern-export per task')
+    parser.add_argument('--workspace-dir', type=str, default=None,
+                       help='Base directory for the per-worker workspace, e.g. /dev/shm (default: system temp dir)')
+    parser.add_argument('--slice-cache-dir', type=str, default=None,
+                       help='Persistent slice result cache keyed by the enclosing function text, relative line and settings '
+                            '(reuses slices across project versions)')
+    parser.add_argument('--targeted-export', action='store_true',
+                       help='Export only the methods enclosing the target lines, as JSON, in a single Joern invocation')
+    parser.add_argument('--fast-path', action='store_true',
+                       help='Build PDGs in-process with tree-sitter for small functions, and when Joern fails or times out')
+    parser.add_argument('--fast-path-max-lines', type=int, default=None,
+                       help='With --fast-path, largest function (in lines) sliced without Joern (default: 50)')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Import each project version into Joern once and export all needed files to PDG_DIR before slicing')
+    parser.add_argument('--bulk-shard-size', type=int, default=None,
+                       help='With --bulk, import at most this many source files (plus all headers) per Joern run')
+    parser.add_argument('--compress-output', action='store_true',
+                       help='Write the merged results as gzip-compressed slices.json.gz')
+    parser.add_argument('--distance-depth', type=int, default=None,
+                       help='Record BFS distance labels up to this depth so depth_materializer.py can '
+                            'produce smaller-depth slices without re-running Joern')
+    parser.add_argument('--result-store', type=str, default=None,
+                       help='Also append merged results to this compressed, seekable result store (see result_store.py)')
+    parser.add_argument('--retry-quarantined', action='store_true',
+                       help='Also re-run tasks quarantined after deterministic or repeated failures')
+    parser.add_argument('--failure-report', action='store_true',
+                       help='Print failure classes and the per-file time lost to failures, then exit')
+    parser.add_argument('--queue', type=str, default=None,
+                       help='Pull file groups from a shared SQLite work queue (created on first use)')
+    parser.add_argument('--worker-id', type=str, default=None,
+                       help='With --queue, name of this worker (default: hostname-pid)')
+    parser.add_argument('--queue-merge', action='store_true',
+                       help='Merge the outputs of all queue workers into the final JSON and exit')
     
     args = parser.parse_args()
     
@@ -964,6 +2216,65 @@ def main():
     print("=" * 60)
     
     try:
+        # 设置 PDG 缓存
+        if args.cache_dir:
+            config.PDG_CACHE_DIR = os.path.abspath(args.cache_dir)
+        if args.slice_cache_dir:
+            config.SLICE_CACHE_DIR = os.path.abspath(args.slice_cache_dir)
+        if args.cache_size_gb:
+            config.PDG_CACHE_MAX_BYTES = int(args.cache_size_gb * 1024 ** 3)
+        
+        # 设置 Joern 服务模式
+        if args.joern_server:
+            config.JOERN_SERVER_MODE = True
+        if args.targeted_export:
+            config.JOERN_TARGETED_EXPORT = True
+        
+        # 设置工作目录位置
+        if args.workspace_dir:
+            config.WORKSPACE_DIR = args.workspace_dir
+        
+        if args.compress_output:
+            config.OUTPUT_COMPRESS = True
+        if args.result_store:
+            config.RESULT_STORE = os.path.abspath(args.result_store)
+        
+        # 设置 tree-sitter 快速路径
+        if args.fast_path:
+            config.TS_FAST_PATH = True
+        if args.fast_path_max_lines:
+            config.TS_FAST_PATH_MAX_LINES = args.fast_path_max_lines
+        
+        if args.distance_depth:
+            config.SLICE_DISTANCE_DEPTH = args.distance_depth
+        
+        # 设置批量模式
+        if args.bulk:
+            config.BULK_MODE = True
+        if args.bulk_shard_size:
+            config.BULK_SHARD_SIZE = args.bulk_shard_size
+        
+        if args.retry_quarantined:
+            config.RETRY_QUARANTINED = True
+        
+        # 失败报告 (不需要 Joern)
+        if args.failure_report:
+            print_failure_report()
+            return 0
+        
+        # 共享任务队列: 合并各进程的输出 (不需要 Joern)
+        if args.queue_merge:
+            return 0 if merge_queue_outputs() else 1
+        
+        # 共享任务队列: 本进程的 chunk、断点和进度写入独立目录
+        if args.queue:
+            config.QUEUE_DB = os.path.abspath(args.queue)
+            if args.progress:
+                print(json.dumps(WorkQueue(config.QUEUE_DB).summary(), indent=2, ensure_ascii=False))
+                return 0
+            config.QUEUE_WORKER_ID = args.worker_id or config.QUEUE_WORKER_ID or default_worker_id()
+            use_worker_output_dir(config.QUEUE_WORKER_ID)
+        
         slicer = SingleFileSlicer()
         
         # 显示进度
@@ -993,6 +2304,10 @@ def main():
         # 设置进程数
         if args.processes:
             config.NUM_PROCESSES = args.processes
+        if args.adaptive:
+            config.ADAPTIVE_CONCURRENCY = True
+        if args.max_processes:
+            config.MAX_PROCESSES = args.max_processes
         
         # 设置是否启用多进程
         use_multiprocess = config.ENABLE_MULTIPROCESSING and not args.no_multiprocess
@@ -1002,12 +2317,27 @@ def main():
         print(f"  Chunk Size: {config.CHUNK_SIZE}")
         print(f"  Checkpoint Enabled: {config.ENABLE_CHECKPOINT}")
         print(f"  AST Enhancement: {config.ENABLE_AST_FIX}")
+        print(f"  Joern Server Mode: {config.JOERN_SERVER_MODE}")
+        print(f"  Targeted Export: {config.JOERN_TARGETED_EXPORT}")
+        print(f"  PDG Cache: {config.PDG_CACHE_DIR or 'Disabled'}")
+        print(f"  Slice Cache: {config.SLICE_CACHE_DIR or 'Disabled'}")
+        print("  tree-sitter Fast Path: "
+              + (f"functions <= {config.TS_FAST_PATH_MAX_LINES} lines" if config.TS_FAST_PATH else 'Disabled'))
+        print(f"  Slice Depth: backward {config.BACKWARD_DEPTH}, forward {config.FORWARD_DEPTH}"
+              + (f", distance labels up to {distance_depth()}" if distance_depth() else ""))
+        print(f"  Bulk Mode: {config.PDG_DIR if config.BULK_MODE else 'Disabled'}")
+        print(f"  Workspace: {config.WORKSPACE_DIR or 'System temp dir'}")
+        if config.QUEUE_DB:
+            print(f"  Work Queue: {config.QUEUE_DB} (worker {config.QUEUE_WORKER_ID})")
         print(f"  Multiprocessing: {'Enabled' if use_multiprocess else 'Disabled'}")
         if use_multiprocess:
-            print(f"  Parallel Processes: {config.NUM_PROCESSES}")
+            print(f"  Parallel Processes: {config.NUM_PROCESSES}"
+                  + (f" (adaptive, max {config.MAX_PROCESSES or os.cpu_count()})" if config.ADAPTIVE_CONCURRENCY else ""))
         
         # 执行切片 (完成后会自动合并chunk)
-        if use_multiprocess:
+        if config.QUEUE_DB:
+            slicer.slice_all_queue()
+        elif use_multiprocess:
             slicer.slice_all_multiprocess()
         else:
             slicer.slice_all()
@@ -0,0 +1,149 @@
+"""
+切片结果缓存 (跨项目版本复用)
+同一个函数在多个项目版本中往往完全相同，同一告警行在每个版本中都会被重新切片。
+本缓存以 (规范化后的所在函数文本哈希, 目标行在函数内的相对行号, 切片配置) 为键，
+保存以函数起始行为基准的相对行号结果；命中时把行号平移到新文件中并重新提取代码，不再调用 Joern。
+
+函数边界由 tree-sitter 确定；规范化只去掉行尾空白并统一换行符，行数不变，因此相对行号可以直接平移。
+目录结构: <cache_dir>/<key[:2]>/<key>.json，先写临时文件再原子替换，多进程并发写入是安全的。
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import ast_enhancer
+from ts_pdg_builder import iter_functions
+
+CACHE_FORMAT = 1
+
+# 以函数起始行为基准保存的行号字段
+_LINE_LIST_FIELDS = ('slice_lines', 'enhanced_slice_lines')
+_LINE_FIELDS = ('function_start_line', 'function_end_line')
+_METADATA_LINE_FIELDS = ('function_start_line', 'function_end_line', 'target_line')
+
+
+def normalize_function(text: str) -> str:
+    """去掉行尾空白并统一换行符 (不改变行数)"""
+    return '\n'.join(line.rstrip() for line in text.splitlines())
+
+
+def function_keys(source_code: str, target_lines: List[int], fingerprint: str,
+                  language: str = 'c') -> Dict[int, Tuple[str, int]]:
+    """
+    计算各目标行的缓存键
+
+    Returns:
+        {目标行: (缓存键, 所在函数起始行)}，不在任何函数中的目标行没有键
+    """
+    data = source_code.encode('utf-8')
+    tree = ast_enhancer.get_cached_parser(language).parse(data)
+    spans = []
+    for fn in iter_functions(tree.root_node):
+        spans.append((fn.start_point[0] + 1, fn.end_point[0] + 1, fn.start_byte, fn.end_byte))
+
+    keys = {}
+    digests: Dict[int, str] = {}
+    for line in set(target_lines):
+        for start, end, start_byte, end_byte in spans:
+            if start <= line <= end:
+                digest = digests.get(start)
+                if digest is None:
+                    text = normalize_function(data[start_byte:end_byte].decode('utf-8', errors='replace'))
+                    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                    digests[start] = digest
+                h = hashlib.sha256(f"{CACHE_FORMAT}|{digest}|{line - start}|{fingerprint}".encode('utf-8'))
+                keys[line] = (h.hexdigest(), start)
+                break
+    return keys
+
+
+def make_entry(result: Dict, base: int) -> Dict:
+    """把成功的切片结果转换为相对于函数起始行 base 的缓存条目 (不保存代码文本)"""
+    entry = {
+        "function_name": result.get("function_name"),
+        "backend": result.get("backend"),
+        "metadata": dict(result.get("metadata", {}))
+    }
+    for field in _LINE_LIST_FIELDS:
+        entry[field] = [line - base for line in result.get(field, [])]
+    for field in _LINE_FIELDS:
+        value = result.get(field)
+        entry[field] = value - base if value is not None else None
+    for field in _METADATA_LINE_FIELDS:
+        value = entry["metadata"].get(field)
+        if value is not None:
+            entry["metadata"][field] = value - base
+    if result.get("slice_distances"):
+        entry["slice_distances"] = _shift_distances(result["slice_distances"], -base)
+    return entry
+
+
+def apply_entry(result: Dict, entry: Dict, base: int) -> Dict:
+    """把缓存条目的行号平移到函数起始行 base 处，写入 result (代码文本由调用方重新提取)"""
+    result["function_name"] = entry.get("function_name")
+    for field in _LINE_FIELDS:
+        value = entry.get(field)
+        result[field] = value + base if value is not None else None
+    result["backend"] = entry.get("backend")
+    for field in _LINE_LIST_FIELDS:
+        result[field] = [line + base for line in entry.get(field, [])]
+    metadata = dict(entry.get("metadata", {}))
+    for field in _METADATA_LINE_FIELDS:
+        value = metadata.get(field)
+        if value is not None:
+            metadata[field] = value + base
+    metadata["slice_cache_hit"] = True
+    result["metadata"] = metadata
+    if entry.get("slice_distances"):
+        result["slice_distances"] = _shift_distances(entry["slice_distances"], base)
+    return result
+
+
+def _shift_distances(distances: Dict, offset: int) -> Dict:
+    """距离标签中的行号平移 offset"""
+    return {"max_depth": distances["max_depth"],
+            "nodes": [[line + offset if line is not None else None, b, f] for line, b, f in distances["nodes"]]}
+
+
+class SliceCache:
+    """切片结果缓存"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable slice cache entry {path}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{key[:8]}_", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
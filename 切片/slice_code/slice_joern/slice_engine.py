@@ -151,6 +151,18 @@ class SliceEngine:
             criteria_nodes, criteria_identifier, forward_depth
         )
         
+        all_slice_nodes, metadata = self._merge(target_line, criteria_nodes, backward_nodes, forward_nodes)
+        
+        logging.info(f"Slice complete: {len(all_slice_nodes)} nodes found.")
+        
+        return all_slice_nodes, metadata
+    
+    def _merge(self,
+               target_line: int,
+               criteria_nodes: List[PDGNode],
+               backward_nodes: Set[PDGNode],
+               forward_nodes: Set[PDGNode]) -> Tuple[Set[PDGNode], Dict]:
+        """合并前向和后向切片结果并生成元数据"""
         # 合并所有节点
         all_slice_nodes = backward_nodes.union(forward_nodes)
         
@@ -170,6 +182,188 @@ class SliceEngine:
             "slice_density": len(slice_lines) / (self.pdg.end_line - self.pdg.start_line + 1) if self.pdg.end_line and self.pdg.start_line else 0
         }
         
-        logging.info(f"Slice complete: {len(all_slice_nodes)} nodes found.")
-        
         return all_slice_nodes, metadata
+    
+    def _batch_layers(self,
+                      criteria: List[List[PDGNode]],
+                      backward: bool,
+                      criteria_identifier: Dict[int, Set[str]],
+                      depth: int) -> List[Dict[int, int]]:
+        """
+        位集标记的分层 BFS：一次遍历同时计算多个切片准则的可达节点
+        
+        第 i 个准则对应位 1 << i。每一层只沿本层新获得的位扩展，
+        节点对某个准则的位在其 BFS 深度首次被置上，因此每个准则得到的节点集合
+        与单独执行 backward_slice / forward_slice 完全一致
+        (标识符过滤只取决于被扩展的节点和边，与遍历顺序无关)。
+        
+        Returns:
+            每一层新到达的 {节点编号: 准则位集}，第 k 层即与准则距离为 k 的节点
+        """
+        neighbors = self.pdg.get_predecessors if backward else self.pdg.get_successors
+        
+        reached: Dict[int, int] = {}
+        frontier: Dict[int, int] = {}
+        for bit, nodes in enumerate(criteria):
+            for node in nodes:
+                reached[node.node_id] = reached.get(node.node_id, 0) | (1 << bit)
+                frontier[node.node_id] = frontier.get(node.node_id, 0) | (1 << bit)
+        layers = [frontier]
+        
+        for _ in range(depth):
+            if not frontier:
+                break
+            next_frontier: Dict[int, int] = {}
+            for node_id, bits in frontier.items():
+                node = self.pdg.get_node(node_id)
+                edges = neighbors(node_id, config.DDG_LABEL)
+                edges.extend(neighbors(node_id, config.CDG_LABEL))
+                
+                for other, edge_label in edges:
+                    # 如果指定了标识符过滤
+                    if node.line_number in criteria_identifier:
+                        edge_var = edge_label.replace(config.DDG_LABEL + ': ', '').replace(config.CDG_LABEL + ': ', '')
+                        if edge_var and edge_var not in criteria_identifier[node.line_number]:
+                            continue
+                    
+                    new_bits = bits & ~reached.get(other.node_id, 0)
+                    if new_bits:
+                        reached[other.node_id] = reached.get(other.node_id, 0) | new_bits
+                        next_frontier[other.node_id] = next_frontier.get(other.node_id, 0) | new_bits
+            frontier = next_frontier
+            if frontier:
+                layers.append(frontier)
+        
+        return layers
+    
+    def _batch_reach(self,
+                     criteria: List[List[PDGNode]],
+                     backward: bool,
+                     criteria_identifier: Dict[int, Set[str]],
+                     depth: int) -> Dict[int, int]:
+        """
+        见 _batch_layers
+        
+        Returns:
+            节点编号 -> 可达该节点的准则位集
+        """
+        reached: Dict[int, int] = {}
+        for layer in self._batch_layers(criteria, backward, criteria_identifier, depth):
+            for node_id, bits in layer.items():
+                reached[node_id] = reached.get(node_id, 0) | bits
+        return reached
+    
+    def slice_many(self,
+                   target_lines: List[int],
+                   criteria_identifier: Dict[int, Set[str]] = None,
+                   backward_depth: int = config.BACKWARD_DEPTH,
+                   forward_depth: int = config.FORWARD_DEPTH) -> Dict[int, Tuple[Set[PDGNode], Dict]]:
+        """
+        批量切片：同一个 PDG 上的多个目标行共用一次后向和一次前向遍历
+        
+        每个目标行的节点集合和元数据与单独调用 slice 的结果相同。
+        
+        Args:
+            target_lines: 目标行号列表
+            criteria_identifier: 标识符过滤字典
+            backward_depth: 后向切片深度
+            forward_depth: 前向切片深度
+            
+        Returns:
+            目标行号 -> (切片节点集合, 元数据字典)
+        """
+        if criteria_identifier is None:
+            criteria_identifier = {}
+        
+        results: Dict[int, Tuple[Set[PDGNode], Dict]] = {}
+        lines: List[int] = []
+        criteria: List[List[PDGNode]] = []
+        for target_line in dict.fromkeys(target_lines):
+            criteria_nodes = self.pdg.get_nodes_by_line(target_line)
+            if not criteria_nodes:
+                logging.warning(f"No nodes found for line {target_line}")
+                results[target_line] = (set(), {})
+                continue
+            lines.append(target_line)
+            criteria.append(criteria_nodes)
+        
+        if not lines:
+            return results
+        
+        backward = self._batch_reach(criteria, True, criteria_identifier, backward_depth)
+        forward = self._batch_reach(criteria, False, criteria_identifier, forward_depth)
+        
+        for bit, (target_line, criteria_nodes) in enumerate(zip(lines, criteria)):
+            mask = 1 << bit
+            backward_nodes = {self.pdg.get_node(n) for n, bits in backward.items() if bits & mask}
+            forward_nodes = {self.pdg.get_node(n) for n, bits in forward.items() if bits & mask}
+            results[target_line] = self._merge(target_line, criteria_nodes, backward_nodes, forward_nodes)
+        
+        logging.info(f"Batch slice complete: {len(lines)} target lines in {self.pdg.method_name}.")
+        
+        return results
+    
+    def distance_labels(self,
+                        target_lines: List[int],
+                        criteria_identifier: Dict[int, Set[str]] = None,
+                        max_depth: int = max(config.BACKWARD_DEPTH, config.FORWARD_DEPTH)
+                        ) -> Dict[int, Dict[int, List[Optional[int]]]]:
+        """
+        距离标签：一次遍历到 max_depth，记录每个可达节点与切片准则的后向/前向 BFS 距离
+        
+        深度 (b, f) <= max_depth 的切片就是后向距离 <= b 或前向距离 <= f 的节点，
+        由 slice_from_labels 或 nodes_within 得到，与 slice(target_line, ..., b, f) 完全一致。
+        
+        Returns:
+            目标行号 -> {节点编号: [后向距离, 前向距离]} (未到达的方向为 None)，
+            目标行没有节点时为空字典
+        """
+        if criteria_identifier is None:
+            criteria_identifier = {}
+        
+        labels: Dict[int, Dict[int, List[Optional[int]]]] = {}
+        lines: List[int] = []
+        criteria: List[List[PDGNode]] = []
+        for target_line in dict.fromkeys(target_lines):
+            criteria_nodes = self.pdg.get_nodes_by_line(target_line)
+            labels[target_line] = {}
+            if not criteria_nodes:
+                logging.warning(f"No nodes found for line {target_line}")
+                continue
+            lines.append(target_line)
+            criteria.append(criteria_nodes)
+        
+        for direction, backward in ((0, True), (1, False)):
+            layers = self._batch_layers(criteria, backward, criteria_identifier, max_depth)
+            for distance, layer in enumerate(layers):
+                for node_id, bits in layer.items():
+                    for bit, target_line in enumerate(lines):
+                        if bits >> bit & 1:
+                            labels[target_line].setdefault(node_id, [None, None])[direction] = distance
+        
+        return labels
+    
+    def slice_from_labels(self,
+                          target_line: int,
+                          labels: Dict[int, List[Optional[int]]],
+                          backward_depth: int = config.BACKWARD_DEPTH,
+                          forward_depth: int = config.FORWARD_DEPTH) -> Tuple[Set[PDGNode], Dict]:
+        """由 distance_labels 的结果得到指定深度的切片，返回值与 slice 相同"""
+        criteria_nodes = self.pdg.get_nodes_by_line(target_line)
+        if not criteria_nodes:
+            return set(), {}
+        backward_nodes = {self.pdg.get_node(n) for n, (b, _) in labels.items()
+                          if b is not None and b <= backward_depth}
+        forward_nodes = {self.pdg.get_node(n) for n, (_, f) in labels.items()
+                         if f is not None and f <= forward_depth}
+        return self._merge(target_line, criteria_nodes, backward_nodes, forward_nodes)
+
+
+def nodes_within(distances: List[List[Optional[int]]],
+                 backward_depth: int, forward_depth: int) -> List[List[Optional[int]]]:
+    """
+    从保存的距离标签 [[行号, 后向距离, 前向距离], ...] 中取出深度 (backward_depth, forward_depth) 切片的节点
+    (不需要 PDG)
+    """
+    return [d for d in distances
+            if (d[1] is not None and d[1] <= backward_depth) or (d[2] is not None and d[2] <= forward_depth)]
@@ -5,6 +5,7 @@
 import os
 import json
 import sys
+import tempfile
 
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -32,6 +33,45 @@ def test_checkpoint_files():
         else:
             print(f"- {name} does not exist (OK for first run)")
     
+    if os.path.exists(config.CHECKPOINT_JOURNAL):
+        with open(config.CHECKPOINT_JOURNAL, 'r') as f:
+            pending = sum(1 for _ in f)
+        print(f"✓ Checkpoint journal has {pending} records not yet compacted")
+    
+    print()
+
+def test_checkpoint_journal():
+    """测试断点日志的追加、压缩和旧版快照兼容"""
+    from checkpoint_journal import CheckpointJournal
+    
+    print("Testing checkpoint journal...")
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'checkpoint.json')
+        journal_path = os.path.join(tmp, 'checkpoint.jsonl')
+        # 旧版 checkpoint.json
+        with open(snapshot, 'w') as f:
+            json.dump({"processed_indices": [0, 1], "chunk_count": 1}, f)
+        
+        journal = CheckpointJournal(snapshot, journal_path, flush_every=2)
+        assert journal.load() == {"processed_indices": [0, 1], "failed_indices": [], "chunk_count": 1}
+        journal.record_task(3, 'error')
+        journal.record_task(2, 'success')
+        journal.record_task(4, 'success')  # 未落盘，模拟崩溃丢失
+        with open(journal_path, 'a') as f:
+            f.write('{"type": "task", "ind')  # 崩溃留下的半行
+        
+        journal = CheckpointJournal(snapshot, journal_path)
+        data = journal.load()
+        assert data == {"processed_indices": [0, 1, 2, 3], "failed_indices": [3], "chunk_count": 1}, data
+        assert not os.path.exists(journal_path)
+        
+        journal.record_chunk(2)
+        journal.close()
+        assert CheckpointJournal(snapshot, journal_path).load()["chunk_count"] == 2
+        
+        journal.clear()
+        assert not os.path.exists(snapshot)
+    print("✓ Checkpoint journal OK")
     print()
 
 def test_chunk_files():
@@ -43,7 +83,7 @@ def test_chunk_files():
         return
     
     chunk_files = sorted([f for f in os.listdir(config.OUTPUT_DIR) 
-                         if f.startswith('slices_chunk_') and f.endswith('.json')
+                         if f.startswith('slices_chunk_') and f.endswith(('.json', '.jsonl'))
                          and '_summary' not in f])
     
     if not chunk_files:
@@ -57,7 +97,7 @@ def test_chunk_files():
         chunk_path = os.path.join(config.OUTPUT_DIR, chunk_file)
         try:
             with open(chunk_path, 'r') as f:
-                data = json.load(f)
+                data = json.load(f) if chunk_file.endswith('.json') else f.readlines()
             size_mb = os.path.getsize(chunk_path) / 1024 / 1024
             total_items += len(data)
             print(f"  ✓ {chunk_file}: {len(data)} items, {size_mb:.2f} MB")
@@ -70,6 +110,41 @@ def test_chunk_files():
     print(f"\nTotal items in chunks: {total_items}")
     print()
 
+def test_chunk_store():
+    """测试 JSONL chunk 的索引、按任务顺序的流式合并和重复任务去重"""
+    import gzip
+    import chunk_store
+    
+    print("Testing chunk store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        def result(i):
+            return {"line": i, "status": "success" if i % 2 else "error", "slice_lines": [i] * i}
+        
+        chunk_store.write_chunk(tmp, 1, [(i, result(i)) for i in (5, 1, 3)])
+        chunk_store.write_chunk(tmp, 2, [(i, result(i)) for i in (0, 4, 3)])  # 任务 3 重复
+        
+        assert [r["line"] for r in chunk_store.iter_results(tmp)] == [0, 1, 3, 4, 5]
+        
+        output = os.path.join(tmp, 'slices.json')
+        stats = chunk_store.merge_chunks(tmp, output)
+        assert stats["total"] == 5 and stats["success"] == 3 and stats["slice_lines"] == 13, stats
+        with open(output) as f:
+            assert [r["line"] for r in json.load(f)] == [0, 1, 3, 4, 5]
+        with open(os.path.join(tmp, 'slices_summary.json')) as f:
+            assert [r["slice_lines_count"] for r in json.load(f)] == [0, 1, 3, 4, 5]
+        
+        chunk_store.merge_chunks(tmp, output, compress=True)
+        with gzip.open(output + '.gz', 'rt') as f:
+            assert len(json.load(f)) == 5
+        
+        # 清除后重新运行: chunk 编号从 1 开始，旧运行中编号更大的 chunk 不能覆盖新结果
+        assert chunk_store.clear_chunks(tmp) == 3
+        chunk_store.write_chunk(tmp, 1, [(i, {"line": i, "status": "success"}) for i in (0, 3, 4)])
+        assert [r["status"] for r in chunk_store.iter_results(tmp)] == ["success"] * 3
+        assert os.path.exists(output)  # 合并后的结果不受影响
+    print("✓ Chunk store OK")
+    print()
+
 def test_config():
     """测试配置"""
     print("Configuration:")
@@ -107,6 +182,8 @@ def main():
     
     test_config()
     test_checkpoint_files()
+    test_checkpoint_journal()
+    test_chunk_store()
     test_chunk_files()
     
     print("=" * 60)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试按距离标签生成较小深度的切片 - 与直接以该深度切片的结果一致
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ast_enhancer import TREE_SITTER_AVAILABLE
+
+SOURCE = """int f(int a, char *buf)
+{
+    int i, n = 0;
+    int total = 0;
+    if (a > 0)
+        n = a;
+    for (i = 0; i < n; i++) {
+        total += buf[i];
+        if (total > 100) break;
+    }
+    memcpy(buf, &total, n);
+    return total;
+}
+"""
+
+
+class FakeAnalyzer:
+    """快速路径下不会调用 Joern"""
+    version = "test"
+    cache_options = {"mode": "test"}
+
+
+# 比较时忽略的字段
+IGNORED = ("timings", "slice_distances")
+
+
+def run_group(sfs, tasks):
+    return [result for _, result in sfs.process_file_group((list(enumerate(tasks)), None))]
+
+
+def test_materialize_matches_direct():
+    """深度 4 的距离标签生成的各深度切片与直接切片相同"""
+    import config
+    import single_file_slicer as sfs
+    from depth_materializer import materialize
+    print("Testing depth materialization...")
+    tmp = tempfile.mkdtemp()
+    saved = (config.REPOSITORY_DIR, config.TS_FAST_PATH, config.WORKSPACE_DIR,
+             config.BACKWARD_DEPTH, config.FORWARD_DEPTH, config.SLICE_DISTANCE_DEPTH)
+    try:
+        os.makedirs(os.path.join(tmp, "p-1"))
+        with open(os.path.join(tmp, "p-1", "a.c"), "w") as f:
+            f.write(SOURCE)
+        config.REPOSITORY_DIR = tmp
+        config.TS_FAST_PATH = True
+        config.WORKSPACE_DIR = tmp
+        sfs._worker_analyzer = FakeAnalyzer()
+        tasks = [{"project_name_with_version": "p-1", "file_path": "a.c", "line_number": line}
+                 for line in (6, 8, 11)]
+
+        config.SLICE_DISTANCE_DEPTH = 4
+        labelled = run_group(sfs, tasks)
+        assert all(r["slice_distances"]["max_depth"] == 4 for r in labelled)
+
+        config.SLICE_DISTANCE_DEPTH = None
+        for b, f in ((4, 4), (1, 0), (0, 2), (2, 1)):
+            config.BACKWARD_DEPTH, config.FORWARD_DEPTH = b, f
+            for direct, result in zip(run_group(sfs, tasks), labelled):
+                materialized = materialize(result, b, f)
+                assert materialized["metadata"].pop("materialized_depth") == [b, f]
+                for key in IGNORED:
+                    direct.pop(key, None)
+                    materialized.pop(key, None)
+                assert direct == materialized, (b, f, direct, materialized)
+    finally:
+        (config.REPOSITORY_DIR, config.TS_FAST_PATH, config.WORKSPACE_DIR,
+         config.BACKWARD_DEPTH, config.FORWARD_DEPTH, config.SLICE_DISTANCE_DEPTH) = saved
+        sfs._worker_analyzer = None
+        sfs.close_worker_resources()
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ depth materialization OK")
+
+
+if __name__ == '__main__':
+    if not TREE_SITTER_AVAILABLE:
+        print("tree-sitter not available, skipping")
+        sys.exit(0)
+    test_materialize_matches_direct()
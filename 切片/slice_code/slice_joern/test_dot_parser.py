@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试 DOT 解析器 - 验证 Joern 导出格式的解析结果与 PDG 查询接口
+"""
+import os
+import sys
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dot_parser import parse_dot, read_method_header, NO_LINE
+from pdg_loader import PDG, MethodIntervalIndex, dump_pdgs_to_json, load_pdgs_from_json
+
+SAMPLE_DOT = r'''digraph "main" {
+"1" [label = <(METHOD,main)<SUB>1</SUB>> NODE_TYPE="METHOD" NAME="main" LINE_NUMBER="1" LINE_NUMBER_END="6" FILENAME="a.c" CODE="int main()"]
+"2" [NODE_TYPE="CALL" LINE_NUMBER="2" ORDER="2" CODE="x = __quote__a__quote__"]
+"3" [NODE_TYPE="IDENTIFIER" LINE_NUMBER="3" ORDER="1" CODE="y = x"]
+"4" [NODE_TYPE="METHOD_RETURN" CODE="int"]
+// 注释应被忽略
+"1" -> "2" [label="AST: "]
+"1" -> "3" [label="AST: "]
+"2" -> "3" [label="DDG: x"]
+"2" -> "3" [label="CDG: "]
+"3" -> "4" [label="CFG: "]
+}
+'''
+
+
+def test_parse_dot():
+    """测试紧凑图的节点、属性列和 CSR 邻接"""
+    print("Testing parse_dot...")
+    g = parse_dot(SAMPLE_DOT)
+
+    assert g.num_nodes == 4
+    assert g.num_edges == 5
+    assert g.index['3'] == 2
+    assert list(g.lines) == [1, 2, 3, NO_LINE]
+    assert g.get_attr(0, 'NAME') == 'main'
+    assert list(g.successors(1, 'DDG')) == [(2, 'DDG: x')]
+    assert sorted(label for _, label in g.predecessors(2)) == ['AST: ', 'CDG: ', 'DDG: x']
+    print("✓ parse_dot OK")
+
+
+def test_pdg_interface():
+    """测试 PDG 查询接口"""
+    print("Testing PDG interface...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '1-pdg.dot')
+        with open(path, 'w') as f:
+            f.write(SAMPLE_DOT)
+        pdg = PDG(path)
+
+    assert pdg.method_name == 'main'
+    assert (pdg.start_line, pdg.end_line) == (1, 6)
+    assert pdg.filename == 'a.c'
+    # AST 边没有 order 属性时按边的顺序，不使用节点的 ORDER 属性
+    assert [n.line_number for n in pdg.get_ast_children(0)] == [2, 3]
+    assert pdg.get_ast_parent(1).node_type == 'METHOD'
+    assert [n.node_id for n in pdg.get_nodes_by_line(3)] == [2]
+    assert pdg.get_nodes_by_line(3)[0] is pdg.get_node(2)
+    assert [(n.node_id, l) for n, l in pdg.get_successors(1, 'DDG')] == [(2, 'DDG: x')]
+    assert pdg.get_node(1).code == 'x = "a"'
+    print("✓ PDG interface OK")
+
+
+def test_ast_child_order():
+    """AST 子节点按边的 order 属性排序，经过 JSON 缓存后顺序不变"""
+    print("Testing AST child order...")
+    dot = SAMPLE_DOT.replace('"1" -> "2" [label="AST: "]', '"1" -> "2" [label="AST: " order="5"]') \
+                    .replace('"1" -> "3" [label="AST: "]', '"1" -> "3" [label="AST: " order="4"]')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '1-pdg.dot')
+        with open(path, 'w') as f:
+            f.write(dot)
+        pdg = PDG(path)
+        assert [n.line_number for n in pdg.get_ast_children(0)] == [3, 2]
+        
+        json_path = os.path.join(tmp, 'methods.json')
+        dump_pdgs_to_json([pdg], json_path)
+        loaded, = load_pdgs_from_json(json_path)
+        assert [n.line_number for n in loaded.get_ast_children(0)] == [3, 2]
+    print("✓ AST child order OK")
+
+
+def test_method_header():
+    """测试只读取 METHOD 节点 (包括首块被截断后回退到整个文件)"""
+    print("Testing read_method_header...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '1-pdg.dot')
+        with open(path, 'w') as f:
+            f.write(SAMPLE_DOT)
+        for chunk_size in (16, 100, 1 << 16):
+            header = read_method_header(path, chunk_size)
+            assert header['NAME'] == 'main'
+            assert header['LINE_NUMBER_END'] == '6'
+
+    index = MethodIntervalIndex([(10, 20, 'b'), (1, 8, 'a'), (12, 15, 'inner')])
+    assert index.query(5) == ['a']
+    assert index.query(13) == ['inner', 'b']
+    assert index.query(9) == []
+    print("✓ read_method_header OK")
+
+
+if __name__ == '__main__':
+    test_parse_dot()
+    test_pdg_interface()
+    test_ast_child_order()
+    test_method_header()
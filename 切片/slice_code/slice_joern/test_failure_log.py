@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+测试失败记录 - 错误分类、暂时性失败的退避重试、确定性失败的隔离和按文件报告
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from failure_log import FailureLog, classify_error, TIMEOUT, NO_PDG, MISSING_SOURCE, PARSE_ERROR, CRASH, OTHER
+
+
+def _error(message, file_path="a.c"):
+    return {"project": "p-1", "file": file_path, "line": 3, "status": "error", "error": message}
+
+
+def test_classify():
+    """按错误信息归类"""
+    print("Testing failure classification...")
+    assert classify_error("Task timeout after 300s") == TIMEOUT
+    assert classify_error("No PDG found for line 12") == NO_PDG
+    assert classify_error("Source file not found: /x/a.c") == MISSING_SOURCE
+    assert classify_error("Joern parse failed: exit 1") == PARSE_ERROR
+    assert classify_error("Worker exited unexpectedly") == CRASH
+    assert classify_error("KeyError: 'x'") == OTHER and classify_error(None) == OTHER
+    print("✓ classification OK")
+
+
+def test_retry_and_quarantine():
+    """暂时性失败按退避重试并在达到次数后隔离，确定性失败直接隔离，重试成功后清除"""
+    print("Testing retry and quarantine...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "failures.jsonl")
+        log = FailureLog(path, max_attempts=2, backoff_base=10, backoff_max=15)
+        log.record(0, _error("Task timeout after 300s"), seconds=300)
+        assert log.status(0) == 'backoff'
+        at = log.tasks[0]["at"]
+        assert log.next_retry_at(0) == at + 10 and log.status(0, now=at + 10) == 'retry'
+
+        log.record(1, _error("No PDG found for line 5", "b.c"), seconds=2)
+        assert log.status(1) == 'quarantined' and log.next_retry_at(1) is None
+
+        log.record(2, _error("KeyError: 'x'"), seconds=1)
+        log.record(2, {"status": "success"})
+        assert log.status(2) is None
+        # 之前没有失败过的成功结果不写记录
+        log.record(3, {"status": "success"})
+        log.close()
+
+        # 重新加载后状态一致，第二次超时后隔离
+        log = FailureLog(path, max_attempts=2, backoff_base=10, backoff_max=15)
+        assert log.status(0) == 'backoff' and log.status(1) == 'quarantined' and 3 not in log.tasks
+        log.record(0, _error("Task timeout after 300s"), seconds=300)
+        assert log.status(0) == 'quarantined'
+        log.close()
+        with open(path, 'a') as f:
+            f.write('{"type": "fail", "ind')  # 崩溃留下的不完整行
+        log = FailureLog(path, max_attempts=2)
+        assert log.summary() == {"failed_tasks": 2, "quarantined_tasks": 2, "classes": {TIMEOUT: 1, NO_PDG: 1}}
+        # 续跑时追加的记录不能接在不完整的行后面
+        log.record(3, _error("Task timeout after 300s"))
+        log.close()
+        log = FailureLog(path, max_attempts=2)
+        assert 3 in log.tasks and log.summary()["failed_tasks"] == 3
+        log.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ retry and quarantine OK")
+
+
+def test_file_report():
+    """按文件统计失败耗时，超时的文件排在前面"""
+    print("Testing per-file report...")
+    tmp = tempfile.mkdtemp()
+    try:
+        log = FailureLog(os.path.join(tmp, "failures.jsonl"))
+        log.record(0, _error("Task timeout after 300s"), seconds=300)
+        log.record(1, _error("Task timeout after 300s"), seconds=300)
+        log.record(2, dict(_error("No PDG found for line 5", "b.c"), timings={"pdg": 1.5, "slice": 0.5}))
+        report_path = os.path.join(tmp, "failure_report.json")
+        log.write_report(report_path)
+        log.close()
+        with open(report_path) as f:
+            report = json.load(f)
+        first, second = report["files"]
+        assert first["file"] == "a.c" and first["failures"] == 2 and first["timeout_seconds"] == 600
+        assert first["quarantined_tasks"] == 0
+        assert second["file"] == "b.c" and second["seconds"] == 2.0 and second["quarantined_tasks"] == 1
+        assert report["summary"]["quarantined_tasks"] == 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ per-file report OK")
+
+
+if __name__ == '__main__':
+    test_classify()
+    test_retry_and_quarantine()
+    test_file_report()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+测试压缩结果库 - 随机读取、筛选、增量追加和从 chunk 导入
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import chunk_store
+import result_store
+from result_store import ResultStore, BLOCK_FILE
+
+
+def make_result(i: int, status: str = "success") -> dict:
+    return {"project": f"p-{i % 3}", "file": f"f{i % 5}.c", "line": i, "status": status,
+            "slice_lines": list(range(i % 7)), "sliced_code": "x = 1;\n" * (i % 4)}
+
+
+def test_append_and_read():
+    """跨块随机读取、按条件筛选、按给定顺序读取指定任务"""
+    print("Testing result store reads...")
+    tmp = tempfile.mkdtemp()
+    saved = result_store.BLOCK_RECORDS
+    try:
+        result_store.BLOCK_RECORDS = 7
+        with ResultStore(tmp) as store:
+            assert store.append((i, make_result(i, "error" if i % 10 == 0 else "success"))
+                                for i in range(100)) == 100
+            assert store.stats()["blocks"] == 15
+        with ResultStore(tmp) as store:
+            assert store.get(42) == make_result(42) and store.get(1000) is None
+            assert [i for i, _ in store.find("p-1", "f2.c")] == [i for i in range(100) if i % 15 == 7]
+            assert [i for i, _ in store.find("p-1", "f2.c", 22)] == [22]
+            assert store.count(status="error") == 10
+            assert [i for i, _ in store.iter(project="p-0", status="error")] == [0, 30, 60, 90]
+            assert [i for i, _ in store.iter(tasks=[99, 3, 500, 50])] == [99, 3, 50]
+    finally:
+        result_store.BLOCK_RECORDS = saved
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ reads OK")
+
+
+def test_incremental_append():
+    """内容不变的结果不重复写入；更新后的结果覆盖旧结果；崩溃留下的尾部数据被截掉"""
+    print("Testing incremental append...")
+    tmp = tempfile.mkdtemp()
+    try:
+        with ResultStore(tmp) as store:
+            store.append((i, make_result(i)) for i in range(10))
+            size = os.path.getsize(os.path.join(tmp, BLOCK_FILE))
+            assert store.append((i, make_result(i)) for i in range(10)) == 0
+            assert os.path.getsize(os.path.join(tmp, BLOCK_FILE)) == size
+
+        with open(os.path.join(tmp, BLOCK_FILE), 'ab') as f:
+            f.write(b'partial block')
+        with ResultStore(tmp) as store:
+            updated = dict(make_result(3), status="error", error="boom")
+            assert store.append([(3, updated), (10, make_result(10))]) == 2
+            assert store.get(3) == updated and store.get(4) == make_result(4)
+            assert store.stats()["results"] == 11 and store.stats()["status"]["error"] == 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ incremental append OK")
+
+
+def test_import_chunks():
+    """从切片输出目录导入，与 chunk 中的结果一致"""
+    print("Testing import from chunks...")
+    tmp = tempfile.mkdtemp()
+    try:
+        out = os.path.join(tmp, "out")
+        chunk_store.write_chunk(out, 1, [(i, make_result(i)) for i in range(0, 20, 2)])
+        chunk_store.write_chunk(out, 2, [(i, make_result(i)) for i in range(1, 20, 2)])
+        with ResultStore(os.path.join(tmp, "store")) as store:
+            assert result_store.import_chunk_dirs(store, [out]) == 20
+            assert list(store.iter()) == list(enumerate(chunk_store.iter_results(out)))
+            assert result_store.import_chunk_dirs(store, [out]) == 0
+            # 合并结果没有任务索引，不能导入已有结果的库
+            merged = os.path.join(tmp, "slices.json")
+            chunk_store.merge_chunks(out, merged)
+            try:
+                result_store.import_json(store, merged)
+                assert False, "merged JSON imported into a non-empty store"
+            except result_store.ResultStoreError:
+                pass
+        with ResultStore(os.path.join(tmp, "from_json")) as store:
+            assert result_store.import_json(store, merged) == 20
+            assert list(store.iter()) == list(enumerate(chunk_store.iter_results(out)))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ import OK")
+
+
+if __name__ == '__main__':
+    test_append_and_read()
+    test_incremental_append()
+    test_import_chunks()
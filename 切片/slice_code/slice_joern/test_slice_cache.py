@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试切片结果缓存 - 相同函数在不同版本中的行号平移
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ast_enhancer import TREE_SITTER_AVAILABLE
+
+FUNCTION = """int f(int a)
+{
+    int n = 0;
+    if (a > 0)
+        n = a;
+    return n;
+}
+"""
+
+V1 = "#include <stdio.h>\n\n" + FUNCTION
+# 新版本: 函数前多了几行，行尾空白不同
+V2 = "#include <stdio.h>\n#include <string.h>\n\nstatic int x;\n\n" + FUNCTION.replace("int n = 0;", "int n = 0;   ")
+
+
+class FakeAnalyzer:
+    """只提供缓存键需要的属性 (快速路径下不会调用 Joern)"""
+    version = "test"
+    cache_options = {"mode": "test"}
+
+
+def test_function_keys():
+    """相同函数、相同相对行的键相同"""
+    from slice_cache import function_keys
+    print("Testing function keys...")
+    k1 = function_keys(V1, [7, 1], "cfg")
+    k2 = function_keys(V2, [10], "cfg")
+    assert 1 not in k1  # 不在函数中
+    assert k1[7][0] == k2[10][0] and (k1[7][1], k2[10][1]) == (3, 6)
+    assert function_keys(V1, [7], "other")[7][0] != k1[7][0]
+    assert function_keys(V1, [8], "cfg")[8][0] != k1[7][0]
+    print("✓ function keys OK")
+
+
+def test_cross_version_hit():
+    """第一个版本的切片结果被平移后用于第二个版本"""
+    import config
+    import single_file_slicer as sfs
+    print("Testing cross-version slice cache...")
+    tmp = tempfile.mkdtemp()
+    saved = (config.REPOSITORY_DIR, config.SLICE_CACHE_DIR, config.TS_FAST_PATH, config.WORKSPACE_DIR)
+    try:
+        for version, code in (("p-1", V1), ("p-2", V2)):
+            os.makedirs(os.path.join(tmp, "repo", version))
+            with open(os.path.join(tmp, "repo", version, "a.c"), "w") as f:
+                f.write(code)
+        config.REPOSITORY_DIR = os.path.join(tmp, "repo")
+        config.SLICE_CACHE_DIR = os.path.join(tmp, "cache")
+        config.TS_FAST_PATH = True
+        config.WORKSPACE_DIR = tmp
+        sfs._worker_analyzer = FakeAnalyzer()
+
+        task1 = {"project_name_with_version": "p-1", "file_path": "a.c", "line_number": 7}
+        task2 = {"project_name_with_version": "p-2", "file_path": "a.c", "line_number": 10}
+        (_, r1), = sfs.process_file_group(([(0, task1)], tmp))
+        (_, r2), = sfs.process_file_group(([(1, task2)], tmp))
+        assert r1["status"] == r2["status"] == "success", (r1, r2)
+        assert "slice_cache_hit" not in r1["metadata"] and r2["metadata"]["slice_cache_hit"]
+        assert r2["slice_lines"] == [line + 3 for line in r1["slice_lines"]]
+        assert r2["function_start_line"] == 6 and r2["metadata"]["target_line"] == 10
+        assert r2["sliced_code"].replace("   \n", "\n") == r1["sliced_code"]
+        assert sfs.get_slice_cache().hits == 1
+    finally:
+        config.REPOSITORY_DIR, config.SLICE_CACHE_DIR, config.TS_FAST_PATH, config.WORKSPACE_DIR = saved
+        sfs._worker_analyzer = None
+        sfs._worker_slice_cache = None
+        sfs.close_worker_resources()
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ cross-version slice cache OK")
+
+
+if __name__ == '__main__':
+    if not TREE_SITTER_AVAILABLE:
+        print("tree-sitter not available, skipping")
+        sys.exit(0)
+    test_function_keys()
+    test_cross_version_hit()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试 tree-sitter PDG 构建 - 验证依赖边和切片结果
+"""
+import os
+import sys
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ast_enhancer import TREE_SITTER_AVAILABLE
+from slice_engine import SliceEngine
+
+SOURCE = """int f(int a, char *buf)
+{
+    int i, n = 0;
+    int total = 0;
+    if (a > 0)
+        n = a;
+    for (i = 0; i < n; i++) {
+        total += buf[i];
+        memcpy(buf, &total,
+               n);
+        if (total > 100) break;
+    }
+    switch (a) { case 1: n++; case 2: return n; default: break; }
+    return total;
+}
+
+static int g(void)
+{
+    return 1;
+}
+"""
+
+
+def edges_by_line(pdg, prefix):
+    return {(pdg.g.lines[src], pdg.g.lines[dst], label)
+            for src, dst, label in pdg.g.edges() if label.startswith(prefix)}
+
+
+def test_dependences():
+    """DDG 边来自到达定值，CDG 边来自控制结构"""
+    from ts_pdg_builder import build_pdgs
+    print("Testing tree-sitter PDG edges...")
+    pdgs = build_pdgs(SOURCE, 'a.c')
+    assert [p.method_name for p in pdgs] == ['f', 'g']
+    pdg = pdgs[0]
+    assert (pdg.start_line, pdg.end_line, pdg.backend) == (1, 15, 'tree-sitter')
+
+    ddg = edges_by_line(pdg, 'DDG')
+    assert (1, 5, 'DDG: a') in ddg            # 形参 -> 条件
+    assert (3, 7, 'DDG: n') in ddg and (6, 7, 'DDG: n') in ddg
+    assert (7, 8, 'DDG: i') in ddg            # 循环头 -> 循环体
+    assert (8, 8, 'DDG: total') in ddg        # 循环携带的依赖
+    assert (9, 14, 'DDG: total') in ddg       # &total 是弱定值
+    assert (4, 14, 'DDG: total') in ddg
+    # case 1 贯穿到 case 2 后返回，n++ 不会到达函数末尾
+    assert (13, 13, 'DDG: n') in ddg
+
+    cdg = edges_by_line(pdg, 'CDG')
+    assert (5, 6, 'CDG: ') in cdg
+    assert (7, 8, 'CDG: ') in cdg and (7, 11, 'CDG: ') in cdg
+    assert (5, 7, 'CDG: ') not in cdg
+    print("✓ edges OK")
+
+
+def test_slice_multiline_statement():
+    """跨行语句的任一行都可以作为切片准则"""
+    from ts_pdg_builder import build_pdgs
+    print("Testing slicing on a multi-line statement...")
+    pdg = build_pdgs(SOURCE, 'a.c', target_lines=[10])[0]
+    nodes_9, _ = SliceEngine(pdg).slice(9)
+    nodes_10, _ = SliceEngine(pdg).slice(10)
+    lines_9 = {n.line_number for n in nodes_9}
+    assert lines_9 == {n.line_number for n in nodes_10}
+    assert {1, 3, 7, 8, 9, 10, 14} <= lines_9
+    print("✓ multi-line statement OK")
+
+
+def test_small_function_selection():
+    """只有所有目标行都在小函数中时才使用快速路径"""
+    from ts_pdg_builder import small_function_pdgs
+    print("Testing small function selection...")
+    pdgs = small_function_pdgs(SOURCE, 'a.c', [19], max_lines=10)
+    assert [p.method_name for p in pdgs] == ['g']
+    assert pdgs[0].backend_reason == 'small-function'
+    assert small_function_pdgs(SOURCE, 'a.c', [19, 8], max_lines=10) is None
+    assert small_function_pdgs(SOURCE, 'a.c', [16], max_lines=100) is None
+    print("✓ small function selection OK")
+
+
+def test_file_filter():
+    """只保留 FILENAME 属于目标文件的 PDG，没有 FILENAME 的 PDG 不能确定来源，同样排除"""
+    from ts_pdg_builder import build_pdgs
+    from single_file_slicer import filter_pdgs_for_file
+    print("Testing PDG file filter...")
+    own = build_pdgs(SOURCE, 'src/a.c')
+    other = build_pdgs(SOURCE, 'src/b.c')
+    unknown = build_pdgs(SOURCE)
+    assert all(p.filename is None for p in unknown)
+    assert filter_pdgs_for_file(own + other + unknown, 'a.c') == own
+    print("✓ PDG file filter OK")
+
+
+if __name__ == '__main__':
+    if not TREE_SITTER_AVAILABLE:
+        print("tree-sitter not available, skipping")
+        sys.exit(0)
+    test_dependences()
+    test_slice_multiline_statement()
+    test_small_function_selection()
+    test_file_filter()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试共享任务队列 - 成组租用、完成记录、失联进程的租约重新租用和失败重试
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from work_queue import WorkQueue, WorkQueueError
+
+TASKS = [
+    {"project_name_with_version": "p-1", "file_path": "a.c", "line_number": 3},
+    {"project_name_with_version": "p-1", "file_path": "b.c", "line_number": 5},
+    {"project_name_with_version": "p-1", "file_path": "a.c", "line_number": 9},
+]
+
+
+def test_lease_and_complete():
+    """同一文件的任务一起租用，完成后不再派发"""
+    print("Testing lease and complete...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "queue.db")
+        q1 = WorkQueue(path, "w1")
+        q2 = WorkQueue(path, "w2")
+        assert q1.populate(TASKS) == 3 and q2.populate(TASKS) == 0
+        try:
+            q2.populate(TASKS[:2])
+            assert False, "mismatched task list accepted"
+        except WorkQueueError:
+            pass
+
+        leased = [q1.lease(), q2.lease()]
+        assert sorted(indices for _, indices in leased) == [[0, 2], [1]]
+        assert q1.lease() is None and q1.unfinished() == 3
+
+        q1.complete([(i, "success", 1.5, None) for i in leased[0][1]])
+        q2.complete([(i, "error", 0.5, "boom") for i in leased[1][1]])
+        assert q1.unfinished() == 0
+        summary = q1.summary()
+        assert summary["counts"]["success"] + summary["counts"]["error"] == 3
+        q1.close()
+        q2.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ lease and complete OK")
+
+
+def test_expired_lease():
+    """租约到期后其他进程重新租用；原进程迟到的结果不覆盖已完成的任务"""
+    print("Testing expired leases...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "queue.db")
+        dead = WorkQueue(path, "dead", lease_seconds=0.2)
+        alive = WorkQueue(path, "alive", lease_seconds=0.2)
+        dead.populate(TASKS[1:2])
+        key, indices = dead.lease()
+        assert alive.lease() is None
+
+        # 心跳延长租约
+        time.sleep(0.15)
+        dead.heartbeat()
+        time.sleep(0.1)
+        assert alive.lease() is None
+
+        time.sleep(0.3)
+        assert alive.counts()["expired"] == 1
+        assert alive.lease() == (key, indices)
+        alive.complete([(indices[0], "success", 1.0, None)])
+        dead.complete([(indices[0], "error", 9.0, "late")])
+        row = alive._connection().execute("SELECT status, worker, attempts FROM tasks").fetchone()
+        assert row == ("success", "alive", 2), row
+        assert alive.summary()["retried_tasks"] == 1
+
+        # 主动释放的租约立即回到待处理状态
+        other = WorkQueue(os.path.join(tmp, "other.db"), "w")
+        other.populate(TASKS)
+        _, held = other.lease()
+        other.release()
+        assert other.lease()[1] == held
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ expired leases OK")
+
+
+def test_retry_backoff():
+    """暂时性失败放回队列，退避时间过后才能重新租用；--retry-quarantined 时失败的任务重新派发"""
+    print("Testing retry backoff...")
+    tmp = tempfile.mkdtemp()
+    try:
+        q = WorkQueue(os.path.join(tmp, "queue.db"), "w")
+        q.populate(TASKS[1:2])
+        _, indices = q.lease()
+        assert q.attempts(indices) == {indices[0]: 1}
+        q.retry([(indices[0], time.time() + 0.3, 2.0, "Task exceeded time budget of 300s")])
+        assert q.lease() is None and q.counts()["backoff"] == 1 and q.unfinished() == 1
+        time.sleep(0.35)
+        assert q.lease()[1] == indices and q.attempts(indices) == {indices[0]: 2}
+
+        q.complete([(indices[0], "error", 1.0, "No PDG found for line 5")])
+        assert q.unfinished() == 0
+        assert q.requeue_errors() == 1 and q.lease()[1] == indices and q.attempts(indices) == {indices[0]: 1}
+        q.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print("✓ retry backoff OK")
+
+
+if __name__ == '__main__':
+    test_lease_and_complete()
+    test_expired_lease()
+    test_retry_backoff()
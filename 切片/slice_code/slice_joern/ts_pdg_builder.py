@@ -0,0 +1,545 @@
+"""
+基于 tree-sitter 的 PDG 构建 (不依赖 Joern 的快速路径)
+在进程内解析源文件，为每个函数构建与 Joern 导出结构相同的 PDG:
+    - METHOD 节点、形参节点 (METHOD_PARAMETER_IN) 和语句节点 (控制结构的条件单独成为一个节点)
+    - CFG 边: 由语句的控制结构生成 (支持 if/for/while/do/switch/break/continue/return/goto)
+    - CDG 边: 从控制结构的条件指向其直接控制的语句，标签 "CDG: "
+    - DDG 边: 在 CFG 上求到达定值，从定值语句指向使用语句，标签 "DDG: 变量名"
+跨多行的语句在每一行都有一个节点，这些节点的依赖边相同，因此任一行都可以作为切片准则。
+
+与 Joern 相比是近似分析: 不做别名和过程间分析，字段、数组元素和 &x 实参只作为基变量的弱定值
+(不杀死之前的定值)，return/break 之后的语句不记录对前面条件的控制依赖。
+"""
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from dot_parser import GraphBuilder
+from pdg_loader import PDG
+import ast_enhancer
+
+BACKEND = 'tree-sitter'
+
+_SKIPPED_TYPES = ('comment', '{', '}', ';')
+
+
+def _declarator_name(node) -> Optional[object]:
+    """沿 declarator 字段找到声明的标识符节点"""
+    while node is not None:
+        if node.type in ('identifier', 'field_identifier', 'qualified_identifier',
+                         'destructor_name', 'operator_name'):
+            return node
+        inner = node.child_by_field_name('declarator')
+        if inner is None:
+            # parenthesized_declarator 等没有 declarator 字段
+            named = [c for c in node.named_children if c.type != 'comment']
+            inner = named[0] if len(named) == 1 else None
+        node = inner
+    return None
+
+
+def iter_functions(root):
+    """遍历语法树中的函数定义 (不进入函数体)"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.type == 'function_definition':
+            yield node
+            continue
+        stack.extend(reversed(node.children))
+
+
+class _Stmt:
+    """一个 PDG 语句节点 (可能跨多行)"""
+
+    __slots__ = ('index', 'lines', 'code', 'node_type', 'defs', 'uses')
+
+    def __init__(self, index: int, lines: List[int], code: str, node_type: str):
+        self.index = index
+        self.lines = lines
+        self.code = code
+        self.node_type = node_type
+        self.defs: List[Tuple[str, bool]] = []  # (变量名, 是否为强定值)
+        self.uses: Set[str] = set()
+
+
+class _FunctionBuilder:
+    """为单个函数定义构建 PDG"""
+
+    def __init__(self, data: bytes, fn, filename: Optional[str]):
+        self.data = data
+        self.fn = fn
+        self.filename = filename
+        self.stmts: List[_Stmt] = []
+        self.cfg: Set[Tuple[int, int]] = set()
+        self.cdg: Set[Tuple[int, int]] = set()
+        self.control_of: List[Optional[int]] = []  # 每个语句直接所属的控制结构条件
+        # 循环和 switch 上下文: (break 列表, continue 列表或 None)
+        self._jumps: List[Tuple[List[int], Optional[List[int]]]] = []
+        self._labels: Dict[str, int] = {}
+        self._gotos: List[Tuple[int, str]] = []
+
+    def text(self, node) -> str:
+        return self.data[node.start_byte:node.end_byte].decode('utf-8', errors='replace')
+
+    # ---------- 节点 ----------
+
+    def new_stmt(self, node, preds: List[int], control: Optional[int], node_type: str = 'CALL',
+                 end_node=None) -> int:
+        """为语法节点 (到 end_node 为止) 创建语句节点并连接 CFG/CDG 边"""
+        start_line = node.start_point[0] + 1
+        end_line = (end_node or node).end_point[0] + 1
+        code = self.data[node.start_byte:(end_node or node).end_byte].decode('utf-8', errors='replace')
+        stmt = _Stmt(len(self.stmts), list(range(start_line, end_line + 1)), code, node_type)
+        self.stmts.append(stmt)
+        self.control_of.append(control)
+        for pred in preds:
+            self.cfg.add((pred, stmt.index))
+        if control is not None:
+            self.cdg.add((control, stmt.index))
+        return stmt.index
+
+    # ---------- 定值 / 使用 ----------
+
+    def _lvalue(self, node) -> Tuple[Optional[str], bool]:
+        """左值的基变量名，以及是否为整体赋值 (强定值)"""
+        strong = True
+        while node is not None:
+            if node.type == 'identifier':
+                return self.text(node), strong
+            if node.type == 'parenthesized_expression':
+                node = node.named_children[0] if node.named_children else None
+                continue
+            if node.type in ('field_expression', 'subscript_expression', 'pointer_expression'):
+                strong = False
+                node = node.child_by_field_name('argument')
+                continue
+            return None, False
+        return None, False
+
+    def collect(self, node, stmt: _Stmt):
+        """收集表达式或声明中的定值和使用"""
+        t = node.type
+        if t == 'assignment_expression':
+            left = node.child_by_field_name('left')
+            right = node.child_by_field_name('right')
+            operator = node.child_by_field_name('operator')
+            name, strong = self._lvalue(left)
+            if name:
+                stmt.defs.append((name, strong))
+            if not strong or name is None or (operator is not None and operator.type != '='):
+                # 复合赋值、字段/数组元素赋值时左值中的变量也被使用
+                self.collect(left, stmt)
+            if right is not None:
+                self.collect(right, stmt)
+            return
+        if t == 'update_expression':
+            argument = node.child_by_field_name('argument')
+            name, strong = self._lvalue(argument)
+            if name:
+                stmt.defs.append((name, strong))
+            if argument is not None:
+                self.collect(argument, stmt)
+            return
+        if t == 'init_declarator':
+            target = _declarator_name(node.child_by_field_name('declarator'))
+            if target is not None:
+                stmt.defs.append((self.text(target), True))
+            value = node.child_by_field_name('value')
+            if value is not None:
+                self.collect(value, stmt)
+            return
+        if t == 'declaration':
+            # 类型和无初值的声明符既不是定值也不是使用
+            for declarator in node.children_by_field_name('declarator'):
+                if declarator.type == 'init_declarator':
+                    self.collect(declarator, stmt)
+            return
+        if t == 'call_expression':
+            function = node.child_by_field_name('function')
+            if function is not None and function.type != 'identifier':
+                self.collect(function, stmt)
+            arguments = node.child_by_field_name('arguments')
+            if arguments is not None:
+                for arg in arguments.named_children:
+                    if arg.type == 'pointer_expression' and self.text(arg).lstrip().startswith('&'):
+                        # 以地址传给被调函数的变量可能被修改
+                        name, _ = self._lvalue(arg.child_by_field_name('argument'))
+                        if name:
+                            stmt.defs.append((name, False))
+                    self.collect(arg, stmt)
+            return
+        if t == 'identifier':
+            stmt.uses.add(self.text(node))
+            return
+        if t in ('sizeof_expression', 'type_descriptor', 'string_literal', 'char_literal'):
+            value = node.child_by_field_name('value')
+            if value is not None:
+                self.collect(value, stmt)
+            return
+        for child in node.named_children:
+            self.collect(child, stmt)
+
+    def simple(self, node, preds: List[int], control: Optional[int], node_type: str = 'CALL') -> int:
+        index = self.new_stmt(node, preds, control, node_type)
+        self.collect(node, self.stmts[index])
+        return index
+
+    def predicate(self, node, preds: List[int], control: Optional[int]) -> int:
+        return self.simple(node, preds, control, 'CONTROL_STRUCTURE')
+
+    # ---------- 控制结构 ----------
+
+    def statement(self, node, preds: List[int], control: Optional[int]) -> List[int]:
+        """
+        处理一条语句
+
+        Returns:
+            顺序执行离开该语句的 CFG 节点
+        """
+        if node is None:
+            return preds
+        t = node.type
+        if t in _SKIPPED_TYPES or not node.is_named:
+            return preds
+        if t == 'compound_statement':
+            for child in node.named_children:
+                preds = self.statement(child, preds, control)
+            return preds
+        if t == 'if_statement':
+            cond = self.predicate(node.child_by_field_name('condition') or node, preds, control)
+            exits = self.statement(node.child_by_field_name('consequence'), [cond], cond)
+            alternative = node.child_by_field_name('alternative')
+            if alternative is not None and alternative.type == 'else_clause':
+                alternative = alternative.named_children[0] if alternative.named_children else None
+            if alternative is not None:
+                exits = exits + self.statement(alternative, [cond], cond)
+            else:
+                exits = exits + [cond]
+            return exits
+        if t == 'while_statement':
+            cond = self.predicate(node.child_by_field_name('condition') or node, preds, control)
+            return self.loop_body(node.child_by_field_name('body'), cond, [cond])
+        if t == 'do_statement':
+            first = len(self.stmts)
+            breaks: List[int] = []
+            continues: List[int] = []
+            self._jumps.append((breaks, continues))
+            body_exits = self.statement(node.child_by_field_name('body'), preds, control)
+            self._jumps.pop()
+            cond = self.predicate(node.child_by_field_name('condition') or node,
+                                  body_exits + continues, control)
+            # 条件为真时回到循环体开头，循环体中直接执行的语句控制依赖于条件
+            if first < cond:
+                self.cfg.add((cond, first))
+                for index in range(first, cond):
+                    if self.control_of[index] == control:
+                        self.cdg.add((cond, index))
+            return [cond] + breaks
+        if t in ('for_statement', 'for_range_loop'):
+            return self.for_loop(node, preds, control)
+        if t == 'switch_statement':
+            return self.switch(node, preds, control)
+        if t == 'case_statement':
+            # switch 之外的 case (语法错误恢复) 按普通语句块处理
+            return self.case(node, preds, control)
+        if t == 'break_statement':
+            index = self.new_stmt(node, preds, control, 'CONTROL_STRUCTURE')
+            if self._jumps:
+                self._jumps[-1][0].append(index)
+            return []
+        if t == 'continue_statement':
+            index = self.new_stmt(node, preds, control, 'CONTROL_STRUCTURE')
+            for breaks, continues in reversed(self._jumps):
+                if continues is not None:
+                    continues.append(index)
+                    break
+            return []
+        if t == 'return_statement':
+            self.simple(node, preds, control, 'RETURN')
+            return []
+        if t == 'goto_statement':
+            index = self.new_stmt(node, preds, control, 'CONTROL_STRUCTURE')
+            label = node.child_by_field_name('label')
+            if label is not None:
+                self._gotos.append((index, self.text(label)))
+            return []
+        if t == 'labeled_statement':
+            label = node.child_by_field_name('label')
+            index = self.new_stmt(label or node, preds, control, 'JUMP_TARGET')
+            if label is not None:
+                self._labels[self.text(label)] = index
+            exits = [index]
+            for child in node.named_children:
+                if child is not label:
+                    exits = self.statement(child, exits, control)
+            return exits
+        return [self.simple(node, preds, control)]
+
+    def loop_body(self, body, head: int, exits: List[int]) -> List[int]:
+        """处理循环体: 正常结束和 continue 回到 head，break 离开循环"""
+        breaks: List[int] = []
+        continues: List[int] = []
+        self._jumps.append((breaks, continues))
+        body_exits = self.statement(body, [head], head) if body is not None else [head]
+        self._jumps.pop()
+        for pred in body_exits + continues:
+            self.cfg.add((pred, head))
+        return exits + breaks
+
+    def for_loop(self, node, preds: List[int], control: Optional[int]) -> List[int]:
+        body = node.child_by_field_name('body')
+        if node.type == 'for_range_loop':
+            # for (x : range): 每次迭代定值 x 并使用 range
+            head = self.new_stmt(node, preds, control, 'CONTROL_STRUCTURE',
+                                 end_node=node.child_by_field_name('right') or node)
+            target = _declarator_name(node.child_by_field_name('declarator'))
+            if target is not None:
+                self.stmts[head].defs.append((self.text(target), True))
+            right = node.child_by_field_name('right')
+            if right is not None:
+                self.collect(right, self.stmts[head])
+            return self.loop_body(body, head, [head])
+
+        initializer = node.child_by_field_name('initializer')
+        condition = node.child_by_field_name('condition')
+        update = node.child_by_field_name('update')
+        if initializer is not None:
+            preds = [self.simple(initializer, preds, control)]
+        if condition is not None:
+            head = self.predicate(condition, preds, control)
+        else:
+            # for (;;): 用 for 关键字所在位置作为循环头
+            head = self.new_stmt(node.children[0], preds, control, 'CONTROL_STRUCTURE')
+        breaks: List[int] = []
+        continues: List[int] = []
+        self._jumps.append((breaks, continues))
+        body_exits = self.statement(body, [head], head) if body is not None else [head]
+        self._jumps.pop()
+        back = body_exits + continues
+        if update is not None:
+            back = [self.simple(update, back, head)]
+        for pred in back:
+            self.cfg.add((pred, head))
+        return [head] + breaks
+
+    def switch(self, node, preds: List[int], control: Optional[int]) -> List[int]:
+        cond = self.predicate(node.child_by_field_name('condition') or node, preds, control)
+        breaks: List[int] = []
+        self._jumps.append((breaks, None))
+        exits: List[int] = []
+        has_default = False
+        body = node.child_by_field_name('body')
+        for child in (body.named_children if body is not None else []):
+            if child.type == 'case_statement':
+                has_default = has_default or child.child_by_field_name('value') is None
+                # 上一个 case 没有 break 时贯穿到这一个
+                exits = self.case(child, [cond] + exits, cond)
+            else:
+                exits = self.statement(child, exits, cond)
+        self._jumps.pop()
+        if not has_default:
+            exits = exits + [cond]
+        return exits + breaks
+
+    def case(self, node, preds: List[int], control: Optional[int]) -> List[int]:
+        value = node.child_by_field_name('value')
+        # case 标签 (到冒号为止) 作为跳转目标节点
+        label_end = value
+        for child in node.children:
+            if child.type == ':':
+                label_end = child
+                break
+        index = self.new_stmt(node, preds, control, 'JUMP_TARGET', end_node=label_end or node.children[0])
+        if value is not None:
+            self.collect(value, self.stmts[index])
+        exits = [index]
+        for child in node.named_children:
+            if child is not value:
+                exits = self.statement(child, exits, control)
+        return exits
+
+    # ---------- 数据依赖 ----------
+
+    def reaching_definitions(self) -> Set[Tuple[int, int, str]]:
+        """在 CFG 上迭代求到达定值，返回 DDG 边 (定值语句, 使用语句, 变量名)"""
+        n = len(self.stmts)
+        succs: List[List[int]] = [[] for _ in range(n)]
+        preds: List[List[int]] = [[] for _ in range(n)]
+        for src, dst in self.cfg:
+            succs[src].append(dst)
+            preds[dst].append(src)
+
+        out: List[Set[Tuple[str, int]]] = [set() for _ in range(n)]
+        worklist = list(range(n))
+        queued = [True] * n
+        while worklist:
+            node = worklist.pop()
+            queued[node] = False
+            reach = set()
+            for pred in preds[node]:
+                reach |= out[pred]
+            stmt = self.stmts[node]
+            killed = {name for name, strong in stmt.defs if strong}
+            if killed:
+                reach = {d for d in reach if d[0] not in killed}
+            reach |= {(name, node) for name, _ in stmt.defs}
+            if reach != out[node]:
+                out[node] = reach
+                for succ in succs[node]:
+                    if not queued[succ]:
+                        queued[succ] = True
+                        worklist.append(succ)
+
+        edges = set()
+        for node, stmt in enumerate(self.stmts):
+            if not stmt.uses:
+                continue
+            reach = set()
+            for pred in preds[node]:
+                reach |= out[pred]
+            for name, def_node in reach:
+                if name in stmt.uses:
+                    edges.add((def_node, node, name))
+        return edges
+
+    # ---------- 构建 ----------
+
+    def build(self) -> Optional[PDG]:
+        fn = self.fn
+        declarator = fn.child_by_field_name('declarator')
+        function_declarator = declarator
+        while function_declarator is not None and function_declarator.type != 'function_declarator':
+            function_declarator = function_declarator.child_by_field_name('declarator')
+        if function_declarator is None:
+            return None
+        name_node = _declarator_name(function_declarator.child_by_field_name('declarator'))
+        name = self.text(name_node) if name_node is not None else '<unknown>'
+
+        # 形参: 在函数入口处定值
+        preds: List[int] = []
+        params = function_declarator.child_by_field_name('parameters')
+        for param in (params.named_children if params is not None else []):
+            target = _declarator_name(param.child_by_field_name('declarator'))
+            if param.type != 'parameter_declaration' or target is None:
+                continue
+            index = self.new_stmt(param, preds, None, 'METHOD_PARAMETER_IN')
+            self.stmts[index].defs.append((self.text(target), True))
+            preds = [index]
+
+        body = fn.child_by_field_name('body')
+        if body is not None:
+            self.statement(body, preds, None)
+        for index, label in self._gotos:
+            if label in self._labels:
+                self.cfg.add((index, self._labels[label]))
+
+        ddg = self.reaching_definitions()
+        return self._to_pdg(name, ddg)
+
+    def _to_pdg(self, name: str, ddg: Set[Tuple[int, int, str]]) -> PDG:
+        fn = self.fn
+        start_line = fn.start_point[0] + 1
+        builder = GraphBuilder()
+        method_id = f"ts:{start_line}"
+        attrs = {
+            'NODE_TYPE': 'METHOD',
+            'NAME': name,
+            'LINE_NUMBER': str(start_line),
+            'LINE_NUMBER_END': str(fn.end_point[0] + 1),
+            'CODE': self.text(fn).split('\n', 1)[0],
+        }
+        if self.filename:
+            attrs['FILENAME'] = self.filename
+        builder.add_node(method_id, attrs)
+
+        # 每个语句在其跨越的每一行都有一个节点
+        line_nodes: List[List[str]] = []
+        for stmt in self.stmts:
+            ids = []
+            for order, line in enumerate(stmt.lines):
+                node_id = f"ts:{start_line}:{stmt.index}:{order}"
+                builder.add_node(node_id, {
+                    'NODE_TYPE': stmt.node_type,
+                    'LINE_NUMBER': str(line),
+                    'CODE': stmt.code,
+                })
+                ids.append(node_id)
+            line_nodes.append(ids)
+
+        if line_nodes:
+            builder.add_edge(method_id, line_nodes[0][0], 'CFG')
+        for src, dst in sorted(self.cfg):
+            builder.add_edge(line_nodes[src][0], line_nodes[dst][0], 'CFG')
+        for src, dst in sorted(self.cdg):
+            for a in line_nodes[src]:
+                for b in line_nodes[dst]:
+                    builder.add_edge(a, b, 'CDG: ')
+        for src, dst, var in sorted(ddg):
+            for a in line_nodes[src]:
+                for b in line_nodes[dst]:
+                    builder.add_edge(a, b, f'DDG: {var}')
+
+        pdg = PDG.from_graph(builder.build(), f"{BACKEND}:{self.filename or ''}#{name}")
+        pdg.backend = BACKEND
+        return pdg
+
+
+def small_function_pdgs(source_code: str, filename: Optional[str], target_lines: List[int],
+                        max_lines: int, language: str = 'c') -> Optional[List[PDG]]:
+    """
+    所有目标行都位于不超过 max_lines 行的函数中时，为这些函数构建 PDG
+
+    Returns:
+        PDG 列表；有目标行不在函数中、所在函数过大或构建失败时返回 None
+    """
+    data = source_code.encode('utf-8')
+    tree = ast_enhancer.get_cached_parser(language).parse(data)
+    all_functions = list(iter_functions(tree.root_node))
+    functions = {}
+    for line in target_lines:
+        for fn in all_functions:
+            start, end = fn.start_point[0] + 1, fn.end_point[0] + 1
+            if start <= line <= end:
+                if end - start + 1 > max_lines:
+                    return None
+                functions[start] = fn
+                break
+        else:
+            return None
+    pdgs = []
+    for start, fn in sorted(functions.items()):
+        pdg = _FunctionBuilder(data, fn, filename).build()
+        if pdg is None:
+            return None
+        pdg.backend_reason = 'small-function'
+        pdgs.append(pdg)
+    return pdgs
+
+
+def build_pdgs(source_code: str, filename: Optional[str] = None, language: str = 'c',
+               target_lines: Optional[List[int]] = None) -> List[PDG]:
+    """
+    为源文件中的函数构建 PDG
+
+    Args:
+        filename: 写入 METHOD 节点的 FILENAME 属性
+        target_lines: 只构建包含这些行的函数，None 表示全部
+
+    Returns:
+        方法 PDG 列表 (构建失败的函数被跳过)
+    """
+    data = source_code.encode('utf-8')
+    tree = ast_enhancer.get_cached_parser(language).parse(data)
+    pdgs = []
+    for fn in iter_functions(tree.root_node):
+        start, end = fn.start_point[0] + 1, fn.end_point[0] + 1
+        if target_lines is not None and not any(start <= line <= end for line in target_lines):
+            continue
+        try:
+            pdg = _FunctionBuilder(data, fn, filename).build()
+        except Exception as e:
+            logging.warning(f"tree-sitter PDG construction failed for {filename}:{start}: {e}")
+            continue
+        if pdg is not None:
+            pdgs.append(pdg)
+    return pdgs
@@ -0,0 +1,327 @@
+"""
+基于 SQLite 的共享任务队列
+多个主机上任意数量的 single_file_slicer.py 进程共享同一个数据库文件，动态领取任务，
+代替把数据集静态切分成几份分别运行。
+
+- 任务按 (项目, 文件) 成组租用 (同一文件只运行一次 Joern)，租约有到期时间
+- 持有租约的进程定期发送心跳延长租约；进程退出或失联后租约到期，任务被其他进程重新租用
+- 结果写入各进程自己的输出目录，结果落盘后才把任务标记为完成，每个任务记录状态、处理进程、尝试次数和耗时
+- 暂时性失败的任务可以放回待处理状态并指定最早的重试时间 (退避)
+
+所有修改都在 BEGIN IMMEDIATE 事务中完成，依赖 SQLite 的文件锁:
+数据库必须放在支持 POSIX 文件锁的文件系统上 (本地磁盘，或正确配置锁的 NFS)。
+"""
+import os
+import time
+import json
+import socket
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_index INTEGER PRIMARY KEY,          -- data.json 中的任务索引
+    group_key TEXT NOT NULL,                 -- 项目 + 文件，同一组的任务一起租用
+    cost INTEGER NOT NULL DEFAULT 0,         -- 源文件大小，大文件先派发
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending / leased / success / error
+    worker TEXT,
+    lease_until REAL,                        -- leased: 租约到期时间；pending: 最早可以重新租用的时间 (重试退避)
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_at REAL,
+    finished_at REAL,
+    seconds REAL,                            -- 各阶段耗时之和
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_group ON tasks (group_key);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, cost);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started_at REAL,
+    heartbeat_at REAL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def group_key(task: Dict) -> str:
+    return json.dumps([task.get('project_name_with_version', 'unknown'), task.get('file_path', 'unknown')])
+
+
+def tasks_fingerprint(tasks: List[Dict]) -> str:
+    """任务列表的指纹 (所有进程必须使用同一个 data.json)"""
+    h = hashlib.sha1()
+    for task in tasks:
+        h.update(group_key(task).encode('utf-8'))
+        h.update(str(task.get('line_number', 0)).encode('utf-8'))
+    return h.hexdigest()
+
+
+class WorkQueueError(Exception):
+    """任务队列与当前数据不匹配等错误"""
+    pass
+
+
+class WorkQueue:
+    """
+    共享任务队列
+
+    Args:
+        path: SQLite 数据库文件
+        worker_id: 当前进程的标识 (默认 主机名-进程号)
+        lease_seconds: 租约时长；心跳间隔应明显短于该值
+    """
+
+    def __init__(self, path: str, worker_id: Optional[str] = None, lease_seconds: float = 300.0):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程使用自己的连接 (心跳在后台线程中发送)"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # ---------- 初始化 ----------
+
+    def populate(self, tasks: List[Dict], repository_dir: Optional[str] = None) -> int:
+        """
+        首个进程写入全部任务；之后的进程只校验任务列表一致
+
+        Returns:
+            新写入的任务数
+        """
+        fingerprint = tasks_fingerprint(tasks)
+        with self._transaction() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is not None:
+                if row[0] != fingerprint:
+                    raise WorkQueueError(f"Queue {self.path} was created from a different task list")
+                return 0
+            sizes: Dict[str, int] = {}
+            rows = []
+            for index, task in enumerate(tasks):
+                key = group_key(task)
+                if key not in sizes:
+                    sizes[key] = 0
+                    if repository_dir:
+                        try:
+                            sizes[key] = os.path.getsize(os.path.join(
+                                repository_dir, task.get('project_name_with_version', 'unknown'),
+                                task.get('file_path', 'unknown')))
+                        except OSError:
+                            pass
+                rows.append((index, key, sizes[key]))
+            db.executemany("INSERT INTO tasks (task_index, group_key, cost) VALUES (?, ?, ?)", rows)
+            db.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+            db.execute("INSERT INTO meta (key, value) VALUES ('created_at', ?)", (str(time.time()),))
+        return len(rows)
+
+    def register(self):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO workers (worker, host, pid, started_at, heartbeat_at, completed) "
+                       "VALUES (?, ?, ?, ?, ?, 0)", (self.worker_id, socket.gethostname(), os.getpid(), now, now))
+
+    # ---------- 租约 ----------
+
+    def lease(self) -> Optional[Tuple[str, List[int]]]:
+        """
+        租用一组任务 (优先未开始的，其次租约已到期的；同一状态内大文件优先)
+
+        Returns:
+            (组键, 任务索引列表)，当前没有可租用的任务时返回 None
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT group_key, status, worker FROM tasks "
+                "WHERE (status = 'pending' AND (lease_until IS NULL OR lease_until <= ?)) "
+                "OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY status = 'leased', cost DESC LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            key, status, previous = row
+            if status == 'leased':
+                logging.warning(f"Lease of {previous} on {key} expired, re-leasing")
+            db.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, leased_at = ?, "
+                "attempts = attempts + 1 "
+                "WHERE group_key = ? AND ((status = 'pending' AND (lease_until IS NULL OR lease_until <= ?)) "
+                "OR (status = 'leased' AND lease_until < ?))",
+                (self.worker_id, now + self.lease_seconds, now, key, now, now))
+            indices = [r[0] for r in db.execute(
+                "SELECT task_index FROM tasks WHERE group_key = ? AND status = 'leased' AND worker = ? "
+                "ORDER BY task_index", (key, self.worker_id))]
+        return key, indices
+
+    def heartbeat(self):
+        """延长当前进程持有的所有租约"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE workers SET heartbeat_at = ? WHERE worker = ?", (now, self.worker_id))
+            db.execute("UPDATE tasks SET lease_until = ? WHERE status = 'leased' AND worker = ?",
+                       (now + self.lease_seconds, self.worker_id))
+
+    def complete(self, records: Iterable[Tuple[int, str, Optional[float], Optional[str]]]):
+        """
+        记录已落盘的任务结果
+
+        Args:
+            records: (任务索引, 状态, 耗时, 错误信息)；其他进程已完成的任务不再覆盖
+        """
+        now = time.time()
+        rows = [(status, self.worker_id, now, seconds, error, index)
+                for index, status, seconds, error in records]
+        if not rows:
+            return
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE tasks SET status = ?, worker = ?, lease_until = NULL, finished_at = ?, seconds = ?, error = ? "
+                "WHERE task_index = ? AND status NOT IN ('success', 'error')", rows)
+            db.execute("UPDATE workers SET completed = completed + ?, heartbeat_at = ? WHERE worker = ?",
+                       (len(rows), now, self.worker_id))
+
+    def release(self, indices: Optional[Iterable[int]] = None):
+        """放弃租约 (默认放弃当前进程持有的全部租约)，任务回到待处理状态"""
+        with self._transaction() as db:
+            if indices is None:
+                db.execute("UPDATE tasks SET status = 'pending', lease_until = NULL "
+                           "WHERE status = 'leased' AND worker = ?", (self.worker_id,))
+            else:
+                db.executemany("UPDATE tasks SET status = 'pending', lease_until = NULL "
+                               "WHERE task_index = ? AND status = 'leased' AND worker = ?",
+                               [(index, self.worker_id) for index in indices])
+
+    def retry(self, records: Iterable[Tuple[int, float, Optional[float], Optional[str]]]):
+        """
+        暂时性失败的任务放回待处理状态，到指定时间后才能重新租用
+
+        Args:
+            records: (任务索引, 最早重试时间, 耗时, 错误信息)
+        """
+        rows = [(not_before, seconds, error, index, self.worker_id) for index, not_before, seconds, error in records]
+        if not rows:
+            return
+        with self._transaction() as db:
+            db.executemany("UPDATE tasks SET status = 'pending', lease_until = ?, seconds = ?, error = ? "
+                           "WHERE task_index = ? AND status = 'leased' AND worker = ?", rows)
+
+    def requeue_errors(self) -> int:
+        """失败的任务 (确定性失败或重试次数用完) 重新放回待处理状态，尝试次数清零"""
+        with self._transaction() as db:
+            return db.execute("UPDATE tasks SET status = 'pending', lease_until = NULL, attempts = 0 "
+                              "WHERE status = 'error'").rowcount
+
+    # ---------- 查询 ----------
+
+    def attempts(self, indices: Iterable[int]) -> Dict[int, int]:
+        """各任务已租用的次数 (包括本次)"""
+        indices = list(indices)
+        if not indices:
+            return {}
+        db = self._connection()
+        placeholders = ','.join('?' * len(indices))
+        return dict(db.execute(f"SELECT task_index, attempts FROM tasks WHERE task_index IN ({placeholders})",
+                               indices))
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数 (expired 为租约已到期、等待重新租用的任务数，backoff 为等待重试的任务数)"""
+        db = self._connection()
+        counts = {status: n for status, n in db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")}
+        counts['expired'] = db.execute("SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND lease_until < ?",
+                                       (time.time(),)).fetchone()[0]
+        counts['backoff'] = db.execute("SELECT COUNT(*) FROM tasks WHERE status = 'pending' AND lease_until > ?",
+                                       (time.time(),)).fetchone()[0]
+        return counts
+
+    def unfinished(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM tasks WHERE status NOT IN ('success', 'error')").fetchone()[0]
+
+    def summary(self, alive_within: Optional[float] = None) -> Dict:
+        """队列状态: 各状态任务数、各进程的完成数和最近心跳、已完成任务的平均耗时"""
+        db = self._connection()
+        alive_within = alive_within or self.lease_seconds
+        now = time.time()
+        workers = []
+        for worker, host, heartbeat_at, completed in db.execute(
+                "SELECT worker, host, heartbeat_at, completed FROM workers ORDER BY started_at"):
+            workers.append({
+                "worker": worker,
+                "host": host,
+                "completed": completed,
+                "last_heartbeat_seconds": now - heartbeat_at if heartbeat_at else None,
+                "alive": heartbeat_at is not None and now - heartbeat_at <= alive_within
+            })
+        avg, retried = db.execute(
+            "SELECT AVG(seconds), SUM(attempts > 1) FROM tasks WHERE status IN ('success', 'error')").fetchone()
+        return {
+            "counts": self.counts(),
+            "workers": workers,
+            "avg_task_seconds": avg,
+            "retried_tasks": retried or 0
+        }
+
+
+class Heartbeat:
+    """后台线程定期调用 queue.heartbeat()"""
+
+    def __init__(self, queue: WorkQueue, interval: float):
+        self.queue = queue
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='queue-heartbeat', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.heartbeat()
+            except Exception as e:
+                logging.warning(f"Queue heartbeat failed: {e}")
+        self.queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join(self.interval + 5)
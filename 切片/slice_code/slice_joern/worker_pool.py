@@ -0,0 +1,283 @@
+"""
+带看门狗的工作进程池
+与 multiprocessing.Pool.imap_unordered 用法类似，另外支持:
+- 主进程强制执行的单任务墙钟时间上限 (可按任务参数计算)，超时后连同 Joern 子进程一起终止并替换工作进程
+- 工作进程处理一定数量的任务后自动退出并由新进程替换 (释放内存、常驻 JVM 等)
+- 工作进程崩溃时对应任务返回失败而不是挂起整个进程池
+- 可选的并发控制器在运行中调整工作进程数 (减少时让空闲进程正常退出)
+每个工作进程使用独立的管道通信，终止某个进程不会影响其他进程的结果传递。
+"""
+import os
+import signal
+import time
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+
+def _worker_main(conn, func: Callable, max_tasks: Optional[int],
+                 initializer: Optional[Callable], finalizer: Optional[Callable]):
+    """工作进程主循环"""
+    try:
+        # 独立进程组: 主进程超时终止时可以连同 Joern 等子进程一起结束
+        os.setpgrp()
+    except (AttributeError, OSError):
+        pass
+
+    if initializer:
+        initializer()
+
+    done = 0
+    try:
+        while True:
+            try:
+                item = conn.recv()
+            except EOFError:
+                break
+            if item is None:
+                break
+            job_id, args = item
+            try:
+                conn.send((job_id, True, func(args)))
+            except Exception as e:
+                conn.send((job_id, False, f"{type(e).__name__}: {e}"))
+            done += 1
+            if max_tasks and done >= max_tasks:
+                break
+    finally:
+        if finalizer:
+            try:
+                finalizer()
+            except Exception:
+                pass
+        conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job_id: Optional[Hashable] = None
+        self.started: Optional[float] = None
+        self.budget: Optional[float] = None
+        self.done = 0
+
+    @property
+    def busy(self) -> bool:
+        return self.job_id is not None
+
+
+class WatchdogPool:
+    """
+    带单任务超时和进程回收的进程池
+
+    Args:
+        processes: 工作进程数
+        func: 任务函数 (必须可在子进程中调用)
+        task_timeout: 单任务墙钟时间上限 (秒)，None 表示不限制
+        job_timeout: 按任务参数计算墙钟时间上限 (在主进程中调用)，设置时代替 task_timeout
+        max_tasks_per_worker: 每个工作进程处理多少个任务后退出并替换，None 表示不回收
+        initializer / finalizer: 工作进程启动时 / 正常退出前调用
+        on_worker_killed: 工作进程被终止或崩溃后在主进程中调用，参数为进程号 (用于清理残留文件)
+        controller: 每轮调度前在主进程中调用，参数为进程池本身，返回目标工作进程数
+    """
+
+    def __init__(self, processes: int, func: Callable,
+                 task_timeout: Optional[float] = None,
+                 job_timeout: Optional[Callable[[Any], Optional[float]]] = None,
+                 max_tasks_per_worker: Optional[int] = None,
+                 initializer: Optional[Callable] = None,
+                 finalizer: Optional[Callable] = None,
+                 on_worker_killed: Optional[Callable[[int], None]] = None,
+                 controller: Optional[Callable[['WatchdogPool'], int]] = None):
+        self.processes = processes
+        self.func = func
+        self.task_timeout = task_timeout
+        self.job_timeout = job_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.initializer = initializer
+        self.finalizer = finalizer
+        self.on_worker_killed = on_worker_killed
+        self.controller = controller
+        self.workers: Dict[int, _Worker] = {}
+        self.killed_count = 0
+        self.recycled_count = 0
+        self.completed_count = 0
+        self.last_elapsed: Optional[float] = None  # 最近一次返回的任务从派发到结束的墙钟时间 (秒)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.func, self.max_tasks_per_worker, self.initializer, self.finalizer),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self.workers[process.pid] = worker
+        return worker
+
+    def _kill(self, worker: _Worker):
+        """终止工作进程及其进程组"""
+        pid = worker.process.pid
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            worker.process.kill()
+        worker.process.join(5)
+        self._discard(worker)
+        self._cleanup(pid)
+
+    def _cleanup(self, pid: int):
+        if self.on_worker_killed:
+            try:
+                self.on_worker_killed(pid)
+            except Exception as e:
+                logging.warning(f"Failed to clean up after worker {pid}: {e}")
+
+    def _discard(self, worker: _Worker):
+        worker.conn.close()
+        self.workers.pop(worker.process.pid, None)
+
+    def _retire(self, worker: _Worker):
+        """让空闲的工作进程正常退出 (执行 finalizer，关闭常驻 JVM 等)"""
+        try:
+            worker.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        worker.process.join(30)
+        if worker.process.is_alive():
+            self._kill(worker)
+        else:
+            self._discard(worker)
+    
+    def _apply_controller(self):
+        """按控制器给出的目标进程数调整；多出的进程只在空闲时退出，忙碌的等任务完成后再处理"""
+        if not self.controller:
+            return
+        try:
+            self.processes = max(1, int(self.controller(self)))
+        except Exception as e:
+            logging.warning(f"Concurrency controller failed: {e}")
+            return
+        for worker in list(self.workers.values()):
+            if len(self.workers) <= self.processes:
+                break
+            if not worker.busy:
+                self._retire(worker)
+    
+    def imap_unordered(self, jobs: Iterable[Tuple[Hashable, Any]]) -> Iterator[Tuple[Hashable, bool, Any]]:
+        """
+        执行任务，按完成顺序返回结果
+
+        Args:
+            jobs: (任务ID, 参数) 序列，按此顺序派发；可以是生成器，有空闲进程时才取下一个
+                  (最多提前取一个)，生成器结束即表示没有更多任务
+
+        Yields:
+            (任务ID, 是否成功, 结果或错误信息)；该任务的墙钟耗时见 last_elapsed
+        """
+        source = iter(jobs)
+        pending = deque()
+
+        def refill():
+            if not pending:
+                job = next(source, None)
+                if job is not None:
+                    pending.append(job)
+
+        refill()
+        while pending or any(w.busy for w in self.workers.values()):
+            self._apply_controller()
+            
+            # 补足工作进程并派发任务
+            while len(self.workers) < self.processes and pending:
+                self._spawn()
+            for worker in list(self.workers.values()):
+                if not worker.busy and pending:
+                    job_id, args = pending.popleft()
+                    refill()
+                    try:
+                        worker.conn.send((job_id, args))
+                    except (OSError, EOFError):
+                        # 进程已退出，任务放回队首
+                        pending.appendleft((job_id, args))
+                        self._discard(worker)
+                        self._cleanup(worker.process.pid)
+                        continue
+                    worker.job_id = job_id
+                    worker.started = time.time()
+                    worker.budget = self.job_timeout(args) if self.job_timeout else self.task_timeout
+
+            # 等待结果
+            conns = {w.conn: w for w in self.workers.values()}
+            for conn in wait(list(conns), timeout=1.0):
+                worker = conns[conn]
+                try:
+                    job_id, ok, payload = conn.recv()
+                except (EOFError, OSError):
+                    # 进程已退出
+                    worker.process.join(5)
+                    job_id = worker.job_id
+                    code = worker.process.exitcode
+                    self.last_elapsed = time.time() - worker.started if worker.started else None
+                    self._discard(worker)
+                    self._cleanup(worker.process.pid)
+                    if job_id is not None:
+                        self.killed_count += 1
+                        yield job_id, False, f"Worker exited unexpectedly (exit code {code})"
+                    continue
+                self.last_elapsed = time.time() - worker.started if worker.started else None
+                worker.job_id = None
+                worker.started = None
+                worker.done += 1
+                self.completed_count += 1
+                if self.max_tasks_per_worker and worker.done >= self.max_tasks_per_worker:
+                    # 工作进程处理完规定数量的任务后自行退出，由下一轮补足
+                    worker.process.join(30)
+                    if worker.process.is_alive():
+                        self._kill(worker)
+                    else:
+                        self._discard(worker)
+                    self.recycled_count += 1
+                yield job_id, ok, payload
+
+            # 看门狗: 超时的任务连同工作进程一起终止
+            if self.task_timeout or self.job_timeout:
+                now = time.time()
+                for worker in list(self.workers.values()):
+                    if worker.busy and worker.budget and now - worker.started > worker.budget:
+                        job_id = worker.job_id
+                        budget = worker.budget
+                        self.last_elapsed = now - worker.started
+                        logging.warning(f"Task {job_id} exceeded {budget:.0f}s budget, "
+                                        f"killing worker {worker.process.pid}")
+                        self._kill(worker)
+                        self.killed_count += 1
+                        yield job_id, False, f"Task exceeded time budget of {budget:.0f}s"
+
+    def terminate(self):
+        """结束所有工作进程"""
+        for worker in list(self.workers.values()):
+            if worker.process.is_alive() and not worker.busy:
+                try:
+                    worker.conn.send(None)
+                except (OSError, EOFError):
+                    pass
+        deadline = time.time() + 10
+        for worker in list(self.workers.values()):
+            if not worker.busy:
+                worker.process.join(max(0.0, deadline - time.time()))
+            if worker.process.is_alive():
+                self._kill(worker)
+            else:
+                self._discard(worker)
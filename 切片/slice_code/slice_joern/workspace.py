@@ -0,0 +1,121 @@
+"""
+工作进程的常驻工作目录
+每个工作进程只创建一次工作目录 (可放在 /dev/shm 等内存文件系统上)，
+任务之间只清空目录内容，源文件优先硬链接而不是复制，减少小文件的磁盘读写
+"""
+import os
+import shutil
+import atexit
+import logging
+import tempfile
+from typing import Optional
+
+
+def mem_available() -> Optional[int]:
+    """系统可用内存 (字节)，无法读取 /proc/meminfo 时返回 None"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def place_source(source_file: str, code_dir: str) -> str:
+    """
+    将源文件放入 code_dir：同一文件系统上硬链接，否则 (如工作目录在 tmpfs 上) 复制
+
+    Returns:
+        目标文件路径
+    """
+    os.makedirs(code_dir, exist_ok=True)
+    target = os.path.join(code_dir, os.path.basename(source_file))
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source_file, target)
+    except OSError:
+        shutil.copyfile(source_file, target)
+    return target
+
+
+def _clear_dir(path: str):
+    """删除目录下的所有内容，保留目录本身"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+class Workspace:
+    """
+    常驻工作目录
+
+    首选目录 (base_dir，如 /dev/shm) 的可用空间或系统可用内存低于 min_free_bytes 时，
+    当前任务改用系统临时目录 (磁盘) 下的备用工作目录。
+    """
+
+    def __init__(self, base_dir: Optional[str] = None, min_free_bytes: int = 0):
+        self.min_free_bytes = min_free_bytes
+        self.in_memory = bool(base_dir)
+        self.primary = self._create(base_dir)
+        self._fallback: Optional[str] = None
+        self._current: Optional[str] = None
+        self.fallback_count = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def _create(base_dir: Optional[str]) -> str:
+        if base_dir and not os.path.isdir(base_dir):
+            logging.warning(f"Workspace base {base_dir} not found, using default temp directory")
+            base_dir = None
+        return tempfile.mkdtemp(prefix=f"slice_ws_{os.getpid()}_", dir=base_dir)
+
+    def _has_room(self) -> bool:
+        """首选目录是否还有足够的空间 (内存文件系统还需检查系统可用内存)"""
+        if not self.min_free_bytes:
+            return True
+        try:
+            if shutil.disk_usage(self.primary).free < self.min_free_bytes:
+                return False
+        except OSError:
+            return False
+        if self.in_memory:
+            available = mem_available()
+            if available is not None and available < self.min_free_bytes:
+                return False
+        return True
+
+    def acquire(self) -> str:
+        """获取一个空的工作目录供当前任务使用"""
+        if self._has_room():
+            path = self.primary
+        else:
+            if self._fallback is None:
+                self._fallback = self._create(None)
+            logging.warning(f"Workspace {self.primary} is low on space, using {self._fallback}")
+            self.fallback_count += 1
+            path = self._fallback
+        # 上一个任务异常退出时可能有残留
+        _clear_dir(path)
+        self._current = path
+        return path
+
+    def release(self):
+        """任务结束后清空工作目录 (内存文件系统上及时释放内存)"""
+        if self._current and os.path.isdir(self._current):
+            _clear_dir(self._current)
+        self._current = None
+
+    def close(self):
+        """删除工作目录"""
+        for path in (self.primary, self._fallback):
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
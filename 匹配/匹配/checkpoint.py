@@ -0,0 +1,110 @@
+import json
+import os
+import time
+from typing import Dict, Set, Tuple
+
+
+def _truncate_partial_line(path: str, block_size: int = 4096):
+    """截掉崩溃时留下的不完整最后一行，否则续跑时追加的记录会接在这一行后面一起被丢弃。"""
+    with open(path, 'rb+') as f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - block_size, 0)
+            f.seek(start)
+            pos = f.read(end - start).rfind(b'\n')
+            if pos >= 0:
+                end = start + pos + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+
+
+class CheckpointLog:
+    """
+    追加写入的断点日志 (JSON Lines)。
+
+    每行一条记录:
+        {"type": "label", "id": ..., "label": ...}   已确定标签的告警
+        {"type": "unit", "project": ..., "version": ...}   已完成的 (项目, 版本) 单元
+
+    记录先写入内存缓冲区，每累积 flush_every 条或距上次落盘超过
+    flush_interval 秒时批量写入并 fsync；完成一个单元时强制落盘。
+    进程崩溃最多丢失最后一批未落盘的标签，且不会破坏已有内容。
+    """
+
+    def __init__(self, path: str, flush_every: int = 200, flush_interval: float = 30.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.time()
+        self._file = None
+
+    def load(self) -> Tuple[Dict[str, str], Set[Tuple[str, str]]]:
+        """
+        读取已有断点。
+
+        Returns:
+            (告警ID -> 标签, 已完成的 (项目, 版本) 集合)
+        """
+        labels = {}
+        units = set()
+        if not os.path.exists(self.path):
+            return labels, units
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下不完整的最后一行，忽略即可
+                    continue
+                if record.get('type') == 'label':
+                    labels[record['id']] = record['label']
+                elif record.get('type') == 'unit':
+                    units.add((record['project'], record['version']))
+        return labels, units
+
+    def open(self, resume: bool):
+        """打开日志文件；非续跑模式下清空旧断点。"""
+        output_dir = os.path.dirname(self.path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        if resume and os.path.exists(self.path):
+            _truncate_partial_line(self.path)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def record_label(self, warning_id: str, label: str):
+        """记录一条告警的标签。"""
+        self._buffer.append({'type': 'label', 'id': warning_id, 'label': label})
+        if len(self._buffer) >= self.flush_every or time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def record_unit(self, project: str, version: str):
+        """记录一个 (项目, 版本) 单元已完成，并立即落盘。"""
+        self._buffer.append({'type': 'unit', 'project': project, 'version': version})
+        self.flush()
+
+    def flush(self):
+        """将缓冲区写入文件并 fsync。"""
+        if self._file is None or not self._buffer:
+            return
+        self._file.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+        self._last_flush = time.time()
+
+    def close(self):
+        """落盘并关闭文件。"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """删除断点文件 (全部结果保存成功后调用)。"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,131 @@
+import math
+import random
+from collections import defaultdict
+from statistics import NormalDist
+from typing import Callable, Dict, Hashable, List, Tuple
+
+
+class StratifiedSampler:
+    """
+    分层抽样器 - 按层 (如 项目/版本/工具/规则) 不放回地逐轮抽取告警。
+
+    每一轮按比例分配: 每层抽取 ceil(rate * N_h) 条 (至少 1 条)，
+    直到该层被抽完为止。同一个种子下的抽样结果可复现。
+    """
+
+    def __init__(self, strata: Dict[Hashable, List[Dict]], seed: int = None):
+        self.rng = random.Random(seed)
+        self.strata_sizes = {key: len(items) for key, items in strata.items()}
+        # 预先打乱每层的顺序，之后按顺序弹出即为不放回抽样
+        self._remaining = {}
+        for key, items in strata.items():
+            shuffled = list(items)
+            self.rng.shuffle(shuffled)
+            self._remaining[key] = shuffled
+
+    def draw(self, rate: float) -> List[Tuple[Hashable, Dict]]:
+        """抽取一轮样本，返回 (层键, 告警) 列表。"""
+        batch = []
+        for key, remaining in self._remaining.items():
+            if not remaining:
+                continue
+            k = max(1, math.ceil(rate * self.strata_sizes[key]))
+            for _ in range(min(k, len(remaining))):
+                batch.append((key, remaining.pop()))
+        return batch
+
+    def take_all(self, key: Hashable) -> List[Tuple[Hashable, Dict]]:
+        """一次性取出某层剩余的全部告警 (用于无需匹配即可确定标签的层)。"""
+        remaining = self._remaining.get(key, [])
+        batch = [(key, w) for w in remaining]
+        self._remaining[key] = []
+        return batch
+
+    @property
+    def exhausted(self) -> bool:
+        """是否所有层都已抽完。"""
+        return not any(self._remaining.values())
+
+
+def z_score(confidence: float) -> float:
+    """双侧置信水平对应的正态分位数 (如 0.95 -> 1.96)。"""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def estimate_proportions(strata_sizes: Dict[Hashable, int],
+                         sampled_labels: Dict[Hashable, List[str]],
+                         group_fn: Callable[[Hashable], Hashable],
+                         labels: List[str],
+                         confidence: float = 0.95) -> Dict:
+    """
+    分层比例估计。
+
+    对 group_fn 划分出的每个分组 g，标签 l 的比例估计为
+        p_g = sum_h W_h * p_h,   W_h = N_h / N_g
+    方差采用带有限总体校正的分层估计
+        Var = sum_h W_h^2 * (1 - n_h / N_h) * q_h (1 - q_h) / n_h
+    其中 q_h = (x_h + 1) / (n_h + 2) 为平滑后的比例，避免小样本层
+    (如只抽到 1 条) 的 p_h 取 0 或 1 时方差被低估为 0。
+    置信区间为正态近似 p_g ± z * sqrt(Var)，并截断到 [0, 1]。
+    尚未抽到样本的层不参与估计 (其权重从分组总体中剔除)。
+
+    Args:
+        strata_sizes: 层键 -> 该层总体大小 N_h
+        sampled_labels: 层键 -> 该层已抽样告警的标签列表
+        group_fn: 层键 -> 分组键
+        labels: 需要估计的标签集合
+        confidence: 置信水平
+
+    Returns:
+        {分组键: {'population', 'sampled', 'labels': {标签: {'estimate', 'lower', 'upper'}}}}
+    """
+    z = z_score(confidence)
+
+    strata_by_group = defaultdict(list)
+    for key in strata_sizes:
+        strata_by_group[group_fn(key)].append(key)
+
+    estimates = {}
+    for group, keys in strata_by_group.items():
+        population = sum(strata_sizes[k] for k in keys)
+        covered = [k for k in keys if sampled_labels.get(k)]
+        covered_population = sum(strata_sizes[k] for k in covered)
+        sampled = sum(len(sampled_labels[k]) for k in covered)
+
+        label_stats = {}
+        for label in labels:
+            estimate = 0.0
+            variance = 0.0
+            for k in covered:
+                n_h = len(sampled_labels[k])
+                N_h = strata_sizes[k]
+                w_h = N_h / covered_population
+                x_h = sampled_labels[k].count(label)
+                estimate += w_h * x_h / n_h
+                q_h = (x_h + 1) / (n_h + 2)
+                fpc = 1 - n_h / N_h
+                variance += w_h ** 2 * fpc * q_h * (1 - q_h) / n_h
+
+            half_width = z * math.sqrt(variance)
+            label_stats[label] = {
+                'estimate': estimate,
+                'lower': max(0.0, estimate - half_width),
+                'upper': min(1.0, estimate + half_width),
+            }
+
+        estimates[group] = {
+            'population': population,
+            'sampled': sampled,
+            'labels': label_stats,
+        }
+
+    return estimates
+
+
+def max_interval_width(estimates: Dict) -> float:
+    """所有分组、所有标签中最宽的置信区间宽度。"""
+    width = 0.0
+    for group_stats in estimates.values():
+        for stats in group_stats['labels'].values():
+            width = max(width, stats['upper'] - stats['lower'])
+    return width
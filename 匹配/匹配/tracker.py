@@ -3,14 +3,17 @@ import os
 from collections import defaultdict
 from packaging.version import parse as parse_version
 from match import Matcher
+from checkpoint import CheckpointLog
+from sampling import StratifiedSampler, estimate_proportions, max_interval_width
 
 class LifecycleTracker:
     """
     负责追踪告警生命周期，并根据匹配结果标注其状态 (TP/FP/Unknown)。
     """
-    def __init__(self, input_file: str, output_file: str):
+    def __init__(self, input_file: str, output_file: str, checkpoint_file: str = None):
         self.input_file = input_file
         self.output_file = output_file
+        self.checkpoint_file = checkpoint_file or os.path.splitext(output_file)[0] + '.checkpoint.jsonl'
         self.matcher = Matcher()
         self.all_warnings = self._load_warnings()
         self.warnings_by_project = self._group_and_sort_warnings()
@@ -45,8 +48,13 @@ class LifecycleTracker:
             
         return sorted_projects
 
-    def run(self):
-        """执行告警生命周期追踪和标注。"""
+    def run(self, resume: bool = False):
+        """
+        执行告警生命周期追踪和标注。
+
+        Args:
+            resume: 是否从断点文件续跑，跳过已完成的 (项目, 版本) 单元并复用已确定的标签
+        """
         if not self.all_warnings:
             print("没有告警数据可处理。")
             return
@@ -56,56 +64,214 @@ class LifecycleTracker:
         # 用于存储已处理过的告警ID，避免重复处理
         processed_warnings = set()
 
-        for project, versions in self.warnings_by_project.items():
-            print(f"\n正在处理项目: {project}")
-            sorted_versions = list(versions.keys())
-            num_versions = len(sorted_versions)
-
-            # 迭代处理每个版本 (除了最后一个)
-            for i in range(num_versions):
-                current_version = sorted_versions[i]
-                current_warnings = versions[current_version]
-                
-                print(f"  - 版本 {current_version} ({len(current_warnings)} 条告警)")
-
-                # 如果是最新版本，所有告警都标记为 Unknown
-                if i == num_versions - 1:
-                    for warning in current_warnings:
-                        if warning['id'] not in processed_warnings:
-                            warning['label'] = 'Unknown'
-                            labeled_warnings.append(warning)
-                            processed_warnings.add(warning['id'])
-                    continue
-
-                # 对当前版本的每个告警进行处理
-                for warning in current_warnings:
-                    if warning['id'] in processed_warnings:
+        # 断点: 已确定的标签和已完成的 (项目, 版本) 单元
+        checkpoint = CheckpointLog(self.checkpoint_file)
+        checkpoint_labels, finished_units = checkpoint.load() if resume else ({}, set())
+        if resume:
+            print(f"从断点 {self.checkpoint_file} 续跑: {len(checkpoint_labels)} 条已标注，"
+                  f"{len(finished_units)} 个 (项目, 版本) 已完成。")
+        checkpoint.open(resume)
+
+        try:
+            for project, versions in self.warnings_by_project.items():
+                print(f"\n正在处理项目: {project}")
+                sorted_versions = list(versions.keys())
+                num_versions = len(sorted_versions)
+
+                # 迭代处理每个版本 (除了最后一个)
+                for i in range(num_versions):
+                    current_version = sorted_versions[i]
+                    current_warnings = versions[current_version]
+
+                    if (project, current_version) in finished_units:
+                        print(f"  - 版本 {current_version} 已完成，跳过")
+                        for warning in current_warnings:
+                            if warning['id'] not in processed_warnings and warning['id'] in checkpoint_labels:
+                                warning['label'] = checkpoint_labels[warning['id']]
+                                labeled_warnings.append(warning)
+                                processed_warnings.add(warning['id'])
                         continue
 
-                    is_fp = False
-                    # 将当前告警与所有后续版本进行匹配
-                    for j in range(i + 1, num_versions):
-                        next_version = sorted_versions[j]
-                        next_warnings = versions[next_version]
-                        
-                        # 调用匹配器
-                        match_result = self.matcher.match_warnings_between_versions([warning], next_warnings)
-                        
-                        # 如果在任何一个后续版本中找到了匹配，则为 FP
-                        if match_result['matched_pairs']:
-                            is_fp = True
-                            break # 无需再与更后面的版本比较
-                    
-                    # 根据匹配结果确定标签
-                    if is_fp:
-                        warning['label'] = 'FP'
-                    else:
-                        warning['label'] = 'TP'
-                    
-                    labeled_warnings.append(warning)
-                    processed_warnings.add(warning['id'])
+                    print(f"  - 版本 {current_version} ({len(current_warnings)} 条告警)")
+
+                    # 如果是最新版本，所有告警都标记为 Unknown
+                    if i == num_versions - 1:
+                        for warning in current_warnings:
+                            if warning['id'] not in processed_warnings:
+                                warning['label'] = 'Unknown'
+                                labeled_warnings.append(warning)
+                                processed_warnings.add(warning['id'])
+                                checkpoint.record_label(warning['id'], warning['label'])
+                        checkpoint.record_unit(project, current_version)
+                        continue
+
+                    # 对当前版本的每个告警进行处理
+                    for warning in current_warnings:
+                        if warning['id'] in processed_warnings:
+                            continue
+
+                        if warning['id'] in checkpoint_labels:
+                            warning['label'] = checkpoint_labels[warning['id']]
+                        else:
+                            warning['label'] = self._label_warning(versions, sorted_versions, i, warning)
+                            checkpoint.record_label(warning['id'], warning['label'])
+                        labeled_warnings.append(warning)
+                        processed_warnings.add(warning['id'])
+
+                    checkpoint.record_unit(project, current_version)
+        finally:
+            # 异常退出时也把缓冲区中已确定的标签落盘
+            checkpoint.close()
 
         self.save_results(labeled_warnings)
+        # 结果已完整写出，断点不再需要
+        checkpoint.remove()
+
+    def _label_warning(self, versions: dict, sorted_versions: list, i: int, warning: dict) -> str:
+        """
+        确定版本 sorted_versions[i] 中某条告警的标签。
+
+        最新版本中的告警为 Unknown；否则只要在任何一个后续版本中找到匹配即为 FP，
+        在所有后续版本中均未匹配则为 TP。
+        """
+        num_versions = len(sorted_versions)
+        if i == num_versions - 1:
+            return 'Unknown'
+
+        # 将当前告警与所有后续版本进行匹配
+        for j in range(i + 1, num_versions):
+            next_warnings = versions[sorted_versions[j]]
+
+            # 调用匹配器
+            match_result = self.matcher.match_warnings_between_versions([warning], next_warnings)
+
+            # 如果在任何一个后续版本中找到了匹配，则为 FP
+            if match_result['matched_pairs']:
+                return 'FP'  # 无需再与更后面的版本比较
+
+        return 'TP'
+
+    def _stratum_key(self, warning: dict) -> tuple:
+        """分层抽样的层键: (项目, 版本, 工具, 规则)。"""
+        return (
+            warning['project_name'],
+            warning['project_version'],
+            warning.get('tool_name', 'unknown'),
+            warning.get('rule_id') or 'unknown',
+        )
+
+    def run_sample(self, sample_rate: float, target_width: float = None,
+                   confidence: float = 0.95, seed: int = None, max_rounds: int = 50) -> dict:
+        """
+        抽样模式：按 (项目, 版本, 工具, 规则) 分层抽样，只对样本执行完整匹配流程，
+        并给出按项目、按工具及总体的 TP/FP/Unknown 比例估计及置信区间。
+
+        Args:
+            sample_rate: 每轮在各层中抽取的比例
+            target_width: 收敛模式的目标区间宽度；为 None 时只抽一轮
+            confidence: 置信水平
+            seed: 随机种子
+            max_rounds: 收敛模式下的最大抽样轮数
+
+        Returns:
+            估计结果字典 (同时写入 *_sample_estimates.json)
+        """
+        if not self.all_warnings:
+            print("没有告警数据可处理。")
+            return {}
+
+        strata = defaultdict(list)
+        for project, versions in self.warnings_by_project.items():
+            for version_warnings in versions.values():
+                for warning in version_warnings:
+                    strata[self._stratum_key(warning)].append(warning)
+
+        sampler = StratifiedSampler(strata, seed=seed)
+        sampled_labels = defaultdict(list)
+        version_positions = {
+            project: {version: i for i, version in enumerate(versions)}
+            for project, versions in self.warnings_by_project.items()
+        }
+
+        # 最新版本的告警无需匹配即可确定为 Unknown，直接全量计入
+        for key in strata:
+            project, version = key[0], key[1]
+            if version_positions[project][version] == len(version_positions[project]) - 1:
+                for _, warning in sampler.take_all(key):
+                    sampled_labels[key].append('Unknown')
+
+        groupings = {
+            'overall': lambda key: 'all',
+            'by_project': lambda key: key[0],
+            'by_tool': lambda key: key[2],
+        }
+        labels = ['TP', 'FP', 'Unknown']
+
+        rounds = 0
+        estimates = {}
+        while True:
+            rounds += 1
+            batch = sampler.draw(sample_rate)
+            print(f"\n第 {rounds} 轮抽样: {len(batch)} 条告警")
+
+            for key, warning in batch:
+                project, version = key[0], key[1]
+                versions = self.warnings_by_project[project]
+                sorted_versions = list(versions.keys())
+                i = version_positions[project][version]
+                sampled_labels[key].append(self._label_warning(versions, sorted_versions, i, warning))
+
+            estimates = {
+                name: estimate_proportions(sampler.strata_sizes, sampled_labels, group_fn, labels, confidence)
+                for name, group_fn in groupings.items()
+            }
+            width = max(max_interval_width(e) for e in estimates.values())
+            print(f"  当前最大置信区间宽度: {width:.4f}")
+
+            if target_width is None or width <= target_width:
+                break
+            if sampler.exhausted:
+                print("  所有告警均已抽样，停止。")
+                break
+            if rounds >= max_rounds:
+                print(f"  达到最大轮数 {max_rounds}，停止。")
+                break
+
+        report = {
+            'confidence': confidence,
+            'sample_rate': sample_rate,
+            'target_width': target_width,
+            'rounds': rounds,
+            'population': len(self.all_warnings),
+            'sampled': sum(len(v) for v in sampled_labels.values()),
+            'max_interval_width': width,
+            'estimates': estimates,
+        }
+        self.save_sample_report(report)
+        return report
+
+    def save_sample_report(self, report: dict):
+        """保存抽样估计结果并打印摘要。"""
+        output_dir = os.path.dirname(self.output_file)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        report_file = os.path.splitext(self.output_file)[0] + '_sample_estimates.json'
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\n抽样估计结果已保存到 {report_file}")
+
+        print("\n--- 抽样估计 ---")
+        print(f"总告警数: {report['population']}, 已抽样: {report['sampled']}, 置信水平: {report['confidence']:.0%}")
+        for grouping, groups in report['estimates'].items():
+            print(f"[{grouping}]")
+            for group, stats in groups.items():
+                parts = [
+                    f"{label}: {s['estimate'] * 100:.2f}% [{s['lower'] * 100:.2f}, {s['upper'] * 100:.2f}]"
+                    for label, s in stats['labels'].items()
+                ]
+                print(f"  - {group} (n={stats['sampled']}/{stats['population']}): " + ", ".join(parts))
+        print("------------------")
 
     def save_results(self, labeled_warnings: list):
         """将标注好的结果保存到输出文件。"""
@@ -148,6 +314,22 @@ class LifecycleTracker:
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='告警生命周期追踪与 TP/FP/Unknown 标注')
+    parser.add_argument('--sample', type=float, default=None, metavar='RATE',
+                        help='抽样模式: 按 (项目, 版本, 工具, 规则) 分层，每轮抽取的比例 (如 0.05)')
+    parser.add_argument('--target-width', type=float, default=None,
+                        help='收敛模式: 持续抽样直到所有置信区间宽度不超过该值 (如 0.05)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信水平 (默认 0.95)')
+    parser.add_argument('--seed', type=int, default=None, help='抽样随机种子')
+    parser.add_argument('--max-rounds', type=int, default=50, help='收敛模式的最大抽样轮数')
+    parser.add_argument('--resume', action='store_true',
+                        help='从断点续跑: 跳过已完成的 (项目, 版本)，并合并断点中已确定的标签')
+    args = parser.parse_args()
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error('--sample 必须在 (0, 1] 范围内')
+
     # 确保我们从项目的根目录运行
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -162,4 +344,13 @@ if __name__ == "__main__":
         os.system('pip install packaging')
 
     tracker = LifecycleTracker(input_file=input_json, output_file=output_json)
-    tracker.run()
+    if args.sample is not None:
+        tracker.run_sample(
+            sample_rate=args.sample,
+            target_width=args.target_width,
+            confidence=args.confidence,
+            seed=args.seed,
+            max_rounds=args.max_rounds,
+        )
+    else:
+        tracker.run(resume=args.resume)